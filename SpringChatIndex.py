@@ -0,0 +1,213 @@
+#!/usr/bin/python
+#
+# SpringChatIndex - Search the chat of all games in the SQLite database of parsed Spring demo files
+#
+# The module should be placed in a directory in your Python class path or in the
+# directory of any module that is using it.
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Inverted index of the chat table of SpringDemoDatabase, words and speakers to compressed lists of messages"""
+
+import array
+import zlib
+import sys
+import re
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# the tables of the index, each row of chatwords has the sorted ids of the chat messages with a word, that were
+# indexed in one go, and chatindexed has the id of the last chat message indexed
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS chatwords (
+    word TEXT,
+    postings BLOB
+);
+CREATE INDEX IF NOT EXISTS chatwordsbyword ON chatwords (word);
+CREATE TABLE IF NOT EXISTS chatindexed (
+    lastchat INTEGER
+);
+'''
+
+# a word is anything between white space and ASCII punctuation, so text in other encodings still makes words
+WORD = re.compile(r'[^\s!-/:-@\[-`{-~]+')
+
+# the speaker of a message is indexed as a word with this prefix, which no word has
+SPEAKER = '@'
+
+# number of chat messages indexed in one go, at most
+SLICE = 100000
+
+# number of messages fetched per statement when searching
+FETCH = 500
+
+
+def words(text):  # type (str) -> List[str]
+    """
+    Returns the words of a text, in lower case
+    """
+    return WORD.findall(text.lower())
+
+
+def encode(ids):  # type (List[int]) -> buffer
+    """
+    Returns the sorted ids as a compressed blob
+    """
+    postings = array.array('I', ids)
+    if sys.byteorder == 'big':
+        postings.byteswap()
+    return buffer(zlib.compress(postings.tostring()))
+
+
+def decode(blob):  # type (buffer) -> array.array
+    """
+    Returns the ids of a blob made by encode()
+    """
+    postings = array.array('I')
+    postings.fromstring(zlib.decompress(str(blob)))
+    if sys.byteorder == 'big':
+        postings.byteswap()
+    return postings
+
+
+def contains(haystack, needle):  # type (List[str], List[str]) -> bool
+    """
+    Returns True if the list of words needle occurs in the list of words haystack, in order and next to each other
+    """
+    n = len(needle)
+    for i in xrange(len(haystack) - n + 1):
+        if haystack[i:i + n] == needle:
+            return True
+    return False
+
+
+class ChatIndex:
+    """
+    Class whose instance keeps an inverted index of the chat messages in the database of SpringDemoDatabase
+
+    update() indexes the messages added since it was last called, building the lists of messages per word in memory
+    and writing one row per word with the ids of its messages compressed, so the index grows by a few rows per
+    word for every batch of demo files and never rewrites what it has. DemoDatabase.commit() calls it, so the index
+    is committed with the demo files. search() decodes the list of the rarest word of a phrase (or of the speaker,
+    indexed as a word), by the size of its compressed lists, and only keeps the messages of it that are in the lists
+    of the other words, so a common word costs decompressing its lists but no set of its messages. It then reads
+    only the messages that are left to check that the words are in order and next to each other.
+    """
+    def __init__(self, connection, create=True):
+        """
+        Initializer, connection is the database, the tables of the index are created if it does not have them and
+        create is set, leave it off to only search
+        """
+        self.connection = connection
+        if create:
+            self.connection.executescript(SCHEMA)
+
+    def lastchat(self):  # type () -> int
+        """
+        Returns the id of the last chat message that was indexed
+        """
+        row = self.connection.execute('SELECT MAX(lastchat) FROM chatindexed').fetchone()
+        return row[0] or 0
+
+    def update(self):  # type () -> int
+        """
+        Indexes the chat messages added since the last update, returns the number of messages indexed, the caller
+        commits
+        """
+        n = 0
+        last = self.lastchat()
+        while True:
+            postings = dict()
+            rows = self.connection.execute('SELECT id, source, message FROM chat WHERE id > ? ORDER BY id LIMIT ?',
+                                           (last, SLICE)).fetchall()
+            if len(rows) == 0:
+                break
+            for chatid, source, message in rows:
+                keys = set(words(message or ''))
+                if source:
+                    keys.add(SPEAKER + source.strip().lower())
+                for word in keys:
+                    postings.setdefault(word, list()).append(chatid)
+            self.connection.executemany('INSERT INTO chatwords VALUES (?, ?)',
+                                        [(word, encode(ids)) for word, ids in postings.iteritems()])
+            last = rows[-1][0]
+            n += len(rows)
+        if n > 0:
+            self.connection.execute('DELETE FROM chatindexed')
+            self.connection.execute('INSERT INTO chatindexed VALUES (?)', (last,))
+        return n
+
+    def size(self, word):  # type (str) -> int
+        """
+        Returns the size of the compressed lists of messages of a word, which grows with the number of messages
+        """
+        row = self.connection.execute('SELECT SUM(LENGTH(postings)) FROM chatwords WHERE word = ?',
+                                      (word,)).fetchone()
+        return row[0] or 0
+
+    def postings(self, word, among=None):  # type (str, Set[int]) -> Set[int]
+        """
+        Returns the ids of the chat messages with a word, only those among the given ids if among is set
+        """
+        result = set()
+        for blob, in self.connection.execute('SELECT postings FROM chatwords WHERE word = ?', (word,)):
+            if among is None:
+                result.update(decode(blob))
+            else:
+                # the ids of a common word are not put in a set, only checked against the few there are
+                result.update(among.intersection(decode(blob)))
+        return result
+
+    def search(self, phrase=None, speaker=None, anywhere=False):  # type (str, str, bool) -> Iterator[Tuple]
+        """
+        Generates the chat messages with the words of phrase next to each other (or anywhere in the message, with
+        anywhere set) said by speaker, as tuples of the game, game time, type, source, destination, message, map,
+        date and demo file, in the order they were added
+
+        Either phrase or speaker must be given, the case of both does not matter.
+        """
+        needle = words(phrase or '')
+        keys = set(needle)
+        if speaker:
+            keys.add(SPEAKER + speaker.strip().lower())
+        if len(keys) == 0:
+            return
+        sizes = sorted([(self.size(word), word) for word in keys])
+        if sizes[0][0] == 0:
+            return
+        # the rarest word gives the candidates, the others only remove candidates
+        ids = None
+        for size, word in sizes:
+            ids = self.postings(word, ids)
+            if len(ids) == 0:
+                return
+        ids = sorted(ids)
+        for i in xrange(0, len(ids), FETCH):
+            part = ids[i:i + FETCH]
+            cursor = self.connection.execute(
+                'SELECT c.game, c.gametime, c.type, c.source, c.destination, c.message, g.map, '
+                'datetime(g.timestamp, \'unixepoch\'), g.filename FROM chat c JOIN games g ON g.id = c.game '
+                'WHERE c.id IN (%s) ORDER BY c.id' % ', '.join(['?'] * len(part)), part)
+            for row in cursor:
+                if len(needle) > 1 and not anywhere and not contains(words(row[5] or ''), needle):
+                    continue
+                yield row
+
+
+# the columns of the rows of ChatIndex.search()
+COLUMNS = ('game', 'gametime', 'type', 'source', 'destination', 'message', 'map', 'date', 'filename')
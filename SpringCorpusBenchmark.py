@@ -0,0 +1,244 @@
+#!/usr/bin/python
+#
+# SpringCorpusBenchmark - Measure how batch parsing of a corpus of demo files scales with the number of workers
+#
+# To run: python SpringCorpusBenchmark.py [--files 64] [--workers 1,2,4,8] [--threads]
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Corpus throughput benchmark of the batch parser at increasing numbers of worker processes"""
+
+import SpringDemoFile
+import SpringDemoBatch
+import argparse
+import multiprocessing
+import multiprocessing.pool
+import cPickle
+import tempfile
+import shutil
+import gzip
+import time
+import json
+import sys
+import os
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+
+def maxrss():
+    """
+    Returns the peak resident set size of the process in kB, or 0 if it is unknown
+    """
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # in bytes instead of kB
+        rss /= 1024
+    return rss
+
+
+def measuredparse(filename):
+    """
+    Parses a demo file the way the batch parser does and pickles the summary itself, so the time spent pickling
+    can be measured
+
+    Returns the pickled summary, the seconds spent parsing, the seconds spent pickling, the process id and its peak
+    resident set size in kB
+    """
+    start = time.time()
+    result = SpringDemoBatch.parsefile(filename)
+    parsed = time.time()
+    data = cPickle.dumps(result, cPickle.HIGHEST_PROTOCOL)
+    pickled = time.time()
+    return data, parsed - start, pickled - parsed, os.getpid(), maxrss()
+
+
+def decompress(filename):
+    """
+    Reads a demo file completely, through gzip if it is compressed, returns the number of bytes read
+    """
+    if filename.endswith('.sdfz'):
+        f = gzip.open(filename, 'rb')
+    else:
+        f = open(filename, 'rb')
+    n = 0
+    try:
+        while True:
+            buffer_ = f.read(1 << 20)
+            if len(buffer_) == 0:
+                break
+            n += len(buffer_)
+    finally:
+        f.close()
+    return n
+
+
+def run(filenames, workers, threads=False):
+    """
+    Parses all the files with the given number of workers (processes or threads), returns a dictionary with the
+    measurements
+    """
+    start = time.time()
+    if threads:
+        pool = multiprocessing.pool.ThreadPool(workers)
+    else:
+        pool = multiprocessing.Pool(workers)
+    parsetime = 0.0
+    pickletime = 0.0
+    unpickletime = 0.0
+    pickled = 0
+    rss = dict()
+    errors = 0
+    try:
+        for data, parse, pickle, pid, peak in pool.imap_unordered(measuredparse, filenames):
+            t = time.time()
+            result = cPickle.loads(data)
+            unpickletime += time.time() - t
+            parsetime += parse
+            pickletime += pickle
+            pickled += len(data)
+            rss[pid] = max(rss.get(pid, 0), peak)
+            if result['error'] is not None and not result['incomplete']:
+                errors += 1
+        pool.close()
+    finally:
+        pool.join()
+    elapsed = time.time() - start
+    return {
+        'workers': workers,
+        'mode': 'threads' if threads else 'processes',
+        'seconds': elapsed,
+        'parseseconds': parsetime,
+        'pickleseconds': pickletime,
+        'unpickleseconds': unpickletime,
+        'pickledbytes': pickled,
+        'peakrsskb': max(rss.values()) if len(rss) > 0 else 0,
+        'errors': errors
+    }
+
+
+def main(argv=None):
+    ncpu = multiprocessing.cpu_count()
+    default = [1]
+    while default[-1] * 2 <= ncpu:
+        default.append(default[-1] * 2)
+    if default[-1] != ncpu:
+        default.append(ncpu)
+    parser = argparse.ArgumentParser(description='Measure the throughput of batch parsing a generated corpus of '
+                                                 'demo files at increasing numbers of workers')
+    parser.add_argument('--files', type=int, default=32, help='number of demo files in the corpus')
+    parser.add_argument('--players', type=int, default=8, help='number of players per game')
+    parser.add_argument('--minutes', type=int, default=30, help='length of each game in minutes')
+    parser.add_argument('--format', choices=('sdf', 'sdfz'), default='sdfz', help='format of the demo files')
+    parser.add_argument('--workers', default=','.join([str(n) for n in default]),
+                        help='comma separated numbers of workers (default: %s)' % ','.join([str(n) for n in default]))
+    parser.add_argument('--threads', action='store_true',
+                        help='also run with threads instead of processes, to show the effect of the GIL')
+    parser.add_argument('--json', metavar='FILE', help='write the results to FILE as JSON')
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix='springcorpus')
+    results = list()
+    try:
+        filenames = list()
+        for n in xrange(args.files):
+            filename = os.path.join(tmpdir, 'game%04d.%s' % (n, args.format))
+            writer = SpringDemoFile.DemoFileWriter(filename, players=args.players, spectators=args.players / 2,
+                                                   length=args.minutes * 60, chat=2.0, luamsg=2.0, seed=n)
+            if not writer.write():
+                sys.stderr.write(writer.errormessage() + '\n')
+                return 1
+            filenames.append(filename)
+        ondisk = sum([os.path.getsize(f) for f in filenames])
+
+        # the cost of just reading (and decompressing) the corpus, the floor for a single worker
+        start = time.time()
+        uncompressed = sum([decompress(f) for f in filenames])
+        readseconds = time.time() - start
+        print '%d files, %.1f MB on disk, %.1f MB uncompressed, read only: %.1f MB/s' % (
+            len(filenames), ondisk / 1e6, uncompressed / 1e6, uncompressed / 1e6 / readseconds)
+        print
+
+        modes = [False]
+        if args.threads:
+            modes.append(True)
+        print '%-9s %7s %8s %8s %8s %8s %9s %9s %9s %10s' % ('mode', 'workers', 'seconds', 'files/s', 'MB/s',
+                                                             'speedup', 'parse %', 'pickle %', 'unpickle', 'peak RSS')
+        for threads in modes:
+            single = None
+            for workers in [int(w) for w in args.workers.split(',')]:
+                r = run(filenames, workers, threads)
+                if single is None:
+                    single = r['seconds'] * workers
+                r['filesps'] = len(filenames) / r['seconds']
+                r['mbps'] = ondisk / 1e6 / r['seconds']
+                r['speedup'] = single / r['seconds']
+                r['efficiency'] = r['speedup'] / workers
+                # share of the worker time spent in parsing and pickling, and unpickling in the parent
+                busy = r['seconds'] * workers
+                r['parseshare'] = r['parseseconds'] / busy
+                r['pickleshare'] = r['pickleseconds'] / busy
+                results.append(r)
+                print '%-9s %7d %8.2f %8.1f %8.1f %7.2fx %8.0f%% %8.1f%% %8.2fs %8.0fMB' % (
+                    r['mode'], workers, r['seconds'], r['filesps'], r['mbps'], r['speedup'],
+                    r['parseshare'] * 100, r['pickleshare'] * 100, r['unpickleseconds'], r['peakrsskb'] / 1024.0)
+                if r['errors'] > 0:
+                    print '%d file(s) failed to parse' % r['errors']
+            print
+
+        # point out where the scaling flattens out and why
+        for r in results:
+            if r['workers'] == 1 or r['efficiency'] >= 0.75:
+                continue
+            reasons = list()
+            if r['mode'] == 'threads':
+                reasons.append('the GIL serializes the parsing threads')
+            if r['unpickleseconds'] > 0.25 * r['seconds']:
+                reasons.append('the parent spends %.0f%% of the time unpickling results' %
+                               (100 * r['unpickleseconds'] / r['seconds']))
+            if r['parseshare'] < 0.6:
+                reasons.append('workers are idle %.0f%% of the time, waiting on IPC or the disk' %
+                               (100 * (1 - r['parseshare'] - r['pickleshare'])))
+            if r['workers'] > ncpu:
+                reasons.append('more workers than the %d CPUs' % ncpu)
+            if args.format == 'sdfz' and readseconds > 0.5 * single:
+                reasons.append('decompression is %.0f%% of the single worker time' % (100 * readseconds / single))
+            if len(reasons) == 0:
+                reasons.append('no single cause stands out (memory bandwidth, CPU frequency scaling?)')
+            print 'scaling flattens at %d %s (%.0f%% efficient): %s' % (r['workers'], r['mode'],
+                                                                        100 * r['efficiency'], '; '.join(reasons))
+    finally:
+        shutil.rmtree(tmpdir)
+
+    if args.json:
+        f = open(args.json, 'w')
+        try:
+            json.dump(results, f, indent=1, sort_keys=True)
+        finally:
+            f.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
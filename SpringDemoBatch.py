@@ -0,0 +1,414 @@
+#!/usr/bin/python
+#
+# SpringDemoBatch - Parse many Spring demo files, optionally in a pool of worker processes
+#
+# To run: python SpringDemoBatch.py [--jobs 4] demos/
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Batch parsing of Spring demo files into plain (picklable) summaries"""
+
+import SpringDemoFile
+import SpringDemoReducers
+import SpringProfile
+import argparse
+import multiprocessing
+import binascii
+import struct
+import glob
+import zlib
+import json
+import sys
+import os
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# the fields of the player statistics tuples, in the order of the demo file
+PLAYERSTATFIELDS = ('mousePixels', 'mouseClicks', 'keyPresses', 'numCommands', 'unitCommands')
+
+# the fields of the team statistics tuples, in the order of the demo file
+TEAMSTATFIELDS = ('frame', 'metalUsed', 'energyUsed', 'metalProduced', 'energyProduced', 'metalExcess',
+                  'energyExcess', 'metalReceived', 'energyReceived', 'metalSent', 'energySent', 'damageDealt',
+                  'damageReceived', 'unitsProduced', 'unitsDied', 'unitsReceived', 'unitsSent', 'unitsCaptured',
+                  'unitsOutCaptured', 'unitsKilled')
+
+
+def sides(settings):  # type (Dict[str, object]) -> Dict[int, str]
+    """
+    Returns the side (faction) of each team of the start script that has one
+    """
+    result = dict()
+    if not isinstance(settings.get('game'), dict):
+        return result
+    for name, values in settings['game'].items():
+        if not name.startswith('team') or not name[4:].isdigit() or not isinstance(values, dict):
+            continue
+        values = dict([(key.lower(), value) for key, value in values.items()])
+        if isinstance(values.get('side'), basestring) and values['side'].strip() != '':
+            result[int(name[4:])] = values['side'].strip()
+    return result
+
+
+def parsefile(filename):
+    """
+    Reads a demo file and returns a summary of it as a dictionary of plain values, so it can be passed between
+    processes cheaply
+
+    The summary has the header information, the players (see DemoFileReader.players), the chat log, awards, unit
+    and damage statistics of the demo stream and the player and team statistics as tuples of the values in
+    PLAYERSTATFIELDS and TEAMSTATFIELDS. If a part of the demo file cannot be read the parts before it are
+    returned and 'error' holds the error message. 'metrics' holds the metrics of the reader (see
+    DemoFileReader.metrics). 'roster' holds who was connected when, see RosterIndex.rows(), 'mapdraws' the
+    map drawings, see MapDrawings.rows(), and 'startpositions' the start positions, see StartPositions.rows().
+    'names' holds the names of everyone in the game, from the start script and the PLAYERNAME records, and
+    'sides' the side (faction) of each team in the start script.
+    """
+    result = {
+        'filename': filename,
+        'size': None,
+        'version': None,
+        'engine': None,
+        'gameid': None,
+        'timestamp': None,
+        'gametime': None,
+        'map': None,
+        'gametype': None,
+        'incomplete': True,
+        'crashed': False,
+        'exited': False,
+        'players': None,
+        'names': None,
+        'sides': None,
+        'winningteam': None,
+        'records': 0,
+        'chat': None,
+        'awards': None,
+        'unitstats': None,
+        'damagestats': None,
+        'playerstats': None,
+        'teamstats': None,
+        'roster': None,
+        'mapdraws': None,
+        'startpositions': None,
+        'error': None,
+        'metrics': None
+    }
+    try:
+        result['size'] = os.path.getsize(filename)
+        demofile = SpringDemoFile.DemoFileReader(filename, dirname=None)
+    except (IOError, OSError), e:
+        result['error'] = str(e)
+        return result
+    try:
+        if not demofile.header():
+            return result
+        result['version'] = demofile.version
+        result['engine'] = demofile.engine_version
+        result['gameid'] = binascii.hexlify(demofile.gameid)
+        result['timestamp'] = demofile.timestamp
+        result['gametime'] = demofile.totalgametime
+        result['incomplete'] = demofile.incomplete
+        result['crashed'] = demofile.crashed
+        result['exited'] = demofile.exited
+        if demofile.script() is None:
+            return result
+        result['map'] = demofile.map
+        result['gametype'] = demofile.gametype
+        result['players'] = list(demofile.players)
+        result['names'] = sorted(set([p[0] for p in demofile.players]))
+        result['sides'] = sides(demofile.settings)
+        roster = SpringDemoReducers.RosterIndex(demofile.players)
+        drawings = SpringDemoReducers.MapDrawings()
+        starts = SpringDemoReducers.StartPositions(demofile.settings)
+        n = demofile.demostream(reducers=[roster, drawings, starts])
+        if n is not None and n > 0:
+            result['records'] = n
+            result['roster'] = roster.rows()
+            result['names'] = sorted(set(result['names']) | set(roster.names.values()))
+            result['mapdraws'] = drawings.rows()
+            result['startpositions'] = starts.rows()
+            result['chat'] = demofile.chatlog()
+            result['awards'] = demofile.awards()
+            result['unitstats'] = demofile.unitstats()
+            result['damagestats'] = demofile.damagestats()
+        if n is not None and not demofile.incomplete and not demofile.crashed:
+            stats = demofile.playerstats()
+            if stats is not None:
+                result['playerstats'] = dict([(p, tuple([getattr(stats[p], f) for f in PLAYERSTATFIELDS]))
+                                              for p in stats])
+                stats = demofile.teamstats()
+                if stats is not None:
+                    result['teamstats'] = dict([(p, [tuple([getattr(s, f) for f in TEAMSTATFIELDS])
+                                                     for s in stats[p]]) for p in stats])
+            result['winningteam'] = list(demofile.winningteam)
+    except (IOError, EOFError, zlib.error, struct.error), e:
+        # truncated or corrupt compressed files
+        demofile.seterror(str(e))
+    finally:
+        result['error'] = demofile.errormessage()
+        demofile.close()
+        result['metrics'] = demofile.metrics
+    return result
+
+
+def profiledparsefile(filename):
+    """
+    Runs parsefile() under the profiler, which writes the profile next to the demo file (see SpringProfile)
+    """
+    profiler = SpringProfile.Profiler(filename)
+    result = profiler.run(parsefile, filename)
+    if profiler.errormessage() is not None and result['error'] is None:
+        result['error'] = profiler.errormessage()
+    return result
+
+
+def parsefiles(filenames, jobs=1, chunksize=1, profile=False):
+    """
+    Generates the summaries (see parsefile()) of the demo files, using a pool of jobs worker processes if jobs is
+    more than 1, in which case the summaries come in the order the workers finish them
+
+    With profile set, or profiling switched on in the environment, every file is parsed under the profiler
+    """
+    parse = parsefile
+    if profile or SpringProfile.requested():
+        parse = profiledparsefile
+    if jobs <= 1:
+        for filename in filenames:
+            yield parse(filename)
+        return
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for result in pool.imap_unordered(parse, filenames, chunksize):
+            yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+class HeatmapAtlas:
+    """
+    Heatmaps of a corpus of demo files per map and key (an ally team or 'all'), that are added to as demo files come
+    in and kept in a JSON file between runs
+
+    The game ids of the demo files that were added are kept too, so adding a demo file again does not count it twice.
+    """
+    def __init__(self, cellsize=128):
+        """
+        Initializer, cellsize is the size of the cells of the heatmaps in elmos
+        """
+        self.cellsize = cellsize
+        # map name to a dictionary of key to heatmap
+        self.maps = dict()
+        # the game ids (in hex) of the demo files that were added
+        self.games = set()
+
+    def add(self, mapname, key, xs, zs):  # type (str, str, Sequence[float], Sequence[float]) -> None
+        """
+        Counts the positions with the coordinates (in elmos) in xs and zs in the heatmap of the map and key
+        """
+        bymap = self.maps.setdefault(mapname, dict())
+        if key not in bymap:
+            bymap[key] = SpringDemoReducers.Heatmap(self.cellsize)
+        bymap[key].add(xs, zs)
+
+    def merge(self, other):  # type (HeatmapAtlas) -> None
+        """
+        Adds the heatmaps and games of another atlas with the same cell size
+        """
+        for mapname in other.maps:
+            bymap = self.maps.setdefault(mapname, dict())
+            for key, heatmap in other.maps[mapname].items():
+                if key not in bymap:
+                    bymap[key] = SpringDemoReducers.Heatmap(self.cellsize)
+                bymap[key].merge(heatmap)
+        self.games.update(other.games)
+
+    @staticmethod
+    def load(filename, cellsize=128):  # type (str, int) -> HeatmapAtlas
+        """
+        Returns the atlas saved in filename, or a new one with cells of cellsize elmos if there is no such file
+
+        Raises IOError or ValueError if the file cannot be read
+        """
+        if not os.path.exists(filename):
+            return HeatmapAtlas(cellsize)
+        f = open(filename, 'r')
+        try:
+            values = json.load(f)
+        finally:
+            f.close()
+        atlas = HeatmapAtlas(values['cellsize'])
+        atlas.games = set(values['games'])
+        for mapname in values['maps']:
+            atlas.maps[mapname] = dict([(key, SpringDemoReducers.Heatmap.fromdict(heatmap))
+                                        for key, heatmap in values['maps'][mapname].items()])
+        return atlas
+
+    def save(self, filename):  # type (str) -> None
+        """
+        Writes the atlas to filename as JSON
+        """
+        values = {
+            'cellsize': self.cellsize,
+            'games': sorted(self.games),
+            'maps': dict([(mapname, dict([(key, heatmap.todict()) for key, heatmap in self.maps[mapname].items()]))
+                          for mapname in self.maps])
+        }
+        f = open(filename, 'w')
+        try:
+            json.dump(values, f, sort_keys=True)
+        finally:
+            f.close()
+
+
+def addmapdraws(atlas, result, mapname=None):
+    """
+    Adds the points drawn in the game of a summary to the atlas, per ally team and 'all' for everyone (spectators
+    are team -1), only for the given map if mapname is set
+
+    Returns True if the game was added, False if it was left out, had nothing to add or was added before. A game
+    is only marked as added once it adds points, and demo files with an error add nothing, so a later complete
+    copy of a game is not left out after a truncated or corrupt copy.
+    """
+    if result['error'] is not None:
+        return False
+    if result['mapdraws'] is None or result['map'] is None or result['gameid'] in atlas.games:
+        return False
+    if mapname is not None and result['map'] != mapname:
+        return False
+    points = [r for r in result['mapdraws'] if r[2] == SpringDemoReducers.MapDrawings.POINT]
+    if len(points) == 0:
+        return False
+    atlas.games.add(result['gameid'])
+    groups = SpringDemoReducers.teams(result['players'])
+    groups['all'] = None
+    for team in groups:
+        players = groups[team]
+        if players is not None:
+            players = frozenset(players)
+        selected = [r for r in points if players is None or r[1] in players]
+        if len(selected) > 0:
+            atlas.add(result['map'], str(team), [r[3] for r in selected], [r[4] for r in selected])
+    return True
+
+
+def addstartpositions(atlas, result, mapname=None):
+    """
+    Adds the start positions of the teams in the game of a summary to the atlas, per ally team and 'all', only for
+    the given map if mapname is set
+
+    Returns True if the game was added, False if it was left out, had nothing to add or was added before. A game
+    is only marked as added once it adds points, and demo files with an error add nothing, so a later complete
+    copy of a game is not left out after a truncated or corrupt copy.
+    """
+    if result['error'] is not None:
+        return False
+    if result['startpositions'] is None or result['map'] is None or result['gameid'] in atlas.games:
+        return False
+    if mapname is not None and result['map'] != mapname:
+        return False
+    if len(result['startpositions']) == 0:
+        return False
+    atlas.games.add(result['gameid'])
+    # the ally team of each team, from the players of the start script
+    allyteams = dict([(p[2], p[1]) for p in result['players'] if p[2] != -1])
+    for row in result['startpositions']:
+        for key in ('all', str(allyteams.get(row[0], -1))):
+            atlas.add(result['map'], key, [row[2]], [row[4]])
+    return True
+
+
+def demofiles(paths):
+    """
+    Returns the demo files in paths, directories are searched for .sdf and .sdfz files
+    """
+    result = list()
+    for path in paths:
+        if os.path.isdir(path):
+            result.extend(sorted(glob.glob(os.path.join(path, '*.sdf')) + glob.glob(os.path.join(path, '*.sdfz'))))
+        else:
+            result.append(path)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parse Spring demo files and list a summary of each')
+    parser.add_argument('demos', nargs='+', help='demo files or directories with demo files')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--metrics', metavar='FILE', help='append the reader metrics of each file to FILE as JSON lines')
+    parser.add_argument('--mapdraw', metavar='FILE',
+                        help='add the points drawn on each map per ally team to the heatmaps in FILE (JSON)')
+    parser.add_argument('--spawns', metavar='FILE',
+                        help='add the start positions on each map per ally team to the heatmaps in FILE (JSON)')
+    parser.add_argument('--map', help='only add to the heatmaps of this map')
+    parser.add_argument('--cellsize', type=int, default=128,
+                        help='size of the cells of new heatmap files in elmos')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile parsing each file, writing the profile next to it, also switched on by '
+                             'setting ' + SpringProfile.ENVIRONMENT)
+    args = parser.parse_args(argv)
+
+    failed = 0
+    metricslog = None
+    if args.metrics:
+        metricslog = open(args.metrics, 'a')
+    # the heatmap files to add to, their atlas and the function that adds a summary to it
+    atlases = list()
+    for filename, add in ((args.mapdraw, addmapdraws), (args.spawns, addstartpositions)):
+        if not filename:
+            continue
+        try:
+            atlases.append((filename, HeatmapAtlas.load(filename, args.cellsize), add))
+        except (IOError, ValueError, KeyError), e:
+            sys.stderr.write('Cannot read heatmaps from ' + filename + ': ' + str(e) + '\n')
+            return 1
+    results = parsefiles(demofiles(args.demos), args.jobs, profile=args.profile)
+    try:
+        for result in results:
+            if metricslog is not None and result['metrics'] is not None:
+                metricslog.write(json.dumps(result['metrics'], sort_keys=True) + '\n')
+            for filename, atlas, add in atlases:
+                add(atlas, result, args.map)
+            line = os.path.basename(result['filename']) + ': '
+            if result['players'] is not None:
+                line += '%s on %s, %d players, %d:%02d' % (result['gametype'], result['map'],
+                                                          len([p for p in result['players'] if p[1] != -1]),
+                                                          result['gametime'] / 60, result['gametime'] % 60)
+                if result['crashed']:
+                    line += ', crashed'
+                elif result['incomplete']:
+                    line += ', incomplete'
+            if result['error'] is not None:
+                failed += 1
+                line += ' (' + result['error'].strip() + ')'
+            print line
+    finally:
+        # stop the workers now if we stop early, not when the interpreter exits
+        results.close()
+        if metricslog is not None:
+            metricslog.close()
+    for filename, atlas, add in atlases:
+        atlas.save(filename)
+    return 1 if failed > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,352 @@
+#!/usr/bin/python
+#
+# SpringDemoDatabase - Keep what is parsed from Spring demo files in an SQLite database
+#
+# To run: python SpringDemoDatabase.py demos.db [--jobs 4] demos/
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Ingests the summaries of the batch parser into an SQLite database, skipping the demo files it already has"""
+
+from SpringDemoBatch import PLAYERSTATFIELDS, TEAMSTATFIELDS
+from SpringDemoFile import DemoFileReader
+from SpringChatIndex import ChatIndex
+from SpringPlayerIndex import PlayerIndex
+import SpringDemoBatch
+import argparse
+import binascii
+import sqlite3
+import struct
+import time
+import zlib
+import sys
+import os
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# the tables, a game is a demo file, the other tables refer to it by its rowid
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    gameid TEXT,
+    filename TEXT,
+    size INTEGER,
+    mtime REAL,
+    version INTEGER,
+    engine TEXT,
+    timestamp INTEGER,
+    gametime INTEGER,
+    map TEXT,
+    gametype TEXT,
+    incomplete INTEGER,
+    crashed INTEGER,
+    exited INTEGER,
+    winningteam TEXT,
+    records INTEGER,
+    error TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS gamesbyfile ON games (gameid, size, mtime);
+CREATE INDEX IF NOT EXISTS gamesbymap ON games (map, timestamp);
+CREATE INDEX IF NOT EXISTS gamesbytime ON games (timestamp);
+CREATE TABLE IF NOT EXISTS players (
+    game INTEGER REFERENCES games (id),
+    player INTEGER,
+    name TEXT,
+    allyteam INTEGER,
+    team INTEGER,
+    spectator INTEGER
+);
+CREATE INDEX IF NOT EXISTS playersbyname ON players (name, game);
+CREATE INDEX IF NOT EXISTS playersbygame ON players (game, team);
+CREATE TABLE IF NOT EXISTS teams (
+    game INTEGER REFERENCES games (id),
+    team INTEGER,
+    allyteam INTEGER,
+    won INTEGER,
+    side TEXT
+);
+CREATE INDEX IF NOT EXISTS teamsbygame ON teams (game, team, won);
+CREATE TABLE IF NOT EXISTS teamstats (
+    game INTEGER REFERENCES games (id),
+    name TEXT,
+    %s
+);
+CREATE INDEX IF NOT EXISTS teamstatsbygame ON teamstats (game);
+CREATE INDEX IF NOT EXISTS teamstatsbyframe ON teamstats (frame);
+CREATE TABLE IF NOT EXISTS playerstats (
+    game INTEGER REFERENCES games (id),
+    name TEXT,
+    %s
+);
+CREATE INDEX IF NOT EXISTS playerstatsbygame ON playerstats (game);
+CREATE TABLE IF NOT EXISTS chat (
+    id INTEGER PRIMARY KEY,
+    game INTEGER REFERENCES games (id),
+    gametime REAL,
+    type INTEGER,
+    source TEXT,
+    destination TEXT,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS chatbygame ON chat (game);
+CREATE TABLE IF NOT EXISTS awards (
+    game INTEGER REFERENCES games (id),
+    name TEXT,
+    award TEXT,
+    title TEXT,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS awardsbygame ON awards (game);
+CREATE TABLE IF NOT EXISTS unitstats (
+    game INTEGER REFERENCES games (id),
+    unit TEXT,
+    cost REAL,
+    health REAL,
+    produced INTEGER,
+    killed INTEGER
+);
+CREATE INDEX IF NOT EXISTS unitstatsbygame ON unitstats (game);
+CREATE TABLE IF NOT EXISTS damage (
+    game INTEGER REFERENCES games (id),
+    attacker TEXT,
+    victim TEXT,
+    damage REAL,
+    empdamage REAL
+);
+CREATE INDEX IF NOT EXISTS damagebygame ON damage (game);
+CREATE INDEX IF NOT EXISTS damagebyunits ON damage (attacker, victim, damage, empdamage);
+''' % (',\n    '.join([f + ' REAL' for f in TEAMSTATFIELDS]), ',\n    '.join([f + ' INTEGER' for f in PLAYERSTATFIELDS]))
+
+# the columns of the chat table, other than the id
+CHATFIELDS = ('game', 'gametime', 'type', 'source', 'destination', 'message')
+
+# the columns of the games table that come from the summary as they are
+GAMEFIELDS = ('gameid', 'filename', 'size', 'version', 'engine', 'timestamp', 'gametime', 'map', 'gametype',
+              'incomplete', 'crashed', 'exited', 'records', 'error')
+
+
+def fingerprint(filename):  # type (str) -> Tuple[Union[None, str], int, float]
+    """
+    Returns the game id (in hex, None if the header cannot be read), size and modification time of a demo file,
+    which tell whether the database has it, reading only the header
+    """
+    size = os.path.getsize(filename)
+    mtime = os.path.getmtime(filename)
+    gameid = None
+    try:
+        reader = DemoFileReader(filename, dirname=None)
+        try:
+            if reader.header():
+                gameid = binascii.hexlify(reader.gameid)
+        finally:
+            reader.close()
+    except (IOError, OSError, EOFError, zlib.error, struct.error):
+        # the demo file is stored with the error parsefile() finds, under no game id
+        pass
+    return gameid, size, mtime
+
+
+class DemoDatabase:
+    """
+    Class whose instance writes the summaries of demo files (see SpringDemoBatch.parsefile()) to an SQLite database
+
+    The database is in write ahead log mode, so queries can run while demo files are added, and the rows of each
+    table are inserted with one executemany() per summary. Call commit() every so many summaries, see ingest(), it
+    adds the chat of those summaries to the chat index (see SpringChatIndex).
+    """
+    def __init__(self, filename):
+        """
+        Initializer, opens (or creates) the database in filename
+        """
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        # demo files have text in whatever encoding the players used, keep it as it is
+        self.connection.text_factory = str
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        # databases made before chat messages had an id, the chat index refers to them by id, which VACUUM keeps
+        # (unlike the rowid of a table without one), the messages keep their rowid as id
+        columns = [c[1] for c in self.connection.execute('PRAGMA table_info(chat)')]
+        rebuild = len(columns) > 0 and 'id' not in columns
+        if rebuild:
+            self.connection.execute('DROP INDEX IF EXISTS chatbygame')
+            self.connection.execute('ALTER TABLE chat RENAME TO chatwithoutid')
+        self.connection.executescript(SCHEMA)
+        if rebuild:
+            self.connection.execute('INSERT INTO chat (id, %s) SELECT rowid, %s FROM chatwithoutid' % (
+                ', '.join(CHATFIELDS), ', '.join(CHATFIELDS)))
+            self.connection.execute('DROP TABLE chatwithoutid')
+        # databases made before the side of a team was kept
+        if 'side' not in [c[1] for c in self.connection.execute('PRAGMA table_info(teams)')]:
+            self.connection.execute('ALTER TABLE teams ADD COLUMN side TEXT')
+        # databases made when games without a winner had an empty list of winners rather than none
+        self.connection.execute('UPDATE games SET winningteam = NULL WHERE winningteam = \'\'')
+        self.chatindex = ChatIndex(self.connection)
+        self.connection.commit()
+
+    def known(self):  # type () -> Set[Tuple[Union[None, str], int, float]]
+        """
+        Returns the (game id, size, modification time) of the demo files in the database
+        """
+        return set(self.connection.execute('SELECT gameid, size, mtime FROM games'))
+
+    def add(self, result, mtime):  # type (Dict[str, object], float) -> int
+        """
+        Inserts the summary of a demo file with the given modification time, returns the rowid of its game
+        """
+        c = self.connection.cursor()
+        winners = None
+        if result['winningteam']:
+            winners = ','.join([str(t) for t in result['winningteam']])
+        c.execute('INSERT INTO games (%s, mtime, winningteam) VALUES (%s)' % (
+            ', '.join(GAMEFIELDS), ', '.join(['?'] * (len(GAMEFIELDS) + 2))),
+            [result[f] for f in GAMEFIELDS] + [mtime, winners])
+        game = c.lastrowid
+        players = result['players'] or list()
+        c.executemany('INSERT INTO players VALUES (?, ?, ?, ?, ?, ?)',
+                      [(game, p[4] if len(p) > 4 else None, p[0], p[1], p[2], 1 if p[1] == -1 else 0)
+                       for p in players])
+        teams = sorted(set([(p[2], p[1]) for p in players if p[2] != -1]))
+        won = set(result['winningteam'] or ())
+        sides = result['sides'] or dict()
+        c.executemany('INSERT INTO teams (game, team, allyteam, won, side) VALUES (?, ?, ?, ?, ?)',
+                      [(game, team, allyteam, 1 if allyteam in won else 0, sides.get(team))
+                       for team, allyteam in teams])
+        if result['teamstats'] is not None:
+            c.executemany('INSERT INTO teamstats VALUES (%s)' % ', '.join(['?'] * (len(TEAMSTATFIELDS) + 2)),
+                          [(game, name) + s for name in result['teamstats'] for s in result['teamstats'][name]])
+        if result['playerstats'] is not None:
+            c.executemany('INSERT INTO playerstats VALUES (%s)' % ', '.join(['?'] * (len(PLAYERSTATFIELDS) + 2)),
+                          [(game, name) + s for name, s in result['playerstats'].items()])
+        if result['chat'] is not None:
+            c.executemany('INSERT INTO chat (%s) VALUES (?, ?, ?, ?, ?, ?)' % ', '.join(CHATFIELDS),
+                          [(game,) + tuple(m) for m in result['chat']])
+        if result['awards'] is not None:
+            c.executemany('INSERT INTO awards VALUES (?, ?, ?, ?, ?)', [(game,) + tuple(a) for a in result['awards']])
+        if result['unitstats'] is not None:
+            c.executemany('INSERT INTO unitstats VALUES (?, ?, ?, ?, ?, ?)',
+                          [(game,) + tuple(u) for u in result['unitstats']])
+        if result['damagestats'] is not None:
+            c.executemany('INSERT INTO damage VALUES (?, ?, ?, ?, ?)',
+                          [(game,) + tuple(d) for d in result['damagestats']])
+        return game
+
+    def commit(self):
+        """
+        Commits the summaries added since the last commit, with their chat in the chat index
+        """
+        self.chatindex.update()
+        self.connection.commit()
+
+    def analyze(self):
+        """
+        Updates the statistics the query planner uses to choose indexes, after adding many summaries
+        """
+        self.connection.execute('ANALYZE')
+        self.connection.commit()
+
+    def close(self):
+        """
+        Commits and closes the database
+        """
+        self.commit()
+        self.connection.close()
+
+
+def ingest(database, filenames, jobs=1, batch=50):  # type (DemoDatabase, List[str], int, int) -> Iterator[Dict[str, object]]
+    """
+    Parses the demo files that are not in the database yet (by game id, size and modification time) and adds them,
+    committing after every batch of demo files, generates the summaries as they are added
+    """
+    known = database.known()
+    mtimes = dict()
+    for filename in filenames:
+        key = fingerprint(filename)
+        if key not in known:
+            mtimes[filename] = key[2]
+            # a file that is listed twice is added once
+            known.add(key)
+    n = 0
+    results = SpringDemoBatch.parsefiles(sorted(mtimes), jobs)
+    try:
+        for result in results:
+            database.add(result, mtimes[result['filename']])
+            n += 1
+            if n % batch == 0:
+                database.commit()
+            yield result
+    finally:
+        results.close()
+        database.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Add Spring demo files to an SQLite database, skipping those '
+                                                 'that are in it already')
+    parser.add_argument('database', help='SQLite database file, created if it does not exist')
+    parser.add_argument('demos', nargs='+', help='demo files or directories with demo files')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of worker processes parsing demo files')
+    parser.add_argument('--batch', type=int, default=50, help='number of demo files per transaction')
+    parser.add_argument('--playerindex', action='store_true',
+                        help='also add the player names to the index of the directory of each demo file, '
+                             'see SpringPlayerIndex.py')
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    try:
+        database = DemoDatabase(args.database)
+    except sqlite3.Error, e:
+        sys.stderr.write('Cannot open ' + args.database + ': ' + str(e) + '\n')
+        return 1
+    filenames = SpringDemoBatch.demofiles(args.demos)
+    added = 0
+    failed = 0
+    # the player index of each directory
+    indexes = dict()
+    try:
+        for result in ingest(database, filenames, args.jobs, max(1, args.batch)):
+            added += 1
+            if args.playerindex and result['names'] is not None:
+                directory = os.path.dirname(result['filename'])
+                if directory not in indexes:
+                    indexes[directory] = PlayerIndex(directory)
+                    if indexes[directory].errormessage() is not None:
+                        # a damaged index is made again from all demo files in the directory
+                        sys.stderr.write(indexes[directory].errormessage() + ', making it again\n')
+                        indexes[directory].update()
+                indexes[directory].addfile(result['filename'], result['names'])
+            if result['error'] is not None:
+                failed += 1
+                print '%s: %s' % (os.path.basename(result['filename']), result['error'].strip())
+        if added > 0:
+            database.analyze()
+    except sqlite3.Error, e:
+        sys.stderr.write('Cannot add to ' + args.database + ': ' + str(e) + '\n')
+        return 1
+    finally:
+        database.close()
+        for index in indexes.values():
+            if not index.save():
+                sys.stderr.write(index.errormessage() + '\n')
+    print '%d of %d demo files added in %.1f s, %d skipped, %d with errors' % (
+        added, len(filenames), time.time() - start, len(filenames) - added, failed)
+    return 1 if failed > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/python
+#
+# SpringDemoDiff - Find the first record at which two demo files of the same game differ
+#
+# To run: python SpringDemoDiff.py original.sdfz relayed.sdfz
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Compares the demo streams of two demo files window by window and finds the first record that differs"""
+
+from SpringDemoFile import DemoFileReader, DemoRecord, RECORDNAMES
+import argparse
+import binascii
+import itertools
+import zlib
+import sys
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# records that depend on who recorded the demo file rather than on the game, left out of the comparison
+RECORDERSPECIFIC = (DemoRecord.SETPLAYERNUM,)
+
+# number of records hashed together
+WINDOW = 4096
+
+
+def windows(reader, size, ignore):  # type (DemoFileReader, int, Iterable[int]) -> Iterator[Tuple[List[float], List[str]]]
+    """
+    Generates the demo records of the reader in windows of size records, leaving out the record types in ignore, as
+    a list of the chunk times and a list of the record data of each window
+    """
+    ignore = frozenset(ignore)
+    records = (r for r in reader.records() if r[1] not in ignore)
+    while True:
+        window = list(itertools.islice(records, size))
+        if len(window) == 0:
+            return
+        yield [r[0] for r in window], [r[2] for r in window]
+
+
+def digest(records):  # type (List[str]) -> Tuple[int, List[int]]
+    """
+    Returns the hash of a list of record data, the checksum of all the bytes and the lengths of the records
+    """
+    return zlib.crc32(''.join(records)), map(len, records)
+
+
+def firstdifference(a, b):  # type (List[str], List[str]) -> int
+    """
+    Returns the index of the first record that differs between the lists of record data a and b, by halving the
+    part that hashes differently, or the length of the shorter list if one starts with the other
+    """
+    n = min(len(a), len(b))
+    lo = 0
+    hi = n
+    # invariant: a[:lo] equals b[:lo], and if a difference is in a[:n] it is in a[lo:hi]
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if digest(a[lo:mid]) != digest(b[lo:mid]):
+            hi = mid
+        else:
+            lo = mid
+    if lo < n and a[lo] != b[lo]:
+        return lo
+    return n
+
+
+class DivergenceFinder:
+    """
+    Finds the first record at which the demo streams of two demo files differ
+
+    Both demo streams are read side by side in windows of records, and a window is only looked at record by record
+    (by halving it, see firstdifference()) if its hash differs, so most of the work is reading, decompressing and
+    hashing the records in C. The chunk times and the records in ignore are left out, they depend on who recorded
+    the demo file.
+    """
+    def __init__(self, filename1, filename2, window=WINDOW, ignore=RECORDERSPECIFIC, force=False):
+        """
+        Initializer, filename1 and filename2 are the demo files to compare, with force set they are compared even if
+        they are not of the same game
+        """
+        self.filenames = (filename1, filename2)
+        self.window = window
+        self.ignore = ignore
+        self.force = force
+        # the game ids (in hex) of the demo files
+        self.gameids = None
+        # the index of the first record that differs (not counting the records that are left out), None if the
+        # demo streams are the same
+        self.index = None
+        # the (chunk time, record type, data) of that record in each demo file, None if the demo stream ended
+        self.records = None
+        # the number of records that are the same
+        self.same = 0
+        self._lasterror = None
+
+    def run(self):  # type () -> bool
+        """
+        Compares the demo files, returns False if one of them cannot be read
+        """
+        readers = list()
+        try:
+            for filename in self.filenames:
+                reader = DemoFileReader(filename, dirname=None)
+                readers.append(reader)
+                if not reader.header() or reader.script() is None:
+                    self._lasterror = filename + ': ' + str(reader.errormessage())
+                    return False
+            self.gameids = tuple([binascii.hexlify(r.gameid) for r in readers])
+            if self.gameids[0] != self.gameids[1] and not self.force:
+                self._lasterror = 'The demo files are of different games (%s and %s)' % self.gameids
+                return False
+            streams = [windows(r, self.window, self.ignore) for r in readers]
+            for window1, window2 in itertools.izip_longest(*streams, fillvalue=([], [])):
+                times1, data1 = window1
+                times2, data2 = window2
+                if len(data1) == len(data2) and digest(data1) == digest(data2):
+                    self.same += len(data1)
+                    continue
+                i = firstdifference(data1, data2)
+                if i == len(data1) == len(data2):
+                    # the hashes collided, the windows are the same after all
+                    self.same += i
+                    continue
+                self.index = self.same + i
+                self.same += i
+                self.records = tuple([(times[i], ord(data[i][0]), data[i]) if i < len(data) else None
+                                      for times, data in ((times1, data1), (times2, data2))])
+                break
+            for reader in readers:
+                if reader.errormessage():
+                    self._lasterror = reader.filename + ': ' + reader.errormessage()
+                    return False
+            return True
+        except (IOError, OSError, EOFError), e:
+            self._lasterror = str(e)
+            return False
+        finally:
+            for reader in readers:
+                reader.close()
+
+    def errormessage(self):
+        """
+        Simple accessor to get as the last error message, returns None if there was no error
+        """
+        return self._lasterror
+
+
+def describe(record):  # type (Union[None, Tuple[float, int, str]]) -> str
+    """
+    Returns a line about a record found by the DivergenceFinder
+    """
+    if record is None:
+        return 'end of the demo stream'
+    gametime, t, data = record
+    seconds = int(gametime)
+    return '%s at %d:%02d, %d bytes: %s' % (RECORDNAMES.get(t, 'record type %d' % t), seconds / 60, seconds % 60,
+                                            len(data), binascii.hexlify(data[:24]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find the first record at which the demo streams of two demo '
+                                                 'files of the same game differ')
+    parser.add_argument('demo1', help='demo file')
+    parser.add_argument('demo2', help='demo file to compare it to')
+    parser.add_argument('--window', type=int, default=WINDOW,
+                        help='number of records hashed together (default: %d)' % WINDOW)
+    parser.add_argument('--force', action='store_true', help='compare demo files of different games too')
+    args = parser.parse_args(argv)
+
+    finder = DivergenceFinder(args.demo1, args.demo2, max(2, args.window), force=args.force)
+    if not finder.run():
+        sys.stderr.write(finder.errormessage() + '\n')
+        return 2
+    if finder.index is None:
+        print 'The demo streams are the same, %d records compared' % finder.same
+        return 0
+    print 'The demo streams differ at record %d, after %d records that are the same' % (finder.index, finder.same)
+    for filename, record in zip(finder.filenames, finder.records):
+        print '  %s: %s' % (filename, describe(record))
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
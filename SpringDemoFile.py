@@ -1,6 +1,6 @@
 #!/usr/bin/python
 #
-# SpringDemoFile - Class library for parsing Spring Demo Files
+# SpringDemoFile - Class library for parsing Spring Demo Files (and writing synthetic ones)
 #
 # The module should be placed in a directory in your Python class path or in the
 # directory of any module that is using it.
@@ -25,12 +25,17 @@
 
 import re
 import struct
+import collections
 import os.path
 import gzip
+import zlib
+import random
+import time
+import json
 import magic
 
 try:
-        from typing import Dict, List, Tuple, Union
+        from typing import Dict, Iterator, List, Tuple, Union
 except ImportError:
         pass
 
@@ -147,10 +152,22 @@ class TeamStatistics:
         return s
 
 
-class DemoRecord:
+# offsets of the text in ZK springie records, which are really chat messages to the host
+_SPRINGIE = 4 + len('SPRINGIE:')
+_MODSTATSDMG = _SPRINGIE + len('stats,dmg,')
+_MODSTATSUNIT = _SPRINGIE + len('stats,unit,')
+_AWARD = _SPRINGIE + len('award,')
+
+
+class DemoRecord(object):
     """
     Class that represents a single record in the demo stream
+
+    There are a lot of these, so the class has slots instead of a dictionary per instance and the type of the record
+    is worked out once, when the data is set
     """
+    __slots__ = ('gametime', '_data', '_type')
+
     # record type, this is data[0] (see BaseNetProtocol.h)
     KEYFRAME = 1
     NEWFRAME = 2
@@ -211,175 +228,112 @@ class DemoRecord:
     # not defined in ChatMessage.h but present in demo files
     CHAT_HOST = 255
 
-    # helper constants
-    __SPRINGIE = 4 + len('SPRINGIE:')
-    __MODSTATSDMG = __SPRINGIE + len('stats,dmg,')
-    __MODSTATSUNIT = __SPRINGIE + len('stats,unit,')
-    __AWARD = __SPRINGIE + len('award,')
-
-    def __init__(self):
+    def __init__(self, gametime=0.0, data=''):
         """
-        Constructor, initializes all members to default values
+        Constructor, initializes the record to the game time and data given, by default an empty record
         """
-        self.gametime = 0.0
-        self.data = bytearray()
+        self.gametime = gametime
+        self._data = data
+        self._type = self.classify(data)
 
-    def type(self):  # type: () -> Union[None, int]
+    @staticmethod
+    def classify(data):  # type: (str) -> Union[None, int]
         """
-        Returns the type of record or None if the DemoRecord is not mapped to data
+        Returns the type of record for the data or None if there is no data
         """
-        if len(self.data) > 0:
-            v = ord(self.data[0])
-            if v == self.CHAT:
-                if ord(self.data[3]) == self.CHAT_HOST:
-                    if self.data[4:self.__SPRINGIE] == 'SPRINGIE:':
-                        if self.data[self.__SPRINGIE:self.__MODSTATSDMG] == 'stats,dmg,':
-                            return self.ZK_DAMAGE
-                        elif self.data[self.__SPRINGIE:self.__MODSTATSUNIT] == 'stats,unit,':
-                            return self.ZK_UNIT
-                        elif self.data[self.__SPRINGIE:self.__AWARD] == 'award,':
-                            return self.ZK_AWARD
+        if len(data) > 0:
+            v = ord(data[0])
+            if v == DemoRecord.CHAT and len(data) > 3:
+                if ord(data[3]) == DemoRecord.CHAT_HOST:
+                    if data[4:_SPRINGIE] == 'SPRINGIE:':
+                        if data[_SPRINGIE:_MODSTATSDMG] == 'stats,dmg,':
+                            return DemoRecord.ZK_DAMAGE
+                        elif data[_SPRINGIE:_MODSTATSUNIT] == 'stats,unit,':
+                            return DemoRecord.ZK_UNIT
+                        elif data[_SPRINGIE:_AWARD] == 'award,':
+                            return DemoRecord.ZK_AWARD
                         else:
                             # examples include teams and plist
-                            return self.ZK_OTHER
+                            return DemoRecord.ZK_OTHER
             return v
         return None
 
+    @property
+    def data(self):  # type: () -> str
+        """
+        The raw data of the record, setting it works out the type of the record again
+        """
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._type = self.classify(data)
+
+    def type(self):  # type: () -> Union[None, int]
+        """
+        Returns the type of record or None if the DemoRecord is not mapped to data
+        """
+        return self._type
+
     def player(self):  # type () -> Union[None, int]
         """
         Returns the initiating player number for messages that have an initiating player or None for those messages that do not
         have it, or if the record cannot be parsed
         """
-        t = self.type()
-
-        if t is None:
-            return None
-        try:
-            d1 = ord(self.data[1])
-            d2 = ord(self.data[2])
-            d3 = ord(self.data[3])
-        except IndexError:
-            # self.data only 2 long in case of PLAYERLEFT
+        index = PLAYEROFFSETS.get(self._type)
+        if index is None or index >= len(self._data):
             return None
-        record_type_to_player_number = {
-            self.SETPLAYERNUM: d1,
-            self.PLAYERNAME: d2,
-            self.CHAT: d2,
-            self.ZK_DAMAGE: d2,
-            self.ZK_UNIT: d2,
-            self.ZK_AWARD: d2,
-            self.ZK_OTHER: d2,
-            self.PATH_CHECKSUM: d1,
-            self.COMMAND: d2,
-            self.SELECT: d2,
-            self.PAUSE: d1,
-            self.AICOMMAND: d2,
-            self.AICOMMANDS: d2,
-            self.AISHARE: d2,
-            self.USER_SPEED: d1,
-            self.DIRECT_CONTROL: d1,
-            self.DC_UPDATE: d1,
-            self.SHARE: d1,
-            self.SETSHARE: d1,
-            self.PLAYERSTAT: d1,
-            self.MAPDRAW: d2,
-            self.SYNCRESPONSE: d1,
-            self.SYSTEMMSG: d2,  # appears meaningless, it is always 0
-            self.STARTPOS: d1,
-            self.PLAYERINFO: d1,
-            self.PLAYERLEFT: d1,
-            self.LUAMSG: d3,
-            self.TEAM: d1,
-            self.ALLIANCE: d1,
-            self.CUSTOM_DATA: d1,
-            self.AI_CREATED: d2,
-            self.AI_STATE_CHANGED: d1,
-            self.CREATE_NEWPLAYER: d2,  # appears meaningless, it is always 0, the player number is assigned by SETPLAYERNUM
-        }
-        return record_type_to_player_number.get(t)
+        return ord(self._data[index])
 
     def destination(self):  # type () -> Union[None, int]
         """
         Returns the destination player number for messages that have an destination player or None for those messages that do not
         have it, or if the record cannot be parsed
         """
-        t = self.type()
-        if t is None:
-            return None
-        elif t == self.CHAT:
-            return ord(self.data[3])
-        else:
-            return None
+        if self._type == self.CHAT:
+            return ord(self._data[3])
+        return None
 
     def text(self):  # type () -> Union[None, str]
         """
         Returns the text of messages that have text or None if the message has no text
         """
-        t = self.type()
-        if t is None:
-            return None
-        elif t == self.MAPDRAW and len(self.data) > 9 and ord(self.data[3]) == 0:
+        t = self._type
+        if t == self.MAPDRAW and len(self._data) > 9 and ord(self._data[3]) == 0:
             # apparently there is a 0 byte in front of the label
             index = 9
         else:
-            record_type_to_text_index = {
-                self.QUIT: 3,  # apparently there is a 0 byte in front of the label
-                self.PLAYERNAME: 3,
-                self.CHAT: 3,
-                self.SYSTEMMSG: 4,  # apparently, there is a 255 byte in front of the label
-                self.AI_CREATED: 8,  # untested
-                self.CREATE_NEWPLAYER: 6,
-                self.ZK_DAMAGE: self.__MODSTATSDMG,
-                self.ZK_UNIT: self.__MODSTATSUNIT,
-                self.ZK_AWARD: self.__AWARD,
-                self.ZK_OTHER: self.__SPRINGIE,
-            }
-            try:
-                index = record_type_to_text_index[t]
-            except KeyError:
+            index = TEXTOFFSETS.get(t)
+            if index is None:
                 return None
-        s = self.data[index:]
         # get rid of any terminating null characters
-        s = s.strip('\0')
+        s = self._data[index:].strip('\0')
         return None if s == '' else s
 
     def spectator(self):  # type () -> Union[None, int]
         """
         Returns the value of the spectator field in the createnewplayer record only or None.
         """
-        t = self.type()
-        if t is None:
-            return None
-        elif t == self.CREATE_NEWPLAYER:
-            return ord(self.data[3])
-        else:
-            return None
+        if self._type == self.CREATE_NEWPLAYER:
+            return ord(self._data[4])
+        return None
 
     def reason(self):  # type () -> Union[None, int]
         """
         Returns the value of the reason or type field in the PAUSED and PLAYERLEFT record only or None.
         """
-        t = self.type()
-        if t is None:
-            return None
-        elif t == self.PAUSE:
-            return ord(self.data[2])
-        elif t == self.PLAYERLEFT:
-            return ord(self.data[2])
-        else:
-            return None
+        if self._type == self.PAUSE or self._type == self.PLAYERLEFT:
+            return ord(self._data[2])
+        return None
 
     def team(self):  # type () -> Union[None, int]
         """
         Returns the value of the team field in the records that have such a field or None.
         """
-        t = self.type()
-        if t is None:
-            return None
-        elif t == self.CREATE_NEWPLAYER:
-            return ord(self.data[4])
-        else:
-            return None
+        if self._type == self.CREATE_NEWPLAYER:
+            return ord(self._data[5])
+        return None
 
     def __repr__(self):
         """
@@ -391,10 +345,222 @@ class DemoRecord:
             s = '%.0fm%04.1fs' % (w[1], v[1])
         else:
             s = '%.0fh%02.0fm%04.1fs' % (w[0], w[1], v[1])
-        s += ':' + repr(bytearray(self.data))
+        s += ':' + repr(bytearray(self._data))
         return s
 
 
+# offset in the data of the initiating player number, per record type (behind the size, if the record has one,
+# which is 16 bit for COMMAND and the like)
+PLAYEROFFSETS = {
+    DemoRecord.SETPLAYERNUM: 1,
+    DemoRecord.PLAYERNAME: 2,
+    DemoRecord.CHAT: 2,
+    DemoRecord.ZK_DAMAGE: 2,
+    DemoRecord.ZK_UNIT: 2,
+    DemoRecord.ZK_AWARD: 2,
+    DemoRecord.ZK_OTHER: 2,
+    DemoRecord.PATH_CHECKSUM: 1,
+    DemoRecord.COMMAND: 3,
+    DemoRecord.SELECT: 3,
+    DemoRecord.PAUSE: 1,
+    DemoRecord.AICOMMAND: 3,
+    DemoRecord.AICOMMANDS: 3,
+    DemoRecord.AISHARE: 3,
+    DemoRecord.USER_SPEED: 1,
+    DemoRecord.DIRECT_CONTROL: 1,
+    DemoRecord.DC_UPDATE: 1,
+    DemoRecord.SHARE: 1,
+    DemoRecord.SETSHARE: 1,
+    DemoRecord.PLAYERSTAT: 1,
+    DemoRecord.MAPDRAW: 2,
+    DemoRecord.SYNCRESPONSE: 1,
+    DemoRecord.SYSTEMMSG: 3,
+    DemoRecord.STARTPOS: 1,
+    DemoRecord.PLAYERINFO: 1,
+    DemoRecord.PLAYERLEFT: 1,
+    DemoRecord.LUAMSG: 3,
+    DemoRecord.TEAM: 1,
+    DemoRecord.ALLIANCE: 1,
+    DemoRecord.CUSTOM_DATA: 1,
+    DemoRecord.AI_CREATED: 2,
+    DemoRecord.AI_STATE_CHANGED: 1,
+    DemoRecord.CREATE_NEWPLAYER: 3,  # behind the 16 bit size, the player only gets this number when joining
+}
+
+# offset in the data of the text, per record type (MAPDRAW labels are a special case)
+TEXTOFFSETS = {
+    DemoRecord.QUIT: 3,  # apparently there is a 0 byte in front of the label
+    DemoRecord.PLAYERNAME: 3,
+    DemoRecord.CHAT: 4,
+    DemoRecord.SYSTEMMSG: 4,  # apparently, there is a 255 byte in front of the label
+    DemoRecord.AI_CREATED: 8,  # untested
+    DemoRecord.CREATE_NEWPLAYER: 6,
+    DemoRecord.ZK_DAMAGE: _MODSTATSDMG,
+    DemoRecord.ZK_UNIT: _MODSTATSUNIT,
+    DemoRecord.ZK_AWARD: _AWARD,
+    DemoRecord.ZK_OTHER: _SPRINGIE,
+}
+
+
+# names of the record types by number, for reporting
+RECORDNAMES = dict([(getattr(DemoRecord, name), name) for name in dir(DemoRecord)
+                    if name.isupper() and not name.startswith('CHAT_')])
+
+
+# the layout of the records per record type (see BaseNetProtocol.cpp of Spring 104): the struct format of the fixed
+# part following the message id, with the size fields skipped, the names of the fields in it and, for records of
+# variable length, the name and kind of the rest: 'text', 'bytes' or a struct format character for an array
+RECORDLAYOUTS = (
+    (DemoRecord.KEYFRAME, 'i', ('frame',), None),
+    (DemoRecord.NEWFRAME, '', (), None),
+    (DemoRecord.QUIT, '2x', (), ('reason', 'text')),
+    (DemoRecord.STARTPLAYING, 'I', ('countdown',), None),
+    (DemoRecord.SETPLAYERNUM, 'B', ('player',), None),
+    (DemoRecord.PLAYERNAME, 'xB', ('player',), ('name', 'text')),
+    (DemoRecord.CHAT, 'xBB', ('player', 'destination'), ('text', 'text')),
+    (DemoRecord.RANDSEED, 'I', ('seed',), None),
+    (DemoRecord.GAMEID, '16s', ('gameid',), None),
+    (DemoRecord.PATH_CHECKSUM, 'BI', ('player', 'checksum'), None),
+    (DemoRecord.COMMAND, '2xBiiB', ('player', 'command', 'aicommand', 'options'), ('params', 'f')),
+    (DemoRecord.SELECT, '2xB', ('player',), ('units', 'h')),
+    (DemoRecord.PAUSE, 'BB', ('player', 'paused'), None),
+    (DemoRecord.AICOMMAND, '2xBBBhiiB', ('player', 'ai', 'team', 'unit', 'command', 'aicommand', 'options'),
+     ('params', 'f')),
+    (DemoRecord.AICOMMANDS, '2xBBB', ('player', 'ai', 'team'), ('data', 'bytes')),
+    (DemoRecord.AISHARE, '2xBBBBff', ('player', 'ai', 'team', 'destination', 'metal', 'energy'), ('units', 'h')),
+    (DemoRecord.USER_SPEED, 'Bf', ('player', 'speed'), None),
+    (DemoRecord.INTERNAL_SPEED, 'f', ('speed',), None),
+    (DemoRecord.CPU_USAGE, 'f', ('usage',), None),
+    (DemoRecord.DIRECT_CONTROL, 'B', ('player',), None),
+    (DemoRecord.DC_UPDATE, 'BBhh', ('player', 'status', 'heading', 'pitch'), None),
+    (DemoRecord.SHARE, 'BBBff', ('player', 'team', 'units', 'metal', 'energy'), None),
+    (DemoRecord.SETSHARE, 'BBff', ('player', 'team', 'metalshare', 'energyshare'), None),
+    (DemoRecord.SENDPLAYERSTAT, '', (), None),
+    (DemoRecord.PLAYERSTAT, 'B5i', ('player', 'mousePixels', 'mouseClicks', 'keyPresses', 'numCommands',
+                                    'unitCommands'), None),
+    (DemoRecord.GAMEOVER, 'xB', ('player',), ('winners', 'B')),
+    (DemoRecord.MAPDRAW, 'xBB', ('player', 'action'), ('data', 'bytes')),
+    (DemoRecord.SYNCRESPONSE, 'BiI', ('player', 'frame', 'checksum'), None),
+    (DemoRecord.SYSTEMMSG, '2xB', ('player',), ('text', 'text')),
+    (DemoRecord.STARTPOS, 'BBBfff', ('player', 'team', 'ready', 'x', 'y', 'z'), None),
+    (DemoRecord.PLAYERINFO, 'Bfi', ('player', 'cpuusage', 'ping'), None),
+    (DemoRecord.PLAYERLEFT, 'BB', ('player', 'reason'), None),
+    (DemoRecord.LUAMSG, '2xBHB', ('player', 'script', 'mode'), ('data', 'bytes')),
+    (DemoRecord.TEAM, 'BBB', ('player', 'action', 'param'), None),
+    (DemoRecord.GAMEDATA, '2x', (), ('data', 'bytes')),
+    (DemoRecord.ALLIANCE, 'BBB', ('player', 'allyteam', 'allied'), None),
+    (DemoRecord.CCOMMAND, '2xi', ('player',), ('command', 'text')),
+    (DemoRecord.CUSTOM_DATA, 'BBi', ('player', 'datatype', 'value'), None),
+    (DemoRecord.TEAMSTAT, 'Bi12f7i', ('team', 'frame', 'metalUsed', 'energyUsed', 'metalProduced', 'energyProduced',
+                                      'metalExcess', 'energyExcess', 'metalReceived', 'energyReceived', 'metalSent',
+                                      'energySent', 'damageDealt', 'damageReceived', 'unitsProduced', 'unitsDied',
+                                      'unitsReceived', 'unitsSent', 'unitsCaptured', 'unitsOutCaptured',
+                                      'unitsKilled'), None),
+    (DemoRecord.ATTEMPT_CONNECT, '2x', (), ('data', 'bytes')),
+    (DemoRecord.AI_CREATED, 'xBIB', ('player', 'ai', 'team'), ('name', 'text')),
+    (DemoRecord.AI_STATE_CHANGED, 'BIB', ('player', 'ai', 'state'), None),
+    (DemoRecord.REQUEST_TEAMSTAT, 'BH', ('team', 'frame'), None),
+    (DemoRecord.CREATE_NEWPLAYER, '2xBBB', ('player', 'spectator', 'team'), ('name', 'text')),
+)
+
+
+class RecordSchema:
+    """
+    The layout of one type of demo record with a compiled decoder, which turns the record into an event: a named
+    tuple of the game time and the fields of the record
+    """
+    def __init__(self, type_, fmt, fields, tail=None):
+        """
+        Initializer, see RECORDLAYOUTS for the meaning of the arguments
+        """
+        self.type = type_
+        self.name = RECORDNAMES[type_]
+        # skip the message id
+        self.struct = struct.Struct('<x' + fmt)
+        self.size = self.struct.size
+        self.fields = ('gametime',) + tuple(fields)
+        self.tailkind = None
+        if tail is not None:
+            self.fields += (tail[0],)
+            self.tailkind = tail[1]
+        self.itemsize = 1
+        if self.tailkind not in (None, 'text', 'bytes'):
+            self.itemsize = struct.calcsize('<' + self.tailkind)
+        self.event = collections.namedtuple(''.join([w.capitalize() for w in self.name.split('_')]), self.fields)
+
+    def decode(self, gametime, data):  # type (float, str) -> Union[None, tuple]
+        """
+        Returns the event of a record with the data given, or None if the data is too short for the record type
+        """
+        if len(data) < self.size:
+            return None
+        values = (gametime,) + self.struct.unpack_from(data, 0)
+        if self.tailkind is not None:
+            rest = data[self.size:]
+            if self.tailkind == 'text':
+                rest = rest.strip('\0')
+            elif self.tailkind != 'bytes':
+                rest = struct.unpack_from('<%d%s' % (len(rest) // self.itemsize, self.tailkind), rest)
+            values += (rest,)
+        return tuple.__new__(self.event, values)
+
+
+# the schemas by record type, the ZK springie records have the layout of chat records
+SCHEMAS = dict([(layout[0], RecordSchema(*layout)) for layout in RECORDLAYOUTS])
+for _type in (DemoRecord.ZK_DAMAGE, DemoRecord.ZK_UNIT, DemoRecord.ZK_AWARD, DemoRecord.ZK_OTHER):
+    SCHEMAS[_type] = SCHEMAS[DemoRecord.CHAT]
+
+
+def decoderecords(records, types=None):  # type (Iterable[DemoRecord], Iterable[int]) -> Dict[int, List[tuple]]
+    """
+    Decodes demo records in bulk, returns a dictionary of the lists of events per record type
+
+    If types is given only the records of those types are decoded and every one of them is in the dictionary,
+    otherwise only the types that have events are. Records of a type without a schema and records too short for
+    their type are skipped.
+    """
+    decoders = dict()
+    for t in (SCHEMAS if types is None else types):
+        if t in SCHEMAS:
+            decoders[t] = (SCHEMAS[t].decode, list())
+    for record in records:
+        decoder = decoders.get(record.type())
+        if decoder is not None:
+            event = decoder[0](record.gametime, record.data)
+            if event is not None:
+                decoder[1].append(event)
+    return dict([(t, decoders[t][1]) for t in decoders if types is not None or len(decoders[t][1]) > 0])
+
+
+def metered(method):
+    """
+    Decorator for the methods of DemoFileReader that make up a phase of reading a demo file, adds the wall time and
+    the bytes read by the phase to the metrics of the reader
+
+    A phase called from another phase (winners() from playerstats()) counts as part of the calling phase.
+    """
+    name = method.__name__
+
+    def phase(self, *args, **kw):
+        if self._inphase:
+            return method(self, *args, **kw)
+        self._inphase = True
+        start = time.time()
+        before = self._consumed()
+        try:
+            return method(self, *args, **kw)
+        finally:
+            self._inphase = False
+            metrics = self.metrics['phases'].setdefault(name, {'seconds': 0.0, 'bytes': 0, 'calls': 0})
+            metrics['seconds'] += time.time() - start
+            metrics['bytes'] += self._consumed() - before
+            metrics['calls'] += 1
+            self._updatemetrics()
+    phase.__name__ = name
+    phase.__doc__ = method.__doc__
+    return phase
+
+
 class DemoFileReader:
     """
     Class whose instance reads Spring demo files
@@ -631,9 +797,14 @@ class DemoFileReader:
         'zenith': 'Zenith'  # 229 zenith.lua
     }
 
-    def __init__(self, fn, dirname='My Games/Spring/demos/'):
+    def __init__(self, fn, dirname='My Games/Spring/demos/', metricslog=None, fileobj=None):
         """
         Initializer for the class instance. Opens the file named fn (with dirname prepended to it)
+
+        If metricslog is given, a file name or an open file, the metrics of reading the file are appended to it as
+        a line of JSON when the file is closed. If fileobj is given the demo file is read from it instead of from
+        the file named fn, it must be an uncompressed file like object with read(), seek() and tell() (such as
+        DemoStore.open() returns) and is closed by close()
         """
         if dirname:
             self.filename = os.path.join(dirname, fn)
@@ -696,12 +867,41 @@ class DemoFileReader:
         self.playerstatistics = None
         # team statistics, call method teamstats()
         self.teamstatistics = None
+        # the demo records, call method demostream()
+        self.demorecords = None
+
+        # instrumentation, the wall time and bytes consumed per phase, the number of records seen per record type
+        # and the number of bytes read from the (uncompressed) stream and decompressed to get there
+        self.metricslog = metricslog
+        self.metrics = {
+            'filename': self.filename,
+            'filesize': 0,
+            'compressed': False,
+            'phases': dict(),
+            'records': dict(),
+            'recordsretained': 0,
+            'bytesread': 0,
+            'bytesdecompressed': 0
+        }
+        # records seen per record type number
+        self.recordcounts = dict()
+        # position of the last seek, bytes read before it and bytes decompressed only to seek
+        self._inphase = False
+        self._seekposition = 0
+        self._bytesread = 0
+        self._bytesskipped = 0
 
         # open the file, if it fails self.file will remain at None
+        if fileobj is not None:
+            self.file = fileobj
+            self.metrics['filesize'] = getattr(fileobj, 'size', 0)
+            return
         if self.get_mime_type(self.filename).endswith('gzip'):
             self.file = gzip.open(self.filename, 'rb')
+            self.metrics['compressed'] = True
         else:
             self.file = open(self.filename, 'rb')
+        self.metrics['filesize'] = os.path.getsize(self.filename)
 
     @staticmethod
     def get_mime_type(filename):  # type (str) -> str
@@ -712,6 +912,7 @@ class DemoFileReader:
         else:
             raise RuntimeError('Unknown version or type of "magic" library.')
 
+    @metered
     def header(self):  # type () -> bool
         """
         Reads the file header and stuffs whatever it read into data members. Do this only once.
@@ -721,7 +922,7 @@ class DemoFileReader:
         if self.file is None:
             self._lasterror = 'File ' + self.filename + ' not open.'
             return False
-        self.file.seek(0, 0)
+        self._seek(0)
         # read the 'fixed' header first
         size = struct.calcsize('=16s2i')
         buffer_ = self.file.read(size)
@@ -809,6 +1010,7 @@ class DemoFileReader:
                 # print(self.filename + ': ' + str(self.numplayers) + ' players in ' + str(self.numteams) + ' teams, team #' + str(self.winningteam) + ' won.')
         return True
 
+    @metered
     def script(self):  # type () -> Union[None, str]
         """
         Read the startscript and parse it.
@@ -825,7 +1027,7 @@ class DemoFileReader:
         if self.scriptsize == 0:
             self._lasterror = 'Cannot read start script, none is recorded'
             return None
-        self.file.seek(self.headersize, 0)
+        self._seek(self.headersize)
         buffer = self.file.read(self.scriptsize)
         if len(buffer) != self.scriptsize:
             self._lasterror = 'File ' + self.filename + ' contains an incomplete (broken) start script'
@@ -1071,11 +1273,17 @@ class DemoFileReader:
 
         return self.startscript
 
-    def demostream(self):  # type () -> Union[None, int]
+    @metered
+    def demostream(self, reducers=None, retain=True):  # type (List[object], bool) -> Union[None, int]
         """
         Read the demo chunks from the file. These are stored in an internal structure for access after reading
 
-        Returns the number of demo chunks found or None if they cannot be read
+        reducers is a list of objects that get to see the records as they are read, each has an attribute types,
+        the record types it wants to see (None for all of them), and a method reduce(record) that is called with
+        every such record in the order of the stream (see SpringDemoReducers). With retain False the records are
+        not stored, which saves a lot of memory if only the reducers need them.
+
+        Returns the number of demo chunks found (stored or, without retain, read) or None if they cannot be read
         """
         if self.file is None:
             self._lasterror = 'File ' + self.filename + ' not open.'
@@ -1090,38 +1298,53 @@ class DemoFileReader:
             self._lasterror = 'Cannot read demo stream, it is empty'
             return None
         where = self.headersize + self.scriptsize
-        self.file.seek(where, 0)
+        self._seek(where)
         self.demorecords = list()
+        self.recordcounts = counts = dict()
+        # the reduce methods per record type and those for record types that have no specific reducers
+        dispatch = dict()
+        everything = list()
+        if reducers is not None:
+            everything = [r.reduce for r in reducers if r.types is None]
+            for r in reducers:
+                if r.types is not None:
+                    for t in r.types:
+                        dispatch.setdefault(t, list()).append(r.reduce)
+            for t in dispatch:
+                dispatch[t].extend(everything)
         n = 0
         chunkheader = struct.Struct('<fI')  # 'fL' old version?
         while n < self.demostreamsize:
             # read header of one record
             if n + chunkheader.size > self.demostreamsize:
                 self._lasterror = 'Demo stream truncated: incomplete chunk header'
-                return len(self.demorecords)
+                return self._recordsread(retain)
             buffer_ = self.file.read(chunkheader.size)
             if len(buffer_) != chunkheader.size:
                 self._lasterror = 'File ' + self.filename + ', demo chunk header truncated'
-                return len(self.demorecords)
+                return self._recordsread(retain)
             values = chunkheader.unpack_from(buffer_, 0)
             n += chunkheader.size
             # print('Read chunk header #' + str(len(self.demorecords)) + ': at ' + str(values[0]) + ' l= ' + str(values[1]) + ' starting at ' + str(n))
-            # stuff it in a new chunk
-            chunk = DemoRecord()
-            chunk.gametime = values[0]
             # read data portion of record
             if n + values[1] > self.demostreamsize:
                 self._lasterror = 'Demo stream truncated: incomplete chunk record'
-                return len(self.demorecords)
+                return self._recordsread(retain)
+            buffer_ = ''
             if values[1] != 0:
                 buffer_ = self.file.read(values[1])
                 if len(buffer_) != values[1]:
                     self._lasterror = 'File ' + self.filename + ', demo chunk record truncated'
-                    return len(self.demorecords)
-                chunk.data = buffer_
+                    return self._recordsread(retain)
+            # stuff it in a new chunk
+            chunk = DemoRecord(values[0], buffer_)
             # add record to list and repeat
             t = chunk.type()
-            if t != chunk.KEYFRAME and t != chunk.NEWFRAME:
+            counts[t] = counts.get(t, 0) + 1
+            if reducers is not None:
+                for reduce_ in dispatch.get(t, everything):
+                    reduce_(chunk)
+            if retain and t != chunk.KEYFRAME and t != chunk.NEWFRAME:
                 # do not add keyframe or newframe records, there are too many and we do not need the info, really
                 # @todo: treat ZK_DAMAGE, ZK_UNIT and ZK_AWARD differently, they are duplicated
                 self.demorecords.append(chunk)
@@ -1139,8 +1362,9 @@ class DemoFileReader:
 
             n += values[1]
         # all demo records read
-        return len(self.demorecords)
+        return self._recordsread(retain)
 
+    @metered
     def chatlog(self):  # type () -> Union[None, List[Tuple[float, int, str, Union[None, str], str]]]
         """
         Returns a data structure containing the 'chat' log of the game.
@@ -1166,7 +1390,8 @@ class DemoFileReader:
             return None
         result = list()
         for rec in self.demorecords:
-            if rec.type() == DemoRecord.CHAT:
+            rectype = rec.type()
+            if rectype == DemoRecord.CHAT:
                 t = rec.gametime
                 p = rec.player()
                 if p in self.playernames:
@@ -1195,7 +1420,7 @@ class DemoFileReader:
                 else:
                     dst = None
                 s = rec.text()
-            elif rec.type() == DemoRecord.MAPDRAW and rec.text() is not None:
+            elif rectype == DemoRecord.MAPDRAW and rec.text() is not None:
                 # only if there is non-zero text in it
                 t = rec.gametime
                 p = rec.player()
@@ -1213,17 +1438,17 @@ class DemoFileReader:
                     src = None
                 dst = None
                 s = rec.text()
-            elif rec.type() == DemoRecord.SYSTEMMSG:
+            elif rectype == DemoRecord.SYSTEMMSG:
                 t = rec.gametime
                 src = None
                 dst = None
                 s = rec.text()
-            elif rec.type() == DemoRecord.QUIT:
+            elif rectype == DemoRecord.QUIT:
                 t = rec.gametime
                 src = None
                 dst = None
                 s = rec.text()
-            elif rec.type() == DemoRecord.PAUSE:
+            elif rectype == DemoRecord.PAUSE:
                 t = rec.gametime
                 p = rec.player()
                 if p in self.playernames:
@@ -1249,7 +1474,7 @@ class DemoFileReader:
                         s = src + ' paused the game.'
                     else:
                         s = 'Someone paused the game'
-            elif rec.type() == DemoRecord.PLAYERLEFT:
+            elif rectype == DemoRecord.PLAYERLEFT:
                 t = rec.gametime
                 p = rec.player()
                 if p in self.playernames:
@@ -1277,10 +1502,11 @@ class DemoFileReader:
                     s = 'Someone' + st
             else:
                 continue
-            result.append((t, rec.type(), src, dst, s))
+            result.append((t, rectype, src, dst, s))
 
         return result
 
+    @metered
     def awards(self):  # type () -> List[Tuple[str, str, str, str]]
         """
         Determine what ZK awards were handed out.
@@ -1355,6 +1581,7 @@ class DemoFileReader:
         else:
             return abbrev
 
+    @metered
     def damagestats(self):  # type () -> List[List[Union[str, float]]
         """
         Determine what ZK damage stats were recorded.
@@ -1422,6 +1649,7 @@ class DemoFileReader:
         damagelist.sort()
         return damagelist
 
+    @metered
     def unitstats(self):  # type () -> List[List[Union[str, int, float]]]
         """
         Determine what ZK unit stats were recorded.
@@ -1497,6 +1725,7 @@ class DemoFileReader:
         unitlist.sort()
         return unitlist
 
+    @metered
     def playerstats(self):  # type () -> Union[None, Dict[str, PlayerStatistics]]
         """
         Attempts to retrieve the player statistics from the file.
@@ -1525,7 +1754,7 @@ class DemoFileReader:
         # get the team numbers of the winning ally teams
         self.winners()
         where = self.headersize + self.scriptsize + self.demostreamsize + self.winningteamchunksize
-        self.file.seek(where, 0)
+        self._seek(where)
         buffer = self.file.read(self.playerstatchunksize)
         if len(buffer) != self.playerstatchunksize:
             self._lasterror = 'File ' + self.filename + ', player statistics truncated'
@@ -1547,6 +1776,7 @@ class DemoFileReader:
             offset = offset + self.playerstatelemsize
         return self.playerstatistics
 
+    @metered
     def teamstats(self):  # type () -> Dict[str, List[TeamStatistics]]
         """
         Attempts to retrieve the team statistics from the file.
@@ -1573,7 +1803,7 @@ class DemoFileReader:
             self._lasterror = 'File ' + self.filename + ' contains team statistics in an unknown format'
             return None
         where = self.headersize + self.scriptsize + self.demostreamsize + self.winningteamchunksize + self.playerstatchunksize
-        self.file.seek(where, 0)
+        self._seek(where)
         buffer = self.file.read(self.teamstatchunksize)
         if len(buffer) != self.teamstatchunksize:
             self._lasterror = 'File ' + self.filename + ', team statistics truncated'
@@ -1626,6 +1856,7 @@ class DemoFileReader:
             self.teamstatistics[x[0]] = teamstat
         return self.teamstatistics
 
+    @metered
     def winners(self):  # type: () -> Union[None, int]
         """
         Retrieve the team numbers of the winning teams if we did not already do so
@@ -1649,7 +1880,7 @@ class DemoFileReader:
             self._lasterror = 'File ' + self.filename + ' does not contain winning team vector'
             return None
         where = self.headersize + self.scriptsize + self.demostreamsize
-        self.file.seek(where, 0)
+        self._seek(where)
         buffer = self.file.read(self.winningteamchunksize)
         if len(buffer) != self.winningteamchunksize:
             self._lasterror = 'File ' + self.filename + ', winning team vector truncated'
@@ -1658,18 +1889,486 @@ class DemoFileReader:
             self.winningteam.append(ord(c))
         return len(self.winningteam)
 
+    @metered
+    def events(self, types=None):  # type (Iterable[int]) -> Union[None, Dict[int, List[tuple]]]
+        """
+        Decodes the demo records read by demostream() into events, see decoderecords() and RECORDLAYOUTS
+
+        Returns a dictionary of the lists of events per record type, for the record types given or for all record
+        types, or None if the demo stream has not been read
+        """
+        if self.demorecords is None:
+            self._lasterror = 'Demo stream not available, read the demostream first'
+            return None
+        return decoderecords(self.demorecords, types)
+
+    def records(self, types=None):  # type (Iterable[int]) -> Iterator[Tuple[float, int, str]]
+        """
+        Generates the demo records as tuples of the chunk time, record type and data, without storing them or making
+        DemoRecord objects, for the record types given or for all record types
+
+        Reading stops when the generator is closed or no longer used, which makes it cheap to look at the start of
+        a demo stream or to read several demo files side by side. Do not call demostream() while it is in use. If
+        the stream cannot be read the generator stops early, see errormessage().
+        """
+        if self.file is None:
+            self._lasterror = 'File ' + self.filename + ' not open.'
+            return
+        if self.headersize == 0:
+            self._lasterror = 'Cannot read demo stream, read the header first'
+            return
+        if self.demostreamsize == 0:
+            self._lasterror = 'Cannot read demo stream, it is empty'
+            return
+        if types is not None:
+            types = frozenset(types)
+        self._seek(self.headersize + self.scriptsize)
+        chunkheader = struct.Struct('<fI')
+        n = 0
+        while n < self.demostreamsize:
+            if n + chunkheader.size > self.demostreamsize:
+                self._lasterror = 'Demo stream truncated: incomplete chunk header'
+                return
+            buffer_ = self.file.read(chunkheader.size)
+            if len(buffer_) != chunkheader.size:
+                self._lasterror = 'File ' + self.filename + ', demo chunk header truncated'
+                return
+            gametime, size = chunkheader.unpack(buffer_)
+            n += chunkheader.size
+            if n + size > self.demostreamsize:
+                self._lasterror = 'Demo stream truncated: incomplete chunk record'
+                return
+            buffer_ = self.file.read(size)
+            if len(buffer_) != size:
+                self._lasterror = 'File ' + self.filename + ', demo chunk record truncated'
+                return
+            n += size
+            if size == 0:
+                continue
+            t = ord(buffer_[0])
+            if types is None or t in types:
+                yield gametime, t, buffer_
+
+    def _recordsread(self, retain):  # type (bool) -> int
+        """
+        Returns the number of records demostream() stored or, if it did not store them, read
+        """
+        if retain:
+            return len(self.demorecords)
+        return sum(self.recordcounts.values())
+
+    def _consumed(self):  # type () -> int
+        """
+        Returns the number of bytes read from the (uncompressed) file so far
+        """
+        if self.file is None:
+            return self._bytesread
+        return self._bytesread + self.file.tell() - self._seekposition
+
+    def _seek(self, where):
+        """
+        Moves to position where in the file, keeping count of the bytes read and of the bytes a compressed file
+        decompresses to get there (all of them from the start of the file when seeking backwards)
+        """
+        position = self.file.tell()
+        self._bytesread += position - self._seekposition
+        if self.metrics['compressed']:
+            if where >= position:
+                self._bytesskipped += where - position
+            else:
+                self._bytesskipped += where
+        self.file.seek(where, 0)
+        self._seekposition = where
+
+    def _updatemetrics(self):
+        """
+        Brings the totals in the metrics dictionary up to date
+        """
+        consumed = self._consumed()
+        self.metrics['bytesread'] = consumed
+        if self.metrics['compressed']:
+            self.metrics['bytesdecompressed'] = consumed + self._bytesskipped
+        self.metrics['records'] = dict([(RECORDNAMES.get(t, str(t)), n) for t, n in self.recordcounts.iteritems()])
+        if self.demorecords is not None:
+            self.metrics['recordsretained'] = len(self.demorecords)
+
     def errormessage(self):
         """
         Simple accessor to get as the last error message, returns None if there was no error
         """
         return self._lasterror
 
+    def seterror(self, message):  # type (str) -> None
+        """
+        Sets the last error message, for errors the caller runs into while reading, such as a corrupt compressed file
+        """
+        self._lasterror = message
+
     def close(self):
         """
         Closes the input file, most other operation will now fail silently
+
+        Writes the metrics to the metrics log, if there is one
         """
+        self._updatemetrics()
+        self._bytesread = self.metrics['bytesread']
         self.file.close()
         self.file = None
+        if self.metricslog is not None:
+            line = json.dumps(self.metrics, sort_keys=True) + '\n'
+            if isinstance(self.metricslog, basestring):
+                f = open(self.metricslog, 'a')
+                try:
+                    f.write(line)
+                finally:
+                    f.close()
+            else:
+                self.metricslog.write(line)
+
+
+class DemoFileWriter:
+    """
+    Class whose instance writes synthetic Spring demo files
+
+    The files are laid out like the ones written by the engine and can be read back with the DemoFileReader. The
+    game itself is made up: the players chat, send Lua messages and accumulate team statistics at random, and in the
+    end Zero-K (Springie) awards, unit and damage statistics are sent and ally team 0 wins.
+    """
+    def __init__(self, fn, dirname=None, version=5, players=4, spectators=0, allyteams=2, length=600,
+                 teamstatperiod=16, chat=1.0, luamsg=0.0, commands=0.0, mapdraw=0.0, startpos=False, lag=False,
+                 sync=False, desync=None, springie=True, frames=True, complete=True, compresslevel=None, seed=0,
+                 gameid=None):
+        """
+        Initializer for the class instance, the file named fn (with dirname prepended to it) is written by write()
+
+        players and spectators are the number of each, the players are divided over allyteams ally teams, length is
+        the duration of the game in seconds and teamstatperiod the interval of the team statistics in seconds.
+        chat and luamsg are the number of chat and Lua messages sent per player per minute, commands the number of
+        unit commands given per player per minute (each with a unit selection half of the time) and mapdraw the
+        number of map drawings, mostly points around a spot of the ally team of the player. startpos has each player
+        choose a start position near that spot (and change it once half of the time). lag adds player
+        info records with the CPU usage and ping of the players every second, the last player lags and slows the
+        game down to half speed from 40% to 50% of the game. sync adds the sync responses of the players every 16
+        frames, with a checksum that depends on the game id and the frame only, unless desync is set: from that
+        game time in seconds on the last player is out of sync. springie adds the
+        Zero-K statistics at the end of the game and frames adds the new frame and key frame records, which make up
+        most of a real demo stream. A game that is not complete has no player and team statistics.
+
+        compresslevel is the gzip compression level, 0 for an uncompressed .sdf file. By default .sdfz files are
+        compressed. seed makes the random game repeatable. gameid is the 16 byte game id, by default it follows from
+        the seed; demo files of the same game recorded by different players have the same game id.
+        """
+        if dirname:
+            self.filename = os.path.join(dirname, fn)
+        else:
+            self.filename = fn
+        # see .error(), this member gets set to the last error message
+        self._lasterror = None
+        self.version = version
+        self.numplayers = players
+        self.numspectators = spectators
+        self.allyteams = allyteams
+        self.length = length
+        self.teamstatperiod = teamstatperiod
+        self.chatrate = chat
+        self.luamsgrate = luamsg
+        self.commandrate = commands
+        self.mapdrawrate = mapdraw
+        self.startpos = startpos
+        self.lag = lag
+        self.sync = sync
+        self.desync = desync
+        self.springie = springie
+        self.frames = frames
+        self.complete = complete
+        if compresslevel is None:
+            if self.filename.endswith('.sdfz'):
+                compresslevel = 6
+            else:
+                compresslevel = 0
+        self.compresslevel = compresslevel
+        self.seed = seed
+        if gameid is None:
+            rnd = random.Random(seed + 3)
+            gameid = ''.join([chr(rnd.randrange(256)) for n in xrange(16)])
+        self.gameid = gameid
+
+        self.engine_version = '104.0'
+        self.gametype = 'Zero-K synthetic'
+        self.map = 'Synthetic Map'
+        self.players = ['Player' + str(n) for n in xrange(players)]
+        self.spectators = ['Spectator' + str(n) for n in xrange(spectators)]
+        # number of unit types in the Zero-K unit and damage statistics
+        self.unittypes = min(20, len(DemoFileReader.zkunitnames))
+
+        # sizes of the parts of the file, known after write()
+        self.headersize = 0
+        self.scriptsize = 0
+        self.demostreamsize = 0
+        self.records = 0
+
+    @staticmethod
+    def chunk(gametime, data):  # type (float, str) -> str
+        """
+        Returns a demo stream chunk with the given record data
+        """
+        return struct.pack('<fI', gametime, len(data)) + data
+
+    @staticmethod
+    def chat(gametime, source, destination, text):  # type (float, int, int, str) -> str
+        """
+        Returns a demo stream chunk with a chat message
+        """
+        text = text[:250]
+        return DemoFileWriter.chunk(
+            gametime, struct.pack('=4B', DemoRecord.CHAT, len(text) + 5, source, destination) + text + '\0')
+
+    def script(self):  # type () -> str
+        """
+        Returns the start script of the game
+        """
+        lines = ['[game]', '{', 'mapname=' + self.map + ';', 'gametype=' + self.gametype + ';']
+        for n in xrange(self.numplayers):
+            lines.extend(['[player' + str(n) + ']', '{', 'name=' + self.players[n] + ';', 'spectator=0;',
+                          'team=' + str(n) + ';', '}'])
+        for n in xrange(self.numspectators):
+            lines.extend(['[player' + str(self.numplayers + n) + ']', '{', 'name=' + self.spectators[n] + ';',
+                          'spectator=1;', '}'])
+        for n in xrange(self.numplayers):
+            lines.extend(['[team' + str(n) + ']', '{', 'teamleader=' + str(n) + ';',
+                          'allyteam=' + str(n % self.allyteams) + ';', '}'])
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+    def demostream(self):  # type () -> Iterator[str]
+        """
+        Generates the chunks of the demo stream, in order
+
+        The game is played out again on every call, so the stream can be measured before it is written without
+        keeping it in memory.
+        """
+        rnd = random.Random(self.seed)
+        everyone = self.numplayers + self.numspectators
+        names = self.players + self.spectators
+        for n in xrange(everyone):
+            yield self.chunk(0.0, struct.pack('=3B', DemoRecord.PLAYERNAME, len(names[n]) + 4, n) + names[n] + '\0')
+        if self.startpos:
+            for n in xrange(self.numplayers):
+                spot = 1024 + 6144 * (n % self.allyteams) / max(1, self.allyteams - 1)
+                for ready in ((0, 1) if rnd.random() < 0.5 else (1,)):
+                    x, z = [max(0.0, min(8191.0, rnd.gauss(spot, 400))) for m in xrange(2)]
+                    yield self.chunk(0.0, struct.pack('<4B3f', DemoRecord.STARTPOS, n, n, ready, x, 100.0, z))
+        yield self.chunk(0.0, struct.pack('<BI', DemoRecord.STARTPLAYING, 0))
+        # chance of a message per frame, there are 30 frames per second
+        pchat = self.chatrate * everyone / 1800.0
+        pluamsg = self.luamsgrate * self.numplayers / 1800.0
+        pcommand = self.commandrate * self.numplayers / 1800.0
+        pmapdraw = self.mapdrawrate * self.numplayers / 1800.0
+        nchat = 0
+        # frames of the slowdown, when the simulation runs at half speed
+        slowstart = self.length * 30 * 4 / 10
+        slowend = self.length * 30 * 5 / 10
+        if self.lag:
+            yield self.chunk(0.0, struct.pack('<BBf', DemoRecord.USER_SPEED, 0, 1.0))
+        t = 0.0
+        for frame in xrange(self.length * 30 + 1):
+            t = frame / 30.0
+            if self.lag:
+                # frames take twice the time during the slowdown
+                if frame > slowstart:
+                    t += (min(frame, slowend) - slowstart) / 30.0
+                if frame == slowstart or frame == slowend:
+                    yield self.chunk(t, struct.pack('<Bf', DemoRecord.INTERNAL_SPEED,
+                                                    0.5 if frame == slowstart else 1.0))
+                if frame % 30 == 0:
+                    for n in xrange(self.numplayers):
+                        if n == self.numplayers - 1 and slowstart <= frame < slowend:
+                            cpu, ping = rnd.uniform(0.9, 1.0), rnd.randrange(300, 900)
+                        else:
+                            cpu, ping = rnd.uniform(0.1, 0.4), rnd.randrange(20, 120)
+                        yield self.chunk(t, struct.pack('<BBfi', DemoRecord.PLAYERINFO, n, cpu, ping))
+            if self.sync and frame % 16 == 0:
+                checksum = zlib.crc32(self.gameid + struct.pack('<i', frame)) & 0xffffffff
+                for n in xrange(self.numplayers):
+                    if self.desync is not None and frame >= self.desync * 30 and n == self.numplayers - 1:
+                        checksum ^= 0x5a5a5a5a
+                    yield self.chunk(t, struct.pack('<BBiI', DemoRecord.SYNCRESPONSE, n, frame, checksum))
+            if self.frames:
+                if frame % 16 == 0:
+                    yield self.chunk(t, struct.pack('<Bi', DemoRecord.KEYFRAME, frame))
+                else:
+                    yield self.chunk(t, chr(DemoRecord.NEWFRAME))
+            if pchat > 0 and rnd.random() < pchat:
+                nchat += 1
+                source = rnd.randrange(everyone)
+                if source >= self.numplayers:
+                    destination = DemoRecord.CHAT_SPECTATORS
+                else:
+                    destination = rnd.choice((DemoRecord.CHAT_EVERYONE, DemoRecord.CHAT_ALLIES))
+                yield self.chat(t, source, destination,
+                                'message %d %s' % (nchat, 'lorem ipsum ' * rnd.randrange(1, 8)))
+            if pluamsg > 0 and rnd.random() < pluamsg:
+                message = 'synthetic:' + 'x' * rnd.randrange(8, 120)
+                yield self.chunk(t, struct.pack('<BHBHB', DemoRecord.LUAMSG, len(message) + 7,
+                                                rnd.randrange(self.numplayers), 1000, 0) + message)
+            if pcommand > 0 and rnd.random() < pcommand:
+                player = rnd.randrange(self.numplayers)
+                if rnd.random() < 0.5:
+                    units = [rnd.randrange(1, 5000) for n in xrange(rnd.randrange(1, 12))]
+                    yield self.chunk(t, struct.pack('<BHB%dh' % len(units), DemoRecord.SELECT, 4 + 2 * len(units),
+                                                    player, *units))
+                params = [rnd.uniform(0, 8192) for n in xrange(3)]
+                yield self.chunk(t, struct.pack('<BHBiiB3f', DemoRecord.COMMAND, 25, player, rnd.choice((10, 20, 90)),
+                                                -1, 0, *params))
+            if pmapdraw > 0 and rnd.random() < pmapdraw:
+                player = rnd.randrange(self.numplayers)
+                # each ally team draws around its own spot on a map of 16 by 16 squares
+                spot = 1024 + 6144 * (player % self.allyteams) / max(1, self.allyteams - 1)
+                x, z = [max(0, min(8191, int(rnd.gauss(spot, 600)))) for n in xrange(2)]
+                action = rnd.random()
+                if action < 0.8:
+                    label = rnd.choice(('', '', 'help', 'attack here'))
+                    yield self.chunk(t, struct.pack('<4BhhB', DemoRecord.MAPDRAW, len(label) + 10, player, 0, x, z,
+                                                    0) + label + '\0')
+                elif action < 0.9:
+                    yield self.chunk(t, struct.pack('<4Bhhhh', DemoRecord.MAPDRAW, 12, player, 2, x, z,
+                                                    x + rnd.randrange(-500, 500), z + rnd.randrange(-500, 500)))
+                else:
+                    yield self.chunk(t, struct.pack('<4Bhh', DemoRecord.MAPDRAW, 8, player, 1, x, z))
+        if self.springie:
+            units = sorted(DemoFileReader.zkunitnames)[:self.unittypes]
+            for n in xrange(self.numplayers):
+                yield self.chat(t, 0, DemoRecord.CHAT_HOST,
+                                'SPRINGIE:award,%s award%d Synthetic Award %d, for %d things' %
+                                (self.players[n], n, n, rnd.randrange(1000)))
+            for unit in units:
+                yield self.chat(t, 0, DemoRecord.CHAT_HOST,
+                                'SPRINGIE:stats,unit,%s,%d,%d,%d,%d' %
+                                (unit, rnd.randrange(30, 3000), rnd.randrange(100), rnd.randrange(100),
+                                 rnd.randrange(100, 10000)))
+                for victim in rnd.sample(units, min(5, len(units))):
+                    yield self.chat(t, 0, DemoRecord.CHAT_HOST,
+                                    'SPRINGIE:stats,dmg,%s,%s,%f,%f' %
+                                    (unit, victim, rnd.uniform(0, 100000), rnd.uniform(0, 1000)))
+        if self.complete:
+            yield self.chunk(t, struct.pack('=4B', DemoRecord.GAMEOVER, 4, 0, 0))
+
+    def winners(self):  # type () -> str
+        """
+        Returns the winning team vector (of version 5 files), ally team 0 wins
+        """
+        if self.version < 5 or not self.complete:
+            return ''
+        return struct.pack('B', 0)
+
+    def playerstats(self):  # type () -> str
+        """
+        Returns the player statistics chunk, there are statistics for the spectators too
+        """
+        if not self.complete:
+            return ''
+        rnd = random.Random(self.seed + 1)
+        result = list()
+        for n in xrange(self.numplayers + self.numspectators):
+            if n < self.numplayers:
+                result.append(struct.pack('=5i', *[rnd.randrange(10000) for m in xrange(5)]))
+            else:
+                result.append(struct.pack('=5i', 0, 0, 0, 0, 0))
+        return ''.join(result)
+
+    def teamstats(self):  # type () -> str
+        """
+        Returns the team statistics chunk, the number of statistics per team followed by the statistics of each
+        team every teamstatperiod seconds
+        """
+        if not self.complete:
+            return ''
+        rnd = random.Random(self.seed + 2)
+        samples = self.length / self.teamstatperiod + 1
+        result = [struct.pack('=i', samples) for n in xrange(self.numplayers)]
+        for n in xrange(self.numplayers):
+            totals = [0.0] * 12
+            counts = [0] * 7
+            for s in xrange(samples):
+                for m in xrange(12):
+                    totals[m] += rnd.uniform(0, 10 * (m + 1))
+                for m in xrange(7):
+                    counts[m] += rnd.randrange(2)
+                result.append(struct.pack('=i12f7i', s * self.teamstatperiod * 30, *(totals + counts)))
+        return ''.join(result)
+
+    def header(self, winners, playerstats, teamstats):  # type (str, str, str) -> str
+        """
+        Returns the file header, the start script and the demo stream must have been measured
+        """
+        magic_ = 'spring demofile\0'
+        if self.version == 5:
+            self.headersize = struct.calcsize('=16s2i256s16sQ12i')
+            result = struct.pack('=16s2i256s', magic_, 5, self.headersize, self.engine_version)
+            last = len(winners)
+        else:
+            self.headersize = struct.calcsize('=16s2i16s16sQ12i')
+            result = struct.pack('=16s2i16s', magic_, 4, self.headersize, self.engine_version)
+            # the winning (ally) team
+            if self.complete:
+                last = 0
+            else:
+                last = -1
+        result += struct.pack('=16sQ12i', self.gameid, 1300000000 + self.seed, self.scriptsize, self.demostreamsize,
+                              self.length, self.length, self.numplayers + self.numspectators,
+                              len(playerstats), struct.calcsize('=5i'), self.numplayers, len(teamstats),
+                              struct.calcsize('=i12f7i'), self.teamstatperiod, last)
+        return result
+
+    def write(self):  # type () -> bool
+        """
+        Writes the demo file
+
+        Returns False if the file could not be written, True if it was
+        """
+        self._lasterror = None
+        script = self.script()
+        self.scriptsize = len(script)
+        # measure the demo stream first, the header precedes it
+        self.demostreamsize = 0
+        self.records = 0
+        for chunk in self.demostream():
+            self.demostreamsize += len(chunk)
+            self.records += 1
+        winners = self.winners()
+        playerstats = self.playerstats()
+        teamstats = self.teamstats()
+        header = self.header(winners, playerstats, teamstats)
+        try:
+            if self.compresslevel > 0:
+                f = gzip.open(self.filename, 'wb', self.compresslevel)
+            else:
+                f = open(self.filename, 'wb')
+            try:
+                f.write(header)
+                f.write(script)
+                buffer_ = list()
+                for chunk in self.demostream():
+                    buffer_.append(chunk)
+                    if len(buffer_) == 4096:
+                        f.write(''.join(buffer_))
+                        buffer_ = list()
+                f.write(''.join(buffer_))
+                f.write(winners)
+                f.write(playerstats)
+                f.write(teamstats)
+            finally:
+                f.close()
+        except IOError, e:
+            self._lasterror = 'Unable to write ' + self.filename + ': ' + str(e)
+            return False
+        return True
+
+    def errormessage(self):
+        """
+        Simple accessor to get as the last error message, returns None if there was no error
+        """
+        return self._lasterror
 
 
 if __name__ == '__main__':
@@ -0,0 +1,280 @@
+#!/usr/bin/python
+#
+# SpringDemoQuery - Ready made queries on the SQLite database of parsed Spring demo files
+#
+# To run: python SpringDemoQuery.py demos.db games --player Someone --since 2011-06-01
+#         python SpringDemoQuery.py demos.db --format json --explain --timing winrate --by map
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Runs parameterised queries on the database of SpringDemoDatabase and streams the rows as CSV or JSON"""
+
+from SpringDemoBatch import TEAMSTATFIELDS
+import SpringChatIndex
+import itertools
+import argparse
+import calendar
+import sqlite3
+import time
+import json
+import csv
+import sys
+import os
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# the columns a win rate can be grouped by
+WINRATEGROUPS = {
+    'player': 'p.name',
+    'faction': 't.side',
+    'map': 'g.map',
+    'gametype': 'g.gametype'
+}
+
+
+def dateparameter(text):  # type (str) -> int
+    """
+    Returns a date (YYYY-MM-DD, UTC) as a unix time, for the command line
+    """
+    try:
+        return calendar.timegm(time.strptime(text, '%Y-%m-%d'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('not a date (YYYY-MM-DD): ' + text)
+
+
+def gamefilters(args, conditions, parameters):  # type (argparse.Namespace, List[str], List[object]) -> None
+    """
+    Adds the conditions on the games table (alias g) given on the command line
+    """
+    if args.map is not None:
+        conditions.append('g.map = ?')
+        parameters.append(args.map)
+    if args.since is not None:
+        conditions.append('g.timestamp >= ?')
+        parameters.append(args.since)
+    if args.until is not None:
+        conditions.append('g.timestamp < ?')
+        parameters.append(args.until)
+
+
+def where(conditions):  # type (List[str]) -> str
+    """
+    Returns the WHERE clause of a list of conditions
+    """
+    if len(conditions) == 0:
+        return ''
+    return ' WHERE ' + ' AND '.join(conditions)
+
+
+def gamesquery(args):  # type (argparse.Namespace) -> Tuple[str, List[object]]
+    """
+    Returns the statement and parameters of the games of a player and/or on a map and/or in a range of dates, the
+    latest first
+    """
+    conditions = list()
+    parameters = list()
+    if args.player is not None:
+        # the players by name index finds the games, the primary key the rest
+        conditions.append('g.id IN (SELECT game FROM players WHERE name = ?)')
+        parameters.append(args.player)
+    gamefilters(args, conditions, parameters)
+    sql = ('SELECT g.id, datetime(g.timestamp, \'unixepoch\') AS date, g.map, g.gametype, g.gametime, '
+           'g.winningteam, g.filename FROM games g' + where(conditions) + ' ORDER BY g.timestamp DESC LIMIT ?')
+    return sql, parameters + [args.limit]
+
+
+def winratequery(args):  # type (argparse.Namespace) -> Tuple[str, List[object]]
+    """
+    Returns the statement and parameters of the games played and won per player, faction (the side of the team in
+    the start script), map or game type, counting the players (not the spectators) of the games that have a winner
+
+    A game is counted once however many demo files of it there are, using one of its demo files that could be read
+    without error.
+    """
+    group = WINRATEGROUPS[args.by]
+    conditions = ['p.spectator = 0', 'g.id IN (SELECT MIN(id) FROM games WHERE error IS NULL AND '
+                                     'winningteam IS NOT NULL GROUP BY gameid)']
+    parameters = list()
+    if args.player is not None:
+        conditions.append('p.name = ?')
+        parameters.append(args.player)
+    gamefilters(args, conditions, parameters)
+    sql = ('SELECT %s AS %s, COUNT(DISTINCT g.gameid) AS games, '
+           'COUNT(DISTINCT CASE WHEN t.won THEN g.gameid END) AS won, '
+           'ROUND(1.0 * COUNT(DISTINCT CASE WHEN t.won THEN g.gameid END) / COUNT(DISTINCT g.gameid), 3) AS rate '
+           'FROM players p JOIN games g ON g.id = p.game '
+           'JOIN teams t ON t.game = p.game AND t.team = p.team%s '
+           'GROUP BY 1 HAVING games >= ? ORDER BY rate DESC, games DESC LIMIT ?') % (group, args.by,
+                                                                                  where(conditions))
+    return sql, parameters + [args.mingames, args.limit]
+
+
+def statquery(args):  # type (argparse.Namespace) -> Tuple[str, List[object]]
+    """
+    Returns the statement and parameters of the average of a team statistic at a minute of the game per map, using
+    the last sample of each team at or before that minute
+    """
+    frame = args.minute * 60 * 30
+    conditions = ['s.frame BETWEEN ? AND ?']
+    parameters = [frame - args.tolerance * 30, frame]
+    gamefilters(args, conditions, parameters)
+    # the frame index limits the samples to a range, SQLite takes the other columns of the row with MAX(frame)
+    sql = ('SELECT map, COUNT(*) AS teams, AVG(value) AS average, MIN(value) AS minimum, MAX(value) AS maximum '
+           'FROM (SELECT g.map AS map, s.game, s.name, MAX(s.frame), s.%s AS value '
+           'FROM teamstats s JOIN games g ON g.id = s.game%s GROUP BY s.game, s.name) '
+           'GROUP BY map ORDER BY teams DESC LIMIT ?') % (args.stat, where(conditions))
+    return sql, parameters + [args.limit]
+
+
+def matchupsquery(args):  # type (argparse.Namespace) -> Tuple[str, List[object]]
+    """
+    Returns the statement and parameters of the pairs of attacking and damaged unit types with the most damage
+    """
+    conditions = list()
+    parameters = list()
+    if args.attacker is not None:
+        conditions.append('d.attacker = ?')
+        parameters.append(args.attacker)
+    gamefilters(args, conditions, parameters)
+    if len(conditions) == 0:
+        # without conditions on games the covering index on the damage table has all that is needed
+        source = 'damage d'
+    else:
+        source = 'damage d JOIN games g ON g.id = d.game'
+    sql = ('SELECT d.attacker, d.victim, SUM(d.damage) AS damage, SUM(d.empdamage) AS empdamage, '
+           'COUNT(*) AS games FROM %s%s GROUP BY d.attacker, d.victim ORDER BY 3 DESC LIMIT ?') % (source,
+                                                                                                 where(conditions))
+    return sql, parameters + [args.limit]
+
+
+# the queries by name, each returns a statement with ? for parameters and the parameters
+QUERIES = {
+    'games': gamesquery,
+    'winrate': winratequery,
+    'stat': statquery,
+    'matchups': matchupsquery
+}
+
+
+def writecsv(out, columns, rows):  # type (file, List[str], Iterator[Tuple]) -> int
+    """
+    Writes rows as CSV with a header line, returns the number of rows
+    """
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    n = 0
+    for row in rows:
+        writer.writerow(row)
+        n += 1
+    return n
+
+
+def writejson(out, columns, rows):  # type (file, List[str], Iterator[Tuple]) -> int
+    """
+    Writes rows as JSON objects, one per line, returns the number of rows
+    """
+    n = 0
+    for row in rows:
+        # demo files have text in any encoding, which json would refuse
+        out.write(json.dumps(dict(zip(columns, row)), encoding='latin-1') + '\n')
+        n += 1
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query the database of parsed demo files made by '
+                                                 'SpringDemoDatabase.py')
+    parser.add_argument('database', help='SQLite database file')
+    parser.add_argument('--format', choices=('csv', 'json'), default='csv',
+                        help='write the rows as CSV or as one JSON object per line (default: csv)')
+    parser.add_argument('--explain', action='store_true', help='show the query plan on stderr')
+    parser.add_argument('--timing', action='store_true', help='show the time the query took on stderr')
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('--map', help='only games on this map')
+    filters.add_argument('--since', type=dateparameter, help='only games from this date (YYYY-MM-DD)')
+    filters.add_argument('--until', type=dateparameter, help='only games before this date (YYYY-MM-DD)')
+    filters.add_argument('--limit', type=int, default=100, help='maximum number of rows (default: 100)')
+    queries = parser.add_subparsers(dest='query')
+    games = queries.add_parser('games', parents=[filters], help='games by player, map and date')
+    games.add_argument('--player', help='only games with this player')
+    winrate = queries.add_parser('winrate', parents=[filters],
+                                 help='games won per player, faction, map or game type')
+    winrate.add_argument('--by', choices=sorted(WINRATEGROUPS), default='player', help='default: player')
+    winrate.add_argument('--player', help='only this player')
+    winrate.add_argument('--mingames', type=int, default=1, help='leave out those with fewer games')
+    stat = queries.add_parser('stat', parents=[filters], help='average team statistic at a minute, per map')
+    stat.add_argument('minute', type=int, help='minute of the game')
+    stat.add_argument('--stat', choices=TEAMSTATFIELDS[1:], default='metalProduced',
+                      help='team statistic (default: metalProduced)')
+    stat.add_argument('--tolerance', type=int, default=60,
+                      help='seconds before the minute a sample may be (default: 60)')
+    matchups = queries.add_parser('matchups', parents=[filters], help='attacking and damaged unit types with '
+                                                                      'the most damage')
+    matchups.add_argument('--attacker', help='only this attacking unit type')
+    chat = queries.add_parser('chat', help='chat messages with a phrase and/or of a speaker, from the chat index')
+    chat.add_argument('phrase', nargs='?', help='words next to each other, regardless of case')
+    chat.add_argument('--speaker', help='only messages of this player')
+    chat.add_argument('--anywhere', action='store_true', help='the words may be anywhere in a message')
+    chat.add_argument('--limit', type=int, default=100, help='maximum number of rows (default: 100)')
+    args = parser.parse_args(argv)
+    if args.query == 'chat' and not args.phrase and not args.speaker:
+        parser.error('give a phrase, a speaker or both')
+
+    # the database is only read, DemoDatabase would create it and its tables if it is not there
+    if not os.path.isfile(args.database):
+        sys.stderr.write('Cannot open ' + args.database + ': no such file\n')
+        return 1
+    try:
+        connection = sqlite3.connect(args.database)
+    except sqlite3.Error, e:
+        sys.stderr.write('Cannot open ' + args.database + ': ' + str(e) + '\n')
+        return 1
+    # demo files have text in whatever encoding the players used
+    connection.text_factory = str
+    try:
+        start = time.time()
+        if args.query == 'chat':
+            # the words of the phrase are looked up in the chat index, not in a query plan
+            chatindex = SpringChatIndex.ChatIndex(connection, create=False)
+            columns = SpringChatIndex.COLUMNS
+            cursor = itertools.islice(chatindex.search(args.phrase, args.speaker, args.anywhere), args.limit)
+        else:
+            sql, parameters = QUERIES[args.query](args)
+            if args.explain:
+                sys.stderr.write(sql + '\n')
+                for row in connection.execute('EXPLAIN QUERY PLAN ' + sql, parameters):
+                    sys.stderr.write('  ' + ' '.join([str(c) for c in row]) + '\n')
+                start = time.time()
+            cursor = connection.execute(sql, parameters)
+            columns = [d[0] for d in cursor.description]
+        if args.format == 'json':
+            n = writejson(sys.stdout, columns, cursor)
+        else:
+            n = writecsv(sys.stdout, columns, cursor)
+        if args.timing:
+            sys.stderr.write('%d rows in %.3f s\n' % (n, time.time() - start))
+    except sqlite3.Error, e:
+        sys.stderr.write('Query failed: ' + str(e) + '\n')
+        return 1
+    finally:
+        connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
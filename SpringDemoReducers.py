@@ -0,0 +1,855 @@
+#!/usr/bin/python
+#
+# SpringDemoReducers - Aggregate the records of a Spring demo stream while it is read
+#
+# The module should be placed in a directory in your Python class path or in the
+# directory of any module that is using it.
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Reducers for DemoFileReader.demostream(), which aggregate the demo records in one pass without keeping them"""
+
+from SpringDemoFile import DemoRecord, SCHEMAS
+import bisect
+import struct
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+
+class ActionTimeline:
+    """
+    Reducer that counts the actions (unit commands, selections and AI commands) of each player per time bin
+
+    The counts are kept per player and record type in an array of unsigned ints per bin, so a game of an hour with
+    16 players takes a few kB.
+    """
+    # the series that can be taken from the timeline and the record types counted in each
+    SERIES = (
+        ('actions', (DemoRecord.COMMAND, DemoRecord.SELECT, DemoRecord.AICOMMAND, DemoRecord.AICOMMANDS)),
+        ('commands', (DemoRecord.COMMAND,)),
+        ('selections', (DemoRecord.SELECT,)),
+        ('aicommands', (DemoRecord.AICOMMAND, DemoRecord.AICOMMANDS))
+    )
+
+    def __init__(self, binsize=60.0):
+        """
+        Initializer, binsize is the length of the time bins in seconds
+        """
+        self.binsize = binsize
+        # the record types reduce() wants to see
+        self.types = (DemoRecord.COMMAND, DemoRecord.SELECT, DemoRecord.AICOMMAND, DemoRecord.AICOMMANDS)
+        # the counts per bin, keyed to (player number, record type)
+        self.counts = dict()
+        # the number of bins up to the last action
+        self.length = 0
+
+    def reduce(self, record):  # type (DemoRecord) -> None
+        """
+        Counts one record
+        """
+        key = (record.player(), record.type())
+        i = int(record.gametime // self.binsize)
+        counts = self.counts.get(key)
+        if counts is None:
+            counts = self.counts[key] = array.array('I')
+        if i >= len(counts):
+            counts.extend([0] * (i + 1 - len(counts)))
+            if i >= self.length:
+                self.length = i + 1
+        counts[i] += 1
+
+    def players(self):  # type () -> List[int]
+        """
+        Returns the numbers of the players that took any action, sorted
+        """
+        return sorted(set([key[0] for key in self.counts]))
+
+    def series(self, player, name='actions', length=None):  # type (int, str, int) -> List[float]
+        """
+        Returns the actions per minute of the player in each bin, for the series with the given name (see SERIES)
+
+        The series is length bins long, by default up to the last action of any player, or None if there is no
+        series with that name
+        """
+        types = dict(self.SERIES).get(name)
+        if types is None:
+            return None
+        if length is None:
+            length = self.length
+        total = [0] * length
+        for t in types:
+            counts = self.counts.get((player, t))
+            if counts is not None:
+                for i in xrange(min(length, len(counts))):
+                    total[i] += counts[i]
+        scale = 60.0 / self.binsize
+        return [n * scale for n in total]
+
+    def total(self, player, name='actions'):  # type (int, str) -> int
+        """
+        Returns the number of actions of the player in the series with the given name over the whole game
+        """
+        return sum([sum(self.counts.get((player, t), ())) for t in dict(self.SERIES).get(name, ())])
+
+
+class BandwidthProfile:
+    """
+    Reducer that sums the number of records and their size in bytes per record type, player and time bin, for all
+    records of the demo stream, to find the players (and Lua widgets) that flood the network
+
+    Records without a player, such as the new frame records of the server, are counted for player None. Lua
+    messages are also summed per Lua script.
+    """
+    def __init__(self, binsize=60.0):
+        """
+        Initializer, binsize is the length of the time bins in seconds
+        """
+        self.binsize = binsize
+        # reduce() wants to see every record
+        self.types = None
+        # the record counts and the bytes per bin, as a tuple of two arrays keyed to (record type, player number)
+        self.bins = dict()
+        # the records and the bytes, as a list, keyed to (Lua script, player number)
+        self.luascripts = dict()
+        # the number of bins up to the last record
+        self.length = 0
+
+    def reduce(self, record):  # type (DemoRecord) -> None
+        """
+        Counts one record
+        """
+        t = record.type()
+        key = (t, record.player())
+        size = len(record.data)
+        i = int(record.gametime // self.binsize)
+        bins = self.bins.get(key)
+        if bins is None:
+            bins = self.bins[key] = (array.array('I'), array.array('I'))
+        if i >= len(bins[0]):
+            padding = [0] * (i + 1 - len(bins[0]))
+            bins[0].extend(padding)
+            bins[1].extend(padding)
+            if i >= self.length:
+                self.length = i + 1
+        bins[0][i] += 1
+        bins[1][i] += size
+        if t == DemoRecord.LUAMSG and size >= 6:
+            key = (ord(record.data[4]) + 256 * ord(record.data[5]), key[1])
+            totals = self.luascripts.get(key)
+            if totals is None:
+                totals = self.luascripts[key] = [0, 0]
+            totals[0] += 1
+            totals[1] += size
+
+    def series(self, players=None, types=None, what='bytes'):  # type (List[int], List[int], str) -> List[int]
+        """
+        Returns the sum of the bytes (or with what 'records', the number of records) per bin of the given players
+        and record types, by default all of them
+        """
+        which = 1 if what == 'bytes' else 0
+        total = [0] * self.length
+        for key in self.bins:
+            if (types is None or key[0] in types) and (players is None or key[1] in players):
+                values = self.bins[key][which]
+                for i in xrange(len(values)):
+                    total[i] += values[i]
+        return total
+
+    def totals(self, by='player'):  # type (str) -> Dict[int, Tuple[int, int, int]]
+        """
+        Returns a dictionary keyed to player number (by 'player') or record type (by 'type') of the number of
+        records, the number of bytes and the largest number of bytes in a single bin
+        """
+        index = 1 if by == 'player' else 0
+        result = dict()
+        for key in set([k[index] for k in self.bins]):
+            if index == 1:
+                values = self.series(players=(key,))
+                records = sum(self.series(players=(key,), what='records'))
+            else:
+                values = self.series(types=(key,))
+                records = sum(self.series(types=(key,), what='records'))
+            result[key] = (records, sum(values), max(values) if len(values) > 0 else 0)
+        return result
+
+    def top(self, by='player', n=10):  # type (str, int) -> List[Tuple[int, int, int, int]]
+        """
+        Returns the n players (or record types) that sent the most bytes as tuples of the player number (or record
+        type), records, bytes and the largest number of bytes in a bin, largest first
+        """
+        totals = self.totals(by)
+        result = [(key,) + totals[key] for key in totals]
+        result.sort(key=lambda r: -r[2])
+        return result[:n]
+
+    def share(self, key, by='player'):  # type (int, str) -> Union[None, int]
+        """
+        Returns the record type that makes up most of the bytes of a player (by 'player') or the player that sends
+        most of the bytes of a record type (by 'type'), or None if there are no records of it
+        """
+        index = 1 if by == 'player' else 0
+        best = None
+        largest = -1
+        for k in self.bins:
+            if k[index] == key:
+                size = sum(self.bins[k][1])
+                if size > largest:
+                    largest = size
+                    best = k[1 - index]
+        return best
+
+
+class SpeedProfile:
+    """
+    Reducer that profiles the speed of the simulation and the load of the players over the game
+
+    The new frame and key frame records are counted per time bin of the demo chunk time (which includes the time
+    the game is slowed down), which gives the simulated frames per second, 30 at normal game speed. The game speed
+    changes asked for by the players and made by the server are kept as they are, the CPU usage and ping reported
+    for each player in the player info records are averaged per bin.
+    """
+    # the simulation runs at 30 frames per game second
+    GAMEFPS = 30.0
+    # the per player series that can be taken from the profile
+    SERIES = ('cpu', 'ping')
+
+    def __init__(self, binsize=10.0):
+        """
+        Initializer, binsize is the length of the time bins in seconds
+        """
+        self.binsize = binsize
+        # the record types reduce() wants to see
+        self.types = (DemoRecord.KEYFRAME, DemoRecord.NEWFRAME, DemoRecord.USER_SPEED, DemoRecord.INTERNAL_SPEED,
+                      DemoRecord.CPU_USAGE, DemoRecord.PLAYERINFO)
+        # frames per bin
+        self.frames = array.array('I')
+        # (gametime, player, speed) of the speed changes asked for by players and (gametime, speed) of the changes
+        # made by the server
+        self.userspeeds = list()
+        self.internalspeeds = list()
+        # the sums of the CPU usage and ping and the number of reports per bin, keyed to player number
+        self.players = dict()
+        # the sum of the CPU usage records and their number per bin
+        self.cpuusage = (array.array('d'), array.array('I'))
+        # chunk time of the last frame
+        self.lastgametime = 0.0
+        self._decoders = dict([(t, SCHEMAS[t].decode) for t in self.types])
+
+    @staticmethod
+    def grow(arrays, length):
+        """
+        Extends the arrays with zeros to the given length
+        """
+        for values in arrays:
+            if len(values) < length:
+                values.extend([0] * (length - len(values)))
+
+    def reduce(self, record):  # type (DemoRecord) -> None
+        """
+        Counts one record
+        """
+        t = record.type()
+        i = int(record.gametime // self.binsize)
+        if t == DemoRecord.NEWFRAME or t == DemoRecord.KEYFRAME:
+            self.lastgametime = record.gametime
+            if i >= len(self.frames):
+                self.grow((self.frames,), i + 1)
+            self.frames[i] += 1
+            return
+        event = self._decoders[t](record.gametime, record.data)
+        if event is None:
+            return
+        if t == DemoRecord.PLAYERINFO:
+            sums = self.players.get(event.player)
+            if sums is None:
+                sums = self.players[event.player] = (array.array('d'), array.array('d'), array.array('I'))
+            if i >= len(sums[2]):
+                self.grow(sums, i + 1)
+            sums[0][i] += event.cpuusage
+            sums[1][i] += event.ping
+            sums[2][i] += 1
+        elif t == DemoRecord.CPU_USAGE:
+            if i >= len(self.cpuusage[1]):
+                self.grow(self.cpuusage, i + 1)
+            self.cpuusage[0][i] += event.usage
+            self.cpuusage[1][i] += 1
+        elif t == DemoRecord.USER_SPEED:
+            self.userspeeds.append((event.gametime, event.player, event.speed))
+        elif t == DemoRecord.INTERNAL_SPEED:
+            self.internalspeeds.append((event.gametime, event.speed))
+
+    def fps(self):  # type () -> List[float]
+        """
+        Returns the simulated frames per second in each bin, the last bin only counts up to the last frame and is
+        left out if that is the only frame in it
+        """
+        result = [n / self.binsize for n in self.frames]
+        if len(result) > 0:
+            span = self.lastgametime - (len(result) - 1) * self.binsize
+            if span < 1.0 / self.GAMEFPS:
+                result.pop()
+            else:
+                result[-1] = self.frames[-1] / span
+        return result
+
+    def speedat(self, t):  # type (float) -> float
+        """
+        Returns the game speed asked for by the players at chunk time t, 1.0 if they did not ask for another
+        """
+        speed = 1.0
+        for gametime, player, s in self.userspeeds:
+            if gametime > t:
+                break
+            speed = s
+        return speed
+
+    def slowdowns(self, threshold=0.9):  # type (float) -> List[Tuple[float, float, float]]
+        """
+        Returns the periods in which the simulation ran slower than threshold times the speed asked for, as tuples
+        of the start and the end (in seconds of chunk time) and the lowest frames per second in the period
+        """
+        result = list()
+        start = None
+        lowest = None
+        fps = self.fps()
+        for i in xrange(len(fps)):
+            slow = fps[i] < threshold * self.GAMEFPS * self.speedat(i * self.binsize)
+            if slow:
+                if start is None:
+                    start = i * self.binsize
+                    lowest = fps[i]
+                lowest = min(lowest, fps[i])
+            elif start is not None:
+                result.append((start, i * self.binsize, lowest))
+                start = None
+        if start is not None:
+            result.append((start, self.lastgametime, lowest))
+        return result
+
+    def series(self, player, name='cpu', length=None):  # type (int, str, int) -> List[float]
+        """
+        Returns the average CPU usage (as a fraction) or ping of the player in each bin, a bin without a report
+        holds the value of the bin before it, or None if there is no series with that name
+
+        The series is length bins long, by default up to the last frame
+        """
+        if name not in self.SERIES:
+            return None
+        if length is None:
+            length = len(self.frames)
+        result = [0.0] * length
+        sums = self.players.get(player)
+        if sums is None:
+            return result
+        index = self.SERIES.index(name)
+        value = 0.0
+        for i in xrange(length):
+            if i < len(sums[2]) and sums[2][i] > 0:
+                value = sums[index][i] / sums[2][i]
+            result[i] = value
+        return result
+
+    def laggiest(self, n=10):  # type (int) -> List[Tuple[int, float, float, float, float]]
+        """
+        Returns the n players with the highest average CPU usage as tuples of the player number, the average and
+        peak CPU usage and the average and peak ping, highest first
+        """
+        result = list()
+        for player in self.players:
+            sums = self.players[player]
+            reports = sum(sums[2])
+            if reports == 0:
+                continue
+            cpu = [sums[0][i] / sums[2][i] for i in xrange(len(sums[2])) if sums[2][i] > 0]
+            ping = [sums[1][i] / sums[2][i] for i in xrange(len(sums[2])) if sums[2][i] > 0]
+            result.append((player, sum(sums[0]) / reports, max(cpu), sum(sums[1]) / reports, max(ping)))
+        result.sort(key=lambda r: -r[1])
+        return result[:n]
+
+
+class RosterIndex:
+    """
+    Reducer that keeps track of who was connected to the game when, as intervals of presence per player
+
+    A player joins when the name is announced (PLAYERNAME) and leaves with a PLAYERLEFT record, players added during
+    the game (CREATE_NEWPLAYER) are announced by name before they join. Players that are still connected at the end
+    are connected up to the last key frame. The queries bisect an index that is built on the first query after the
+    stream is read, so who was in the game at some time is answered in O(log n) of the number of joins and leaves.
+    """
+    # the reasons given in the PLAYERLEFT records
+    REASONS = ('lost connection', 'left', 'kicked')
+
+    def __init__(self, players=None):
+        """
+        Initializer, players is the player list of the start script (see DemoFileReader.players) to name the players
+        and tell the spectators before they join, or None
+        """
+        # the record types reduce() wants to see, key frames to know where the stream ends
+        self.types = (DemoRecord.PLAYERNAME, DemoRecord.PLAYERLEFT, DemoRecord.CREATE_NEWPLAYER, DemoRecord.KEYFRAME)
+        # player number to name, and the player numbers of the spectators
+        self.names = dict()
+        self.spectators = set()
+        # per player number, a list of [join, leave, reason] for each time the player was connected, leave and
+        # reason are None while connected
+        self.intervals = dict()
+        # (gametime, player, joined) of the joins and leaves, in the order of the stream
+        self.events = list()
+        # chunk time of the last key frame or roster record
+        self.lastgametime = 0.0
+        # the names of the players added during the game that have not joined yet, to their spectator flag
+        self._added = dict()
+        # the index: times at which the roster changes, the players connected from each of them on and the join
+        # times per player
+        self._times = None
+        self._present = None
+        self._joins = None
+        self._decoders = dict([(t, SCHEMAS[t].decode) for t in self.types])
+        if players is not None:
+            for p in players:
+                self.names[p[4]] = p[0]
+                if p[1] == -1:
+                    self.spectators.add(p[4])
+
+    def reduce(self, record):  # type (DemoRecord) -> None
+        """
+        Records a join or leave
+        """
+        t = record.type()
+        if t == DemoRecord.KEYFRAME:
+            self.lastgametime = record.gametime
+            return
+        event = self._decoders[t](record.gametime, record.data)
+        if event is None:
+            return
+        self.lastgametime = max(self.lastgametime, event.gametime)
+        if t == DemoRecord.CREATE_NEWPLAYER:
+            # the player number in the record is meaningless, the player is known by name until joining
+            self._added[event.name] = event.spectator != 0
+        elif t == DemoRecord.PLAYERNAME:
+            self.names[event.player] = event.name
+            if event.name in self._added:
+                if self._added.pop(event.name):
+                    self.spectators.add(event.player)
+                else:
+                    self.spectators.discard(event.player)
+            spans = self.intervals.setdefault(event.player, list())
+            if len(spans) == 0 or spans[-1][1] is not None:
+                spans.append([event.gametime, None, None])
+                self.events.append((event.gametime, event.player, True))
+                self._times = None
+        elif t == DemoRecord.PLAYERLEFT:
+            spans = self.intervals.setdefault(event.player, list())
+            if len(spans) == 0:
+                # never announced, so connected from the start
+                spans.append([0.0, None, None])
+                self.events.append((0.0, event.player, True))
+            if spans[-1][1] is None:
+                spans[-1][1] = event.gametime
+                spans[-1][2] = event.reason
+                self.events.append((event.gametime, event.player, False))
+                self._times = None
+
+    def _index(self):
+        """
+        Builds the index for the queries, if the roster changed since it was last built
+        """
+        if self._times is not None:
+            return
+        self._times = list()
+        self._present = list()
+        present = set()
+        # stable, so the joins and leaves at the same time are applied in the order of the stream
+        for gametime, player, joined in sorted(self.events, key=lambda e: e[0]):
+            if joined:
+                present.add(player)
+            else:
+                present.discard(player)
+            if len(self._times) > 0 and self._times[-1] == gametime:
+                self._present[-1] = frozenset(present)
+            else:
+                self._times.append(gametime)
+                self._present.append(frozenset(present))
+        self._joins = dict([(p, [span[0] for span in self.intervals[p]]) for p in self.intervals])
+
+    def active(self, t):  # type (float) -> FrozenSet[int]
+        """
+        Returns the numbers of the players connected at chunk time t
+        """
+        self._index()
+        i = bisect.bisect_right(self._times, t) - 1
+        if i < 0 or t > self.lastgametime:
+            return frozenset()
+        return self._present[i]
+
+    def connectedat(self, player, t):  # type (int, float) -> bool
+        """
+        Returns True if the player was connected at chunk time t
+        """
+        self._index()
+        joins = self._joins.get(player)
+        if joins is None:
+            return False
+        i = bisect.bisect_right(joins, t) - 1
+        if i < 0:
+            return False
+        leave = self.intervals[player][i][1]
+        if leave is None:
+            return t <= self.lastgametime
+        return t < leave
+
+    def connected(self, player):  # type (int) -> float
+        """
+        Returns the number of seconds (of chunk time) the player was connected
+        """
+        total = 0.0
+        for join, leave, reason in self.intervals.get(player, ()):
+            if leave is None:
+                leave = self.lastgametime
+            total += leave - join
+        return total
+
+    def players(self):  # type () -> List[int]
+        """
+        Returns the numbers of the players that joined the game
+        """
+        return sorted(self.intervals.keys())
+
+    def leavers(self, before=None):  # type (float) -> List[Tuple[float, int, int]]
+        """
+        Returns the players that were not connected at the end of the game as tuples of the time they left, their
+        number and the reason (see REASONS), in the order they left
+
+        With before set only the players that left before that chunk time count, which leaves out those that left
+        after the game was over.
+        """
+        result = list()
+        for player in self.intervals:
+            join, leave, reason = self.intervals[player][-1]
+            if leave is None or (before is not None and leave >= before):
+                continue
+            result.append((leave, player, reason))
+        result.sort()
+        return result
+
+    def rows(self):  # type () -> List[Tuple[int, str, bool, float, float, Union[None, int]]]
+        """
+        Returns the intervals as plain tuples of the player number, name, spectator flag, join and leave time and
+        the reason for leaving, None for the players that were connected at the end, ordered by join time
+        """
+        result = list()
+        for player in self.intervals:
+            for join, leave, reason in self.intervals[player]:
+                if leave is None:
+                    leave = self.lastgametime
+                result.append((player, self.names.get(player), player in self.spectators, join, leave, reason))
+        result.sort(key=lambda r: (r[3], r[0]))
+        return result
+
+
+def teams(players):  # type (List[Tuple]) -> Dict[int, List[int]]
+    """
+    Returns the player numbers per ally team of the player list of the start script (see DemoFileReader.players),
+    the spectators are in team -1
+    """
+    result = dict()
+    for p in players:
+        if len(p) < 5:
+            # added during the game, without a number in the start script
+            continue
+        result.setdefault(p[1], list()).append(p[4])
+    return result
+
+
+class Heatmap:
+    """
+    Counts of map positions in square cells of cellsize elmos (a map square is 512 elmos)
+
+    The grid grows to fit the positions that are added, so heatmaps of games on the same map can be merged without
+    knowing the size of the map. The counts are a NumPy array of rows (along z) if NumPy is available, a flat array
+    of unsigned ints row by row otherwise.
+    """
+    def __init__(self, cellsize=128):
+        """
+        Initializer, cellsize is the size of the cells in elmos
+        """
+        self.cellsize = cellsize
+        # size of the grid in cells along x and z
+        self.width = 0
+        self.height = 0
+        self.counts = None
+        # the number of positions counted
+        self.total = 0
+        self.resize(0, 0)
+
+    def resize(self, width, height):  # type (int, int) -> None
+        """
+        Grows the grid to at least width by height cells, keeping the counts
+        """
+        width = max(width, self.width)
+        height = max(height, self.height)
+        if self.counts is not None and width == self.width and height == self.height:
+            return
+        if numpy is not None:
+            counts = numpy.zeros((height, width), dtype=numpy.uint32)
+            if self.counts is not None:
+                counts[:self.height, :self.width] = self.counts
+        else:
+            counts = array.array('I', [0]) * (width * height)
+            for z in xrange(self.height):
+                counts[z * width:z * width + self.width] = self.counts[z * self.width:(z + 1) * self.width]
+        self.counts = counts
+        self.width = width
+        self.height = height
+
+    def add(self, xs, zs):  # type (Sequence[int], Sequence[int]) -> None
+        """
+        Counts the positions with the coordinates (in elmos) in xs and zs, positions off the map are left out
+        """
+        if numpy is not None:
+            xs = numpy.asarray(xs, dtype=numpy.int32) // self.cellsize
+            zs = numpy.asarray(zs, dtype=numpy.int32) // self.cellsize
+            keep = (xs >= 0) & (zs >= 0)
+            xs = xs[keep]
+            zs = zs[keep]
+            if len(xs) == 0:
+                return
+            self.resize(int(xs.max()) + 1, int(zs.max()) + 1)
+            cells = numpy.bincount(zs * self.width + xs, minlength=self.width * self.height)
+            self.counts += cells.reshape((self.height, self.width)).astype(numpy.uint32)
+            self.total += len(xs)
+            return
+        cells = [(int(x) // self.cellsize, int(z) // self.cellsize) for x, z in zip(xs, zs) if x >= 0 and z >= 0]
+        if len(cells) == 0:
+            return
+        self.resize(max([c[0] for c in cells]) + 1, max([c[1] for c in cells]) + 1)
+        counts = self.counts
+        width = self.width
+        for x, z in cells:
+            counts[z * width + x] += 1
+        self.total += len(cells)
+
+    def merge(self, other):  # type (Heatmap) -> None
+        """
+        Adds the counts of another heatmap with the same cell size
+        """
+        if other.cellsize != self.cellsize:
+            raise ValueError('Cannot merge heatmaps with cells of %d and %d elmos' % (self.cellsize, other.cellsize))
+        self.resize(other.width, other.height)
+        if numpy is not None:
+            self.counts[:other.height, :other.width] += other.counts
+        else:
+            for z in xrange(other.height):
+                for x in xrange(other.width):
+                    self.counts[z * self.width + x] += other.counts[z * other.width + x]
+        self.total += other.total
+
+    def rows(self):  # type () -> List[List[int]]
+        """
+        Returns the counts as a list of rows of ints, from z = 0 on
+        """
+        if numpy is not None:
+            return self.counts.tolist()
+        return [self.counts[z * self.width:(z + 1) * self.width].tolist() for z in xrange(self.height)]
+
+    def peak(self):  # type () -> int
+        """
+        Returns the highest count in a cell
+        """
+        if self.width == 0 or self.height == 0:
+            return 0
+        return int(self.counts.max() if numpy is not None else max(self.counts))
+
+    def todict(self):  # type () -> Dict[str, object]
+        """
+        Returns the heatmap as a dictionary of plain values, to store it as JSON
+        """
+        return {'cellsize': self.cellsize, 'width': self.width, 'height': self.height, 'total': self.total,
+                'rows': self.rows()}
+
+    @staticmethod
+    def fromdict(values):  # type (Dict[str, object]) -> Heatmap
+        """
+        Returns the heatmap stored with todict()
+        """
+        heatmap = Heatmap(values['cellsize'])
+        heatmap.resize(values['width'], values['height'])
+        for z, row in enumerate(values['rows']):
+            if numpy is not None:
+                heatmap.counts[z, :len(row)] = row
+            else:
+                heatmap.counts[z * heatmap.width:z * heatmap.width + len(row)] = array.array('I', row)
+        heatmap.total = values['total']
+        return heatmap
+
+
+class MapDrawings:
+    """
+    Reducer that collects the map drawings (points, lines and erasures) of the players in arrays
+
+    The player, action, chunk time and coordinates (in elmos) of each drawing go into parallel arrays, lines also
+    have their end in xs2 and zs2 (the other drawings have their position there again). The labels of points are
+    kept by index. Heatmaps take the arrays as they are, through NumPy if it is available.
+    """
+    # the actions of the MAPDRAW records
+    POINT = 0
+    ERASE = 1
+    LINE = 2
+
+    _position = struct.Struct('<hh')
+    _line = struct.Struct('<hhhh')
+
+    def __init__(self):
+        """
+        Initializer
+        """
+        # the record types reduce() wants to see
+        self.types = (DemoRecord.MAPDRAW,)
+        self.gametimes = array.array('f')
+        self.players = array.array('B')
+        self.actions = array.array('B')
+        self.xs = array.array('h')
+        self.zs = array.array('h')
+        self.xs2 = array.array('h')
+        self.zs2 = array.array('h')
+        # the labels of the points that have one, keyed to the index of the drawing
+        self.labels = dict()
+
+    def reduce(self, record):  # type (DemoRecord) -> None
+        """
+        Decodes one drawing
+        """
+        data = record.data
+        if len(data) < 8:
+            return
+        action = ord(data[3])
+        if action == self.LINE:
+            if len(data) < 12:
+                return
+            x, z, x2, z2 = self._line.unpack_from(data, 4)
+        else:
+            x, z = self._position.unpack_from(data, 4)
+            x2 = x
+            z2 = z
+        if action == self.POINT:
+            label = record.text()
+            if label is not None:
+                self.labels[len(self.actions)] = label
+        self.gametimes.append(record.gametime)
+        self.players.append(ord(data[2]))
+        self.actions.append(action)
+        self.xs.append(x)
+        self.zs.append(z)
+        self.xs2.append(x2)
+        self.zs2.append(z2)
+
+    def __len__(self):
+        return len(self.actions)
+
+    def select(self, players=None, actions=(POINT,)):  # type (Iterable[int], Iterable[int]) -> Tuple[Sequence[int], Sequence[int]]
+        """
+        Returns the x and z coordinates of the drawings of the given players (None for everyone) and actions
+        """
+        if numpy is not None and len(self.actions) > 0:
+            xs = numpy.frombuffer(self.xs, dtype=numpy.int16)
+            zs = numpy.frombuffer(self.zs, dtype=numpy.int16)
+            keep = numpy.in1d(numpy.frombuffer(self.actions, dtype=numpy.uint8), list(actions))
+            if players is not None:
+                keep &= numpy.in1d(numpy.frombuffer(self.players, dtype=numpy.uint8), list(players))
+            return xs[keep], zs[keep]
+        actions = frozenset(actions)
+        if players is not None:
+            players = frozenset(players)
+        index = [i for i in xrange(len(self.actions))
+                 if self.actions[i] in actions and (players is None or self.players[i] in players)]
+        return [self.xs[i] for i in index], [self.zs[i] for i in index]
+
+    def heatmap(self, players=None, actions=(POINT,), cellsize=128):  # type (Iterable[int], Iterable[int], int) -> Heatmap
+        """
+        Returns the heatmap of the drawings of the given players (None for everyone) and actions, by default where
+        they put their points
+        """
+        heatmap = Heatmap(cellsize)
+        heatmap.add(*self.select(players, actions))
+        return heatmap
+
+    def heatmaps(self, groups, actions=(POINT,), cellsize=128):  # type (Dict[object, Iterable[int]], Iterable[int], int) -> Dict[object, Heatmap]
+        """
+        Returns a heatmap per group of players, groups maps a key to the player numbers in it (see teams())
+        """
+        return dict([(key, self.heatmap(groups[key], actions, cellsize)) for key in groups])
+
+    def rows(self):  # type () -> List[Tuple[float, int, int, int, int, int, int]]
+        """
+        Returns the drawings as plain tuples of the chunk time, player, action and the coordinates of the start and
+        the end
+        """
+        return zip(self.gametimes.tolist(), self.players.tolist(), self.actions.tolist(), self.xs.tolist(),
+                   self.zs.tolist(), self.xs2.tolist(), self.zs2.tolist())
+
+
+class StartPositions:
+    """
+    Reducer that keeps the start position of each team, chosen before the game starts
+
+    Players may move their start position any number of times before the game starts, the last one counts. Start
+    positions fixed in the start script (startposx and startposz of a team) count for the teams that did not send
+    one.
+    """
+    def __init__(self, settings=None):
+        """
+        Initializer, settings are the settings of the start script (see DemoFileReader.settings) or None
+        """
+        # the record types reduce() wants to see
+        self.types = (DemoRecord.STARTPOS,)
+        # team number to (player, x, y, z, ready) of the last start position, the player that set it is None for
+        # the positions of the start script
+        self.positions = dict()
+        self._decode = SCHEMAS[DemoRecord.STARTPOS].decode
+        if settings is None or not isinstance(settings.get('game'), dict):
+            return
+        for name, values in settings['game'].items():
+            if not name.startswith('team') or not name[4:].isdigit() or not isinstance(values, dict):
+                continue
+            values = dict([(key.lower(), value) for key, value in values.items()])
+            try:
+                self.positions[int(name[4:])] = (None, float(values['startposx']), 0.0,
+                                                 float(values['startposz']), 2)
+            except (KeyError, ValueError):
+                continue
+
+    def reduce(self, record):  # type (DemoRecord) -> None
+        """
+        Records a start position
+        """
+        event = self._decode(record.gametime, record.data)
+        if event is None:
+            return
+        self.positions[event.team] = (event.player, event.x, event.y, event.z, event.ready)
+
+    def rows(self):  # type () -> List[Tuple[int, Union[None, int], float, float, float, int]]
+        """
+        Returns the start positions as plain tuples of the team, the player that set it (None if it is from the start
+        script), the coordinates and the ready state, ordered by team
+        """
+        return [(team,) + self.positions[team] for team in sorted(self.positions)]
@@ -0,0 +1,523 @@
+#!/usr/bin/python
+#
+# SpringDemoStore - Keep many demo files of the same games in a directory of content addressed chunks
+#
+# To run: python SpringDemoStore.py store add demos/
+#         python SpringDemoStore.py store extract game.sdfz -o game.sdfz
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Deduplicating store of demo files, split at record boundaries into chunks that are stored once by their hash"""
+
+from SpringDemoFile import DemoFileReader
+import SpringDemoBatch
+import argparse
+import hashlib
+import tempfile
+import bisect
+import struct
+import array
+import gzip
+import json
+import zlib
+import sys
+import os
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# a chunk of the demo stream ends after a record whose data hashes to 0 under this mask, once it is MINCHUNK bytes,
+# which makes chunks of about 8 kB that end at the same records in demo files with the same records
+CUTMASK = 0x1ff
+MINCHUNK = 2048
+MAXCHUNK = 65536
+
+
+def packheaders(times, lengths):  # type (array.array, array.array) -> str
+    """
+    Returns the chunk headers of a demo stream, the chunk times (as the bits of the float) and the record lengths,
+    as the data of a chunk: the number of records, the differences between the times, which are small and repeat a
+    lot so they compress well, and the lengths
+    """
+    deltas = array.array('I', times)
+    for i in xrange(len(deltas) - 1, 0, -1):
+        deltas[i] = (deltas[i] - deltas[i - 1]) & 0xffffffff
+    lengths = array.array('I', lengths)
+    if sys.byteorder == 'big':
+        deltas.byteswap()
+        lengths.byteswap()
+    return struct.pack('<I', len(deltas)) + deltas.tostring() + lengths.tostring()
+
+
+def unpackheaders(data):  # type (str) -> Tuple[array.array, array.array]
+    """
+    Returns the chunk times (as the bits of the float) and the record lengths of the data made by packheaders()
+    """
+    n = struct.unpack_from('<I', data)[0]
+    times = array.array('I')
+    times.fromstring(data[4:4 + 4 * n])
+    lengths = array.array('I')
+    lengths.fromstring(data[4 + 4 * n:4 + 8 * n])
+    if sys.byteorder == 'big':
+        times.byteswap()
+        lengths.byteswap()
+    for i in xrange(1, n):
+        times[i] = (times[i] + times[i - 1]) & 0xffffffff
+    return times, lengths
+
+
+class StoreFile:
+    """
+    File like object that reads a demo file from the chunks of a store, decompressing one chunk at a time
+
+    The chunks of the demo stream hold only the record data, the chunk headers are put back in front of each record
+    from the chunk with the chunk headers of the demo file.
+    """
+    def __init__(self, store, manifest):
+        """
+        Initializer, manifest is the manifest of the demo file in the store
+        """
+        self.store = store
+        self.name = manifest['name']
+        self.size = manifest['size']
+        self.chunks = [c[0] for c in manifest['chunks']]
+        # the digest of the chunk with the chunk headers, its times and lengths are read when first needed
+        self.headers = manifest.get('headers')
+        self._times = None
+        self._lengths = None
+        # the offset of the start of each chunk, and the first record and the number of records of the chunks of
+        # the demo stream (the other chunks have no records)
+        self.offsets = list()
+        self.records = list()
+        offset = 0
+        first = 0
+        for chunk in manifest['chunks']:
+            self.offsets.append(offset)
+            offset += chunk[1]
+            n = chunk[2] if len(chunk) > 2 else 0
+            self.records.append((first, n))
+            first += n
+        self.position = 0
+        # the index and data of the chunk read last
+        self._index = None
+        self._data = None
+
+    def read(self, size=-1):  # type (int) -> str
+        """
+        Reads size bytes, or up to the end if size is negative
+        """
+        if size < 0:
+            size = self.size - self.position
+        size = max(0, min(size, self.size - self.position))
+        parts = list()
+        while size > 0:
+            i = bisect.bisect_right(self.offsets, self.position) - 1
+            if i != self._index:
+                self._data = self.chunkdata(i)
+                self._index = i
+            start = self.position - self.offsets[i]
+            part = self._data[start:start + size]
+            parts.append(part)
+            self.position += len(part)
+            size -= len(part)
+        return ''.join(parts)
+
+    def chunkdata(self, i):  # type (int) -> str
+        """
+        Returns the bytes of the demo file in chunk i, with the chunk headers put back if it is part of the demo stream
+        """
+        data = self.store.chunk(self.chunks[i])
+        first, n = self.records[i]
+        if n == 0:
+            return data
+        if self._times is None:
+            self._times, self._lengths = unpackheaders(self.store.chunk(self.headers))
+        chunkheader = struct.Struct('<II')
+        parts = list()
+        offset = 0
+        for j in xrange(first, first + n):
+            length = self._lengths[j]
+            parts.append(chunkheader.pack(self._times[j], length))
+            parts.append(data[offset:offset + length])
+            offset += length
+        return ''.join(parts)
+
+    def seek(self, offset, whence=0):  # type (int, int) -> None
+        """
+        Moves to offset from the start (whence 0), the current position (1) or the end (2)
+        """
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            offset += self.size
+        self.position = max(0, offset)
+
+    def tell(self):  # type () -> int
+        """
+        Returns the current position
+        """
+        return self.position
+
+    def close(self):
+        """
+        Drops the chunk read last
+        """
+        self._index = None
+        self._data = None
+
+
+class DemoStore:
+    """
+    Class whose instance keeps demo files in a directory, split into content addressed chunks
+
+    The header and start script of a demo file are a chunk each, the record data of the demo stream is split after
+    the records that hash to a cut point (see CUTMASK), and the statistics at the end are a chunk. The chunk headers
+    of the demo stream (the chunk times, which depend on who recorded the demo file, and the record lengths) are a
+    chunk of their own, so demo files of the same game recorded by different players share all chunks but that one
+    and the header. Chunks are stored once, compressed, under their SHA-1 in <store>/chunks and each demo file has a
+    manifest with the list of its chunks in <store>/demos. The demo files
+    are stored uncompressed (the chunks are compressed): extract() compresses .sdfz files again, which gives the same
+    demo file but not necessarily the same bytes of the gzip file.
+    """
+    def __init__(self, root):
+        """
+        Initializer, root is the directory of the store, which is created if it does not exist
+        """
+        self.root = root
+        self.chunkdir = os.path.join(root, 'chunks')
+        self.demodir = os.path.join(root, 'demos')
+        for path in (self.chunkdir, self.demodir):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        self._lasterror = None
+
+    def chunkpath(self, digest):  # type (str) -> str
+        """
+        Returns the path of the chunk with the given SHA-1 (in hex)
+        """
+        return os.path.join(self.chunkdir, digest[:2], digest)
+
+    def chunk(self, digest):  # type (str) -> str
+        """
+        Returns the data of the chunk with the given SHA-1 (in hex)
+        """
+        f = open(self.chunkpath(digest), 'rb')
+        try:
+            return zlib.decompress(f.read())
+        finally:
+            f.close()
+
+    def putchunk(self, data):  # type (str) -> Tuple[str, int]
+        """
+        Stores a chunk if the store does not have it yet, returns its SHA-1 (in hex) and the number of bytes it takes
+        on disk if it was new, 0 if the store had it
+        """
+        digest = hashlib.sha1(data).hexdigest()
+        path = self.chunkpath(digest)
+        if os.path.exists(path):
+            return digest, 0
+        stored = zlib.compress(data, 6)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        # write to a temporary file first, so a chunk is never there half written
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        f = os.fdopen(fd, 'wb')
+        try:
+            f.write(stored)
+        finally:
+            f.close()
+        if os.path.exists(path):
+            os.remove(tmp)
+            return digest, 0
+        os.rename(tmp, path)
+        return digest, len(stored)
+
+    def split(self, reader, times, lengths):  # type (DemoFileReader, array, array) -> Iterator[Tuple[str, int]]
+        """
+        Generates the chunks of the demo file of the reader, whose header has been read, as the data of the chunk and
+        its number of demo records, and appends the chunk time (the bits of the float) and the length of every
+        record to times and lengths
+
+        The chunks of the demo stream hold only the record data, the chunk times depend on who recorded the demo
+        file, so they are left out to make the chunks the same in every copy of a game. A demo file that ends in
+        the middle of a chunk header or of a record, like that of a game that crashed, ends with a chunk of the
+        bytes of that header and record as they are.
+        """
+        f = reader.file
+        f.seek(0)
+        yield f.read(reader.headersize), 0
+        yield f.read(reader.scriptsize), 0
+        chunkheader = struct.Struct('<II')
+        parts = list()
+        size = 0
+        n = 0
+        while n < reader.demostreamsize:
+            header = f.read(chunkheader.size)
+            if len(header) != chunkheader.size:
+                if len(parts) > 0:
+                    yield ''.join(parts), len(parts)
+                    parts = list()
+                if len(header) > 0:
+                    yield header, 0
+                break
+            time, length = chunkheader.unpack(header)
+            data = f.read(length)
+            if len(data) != length:
+                if len(parts) > 0:
+                    yield ''.join(parts), len(parts)
+                    parts = list()
+                yield header + data, 0
+                break
+            times.append(time)
+            lengths.append(length)
+            parts.append(data)
+            size += len(data)
+            n += len(header) + len(data)
+            if size >= MAXCHUNK or (size >= MINCHUNK and zlib.crc32(data) & CUTMASK == 0):
+                yield ''.join(parts), len(parts)
+                parts = list()
+                size = 0
+        if len(parts) > 0:
+            yield ''.join(parts), len(parts)
+        # the statistics and whatever else follows the demo stream
+        while True:
+            data = f.read(MAXCHUNK)
+            if len(data) == 0:
+                break
+            yield data, 0
+
+    def add(self, filename, name=None):  # type (str, str) -> Union[None, Dict[str, object]]
+        """
+        Stores a demo file under name, by default its file name, replacing a demo file stored under that name
+
+        Returns the manifest of the demo file or None if it cannot be read, the manifest has the number of bytes the
+        chunks that were new to the store take on disk in 'newbytes'
+        """
+        if name is None:
+            name = os.path.basename(filename)
+        try:
+            reader = DemoFileReader(filename, dirname=None)
+        except (IOError, OSError), e:
+            self._lasterror = str(e)
+            return None
+        try:
+            if not reader.header():
+                self._lasterror = reader.errormessage()
+                return None
+            manifest = {
+                'name': name,
+                'compressed': reader.metrics['compressed'],
+                'size': 0,
+                'newbytes': 0,
+                'headers': None,
+                'chunks': list()
+            }
+            times = array.array('I')
+            lengths = array.array('I')
+            for data, records in self.split(reader, times, lengths):
+                digest, stored = self.putchunk(data)
+                # the size of the chunk in the demo file, with the chunk headers of its records
+                size = len(data) + 8 * records
+                manifest['chunks'].append((digest, size, records))
+                manifest['size'] += size
+                manifest['newbytes'] += stored
+            manifest['headers'], stored = self.putchunk(packheaders(times, lengths))
+            manifest['newbytes'] += stored
+        except (IOError, OSError, EOFError, zlib.error, struct.error), e:
+            self._lasterror = filename + ': ' + str(e)
+            return None
+        finally:
+            reader.close()
+        f = open(self.manifestpath(name), 'w')
+        try:
+            json.dump(manifest, f)
+        finally:
+            f.close()
+        return manifest
+
+    def manifestpath(self, name):  # type (str) -> str
+        """
+        Returns the path of the manifest of the demo file stored under name
+        """
+        return os.path.join(self.demodir, name + '.json')
+
+    def manifest(self, name):  # type (str) -> Union[None, Dict[str, object]]
+        """
+        Returns the manifest of the demo file stored under name, None if there is no such demo file
+        """
+        try:
+            f = open(self.manifestpath(name), 'r')
+        except IOError:
+            self._lasterror = 'No demo file ' + name + ' in the store'
+            return None
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+
+    def names(self):  # type () -> List[str]
+        """
+        Returns the names of the demo files in the store
+        """
+        return sorted([fn[:-5] for fn in os.listdir(self.demodir) if fn.endswith('.json')])
+
+    def open(self, name):  # type (str) -> Union[None, StoreFile]
+        """
+        Returns a file like object to read the (uncompressed) demo file stored under name, or None
+        """
+        manifest = self.manifest(name)
+        if manifest is None:
+            return None
+        return StoreFile(self, manifest)
+
+    def reader(self, name):  # type (str) -> Union[None, DemoFileReader]
+        """
+        Returns a DemoFileReader that reads the demo file stored under name from the store, or None
+        """
+        fileobj = self.open(name)
+        if fileobj is None:
+            return None
+        return DemoFileReader(name, dirname=None, fileobj=fileobj)
+
+    def extract(self, name, filename):  # type (str, str) -> bool
+        """
+        Writes the demo file stored under name to filename, compressed if it was compressed, returns False if that
+        fails
+        """
+        manifest = self.manifest(name)
+        if manifest is None:
+            return False
+        try:
+            if manifest['compressed']:
+                f = gzip.open(filename, 'wb')
+            else:
+                f = open(filename, 'wb')
+            source = StoreFile(self, manifest)
+            try:
+                for i in xrange(len(source.chunks)):
+                    f.write(source.chunkdata(i))
+            finally:
+                source.close()
+                f.close()
+        except (IOError, OSError, zlib.error), e:
+            self._lasterror = 'Cannot extract ' + name + ': ' + str(e)
+            return False
+        return True
+
+    def verify(self, filename, name=None):  # type (str, str) -> bool
+        """
+        Returns True if the demo file stored under name, by default its file name, reads back as the same bytes as
+        the (uncompressed) demo file, False if not or if either cannot be read
+        """
+        if name is None:
+            name = os.path.basename(filename)
+        source = self.open(name)
+        if source is None:
+            return False
+        try:
+            reader = DemoFileReader(filename, dirname=None)
+        except (IOError, OSError), e:
+            self._lasterror = str(e)
+            return False
+        try:
+            offset = 0
+            while True:
+                data = reader.file.read(MAXCHUNK)
+                if source.read(MAXCHUNK) != data:
+                    self._lasterror = name + ' differs from ' + filename + ' after byte %d' % offset
+                    return False
+                if len(data) == 0:
+                    return True
+                offset += len(data)
+        except (IOError, OSError, EOFError, zlib.error, struct.error), e:
+            self._lasterror = 'Cannot verify ' + name + ': ' + str(e)
+            return False
+        finally:
+            reader.close()
+            source.close()
+
+    def stats(self):  # type () -> Dict[str, int]
+        """
+        Returns the number of demo files and chunks, the bytes of the demo files (uncompressed) and the bytes the
+        chunks take on disk
+        """
+        result = {'demos': 0, 'chunks': 0, 'demobytes': 0, 'storedbytes': 0}
+        for name in self.names():
+            manifest = self.manifest(name)
+            if manifest is not None:
+                result['demos'] += 1
+                result['demobytes'] += manifest['size']
+        for dirpath, dirnames, filenames in os.walk(self.chunkdir):
+            for fn in filenames:
+                result['chunks'] += 1
+                result['storedbytes'] += os.path.getsize(os.path.join(dirpath, fn))
+        return result
+
+    def errormessage(self):
+        """
+        Simple accessor to get as the last error message, returns None if there was no error
+        """
+        return self._lasterror
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Store demo files in a directory of content addressed chunks, '
+                                                 'so the parts that copies of a game share are stored once')
+    parser.add_argument('store', help='directory of the store')
+    commands = parser.add_subparsers(dest='command')
+    add = commands.add_parser('add', help='add demo files to the store')
+    add.add_argument('demos', nargs='+', help='demo files or directories with demo files')
+    add.add_argument('--verify', action='store_true',
+                     help='read every demo file back from the store and compare it with the demo file')
+    commands.add_parser('list', help='list the demo files in the store')
+    extract = commands.add_parser('extract', help='write a demo file from the store')
+    extract.add_argument('name', help='name of the demo file in the store')
+    extract.add_argument('-o', '--output', help='file to write, by default the name in the current directory')
+    commands.add_parser('stats', help='show how much space the store saves')
+    args = parser.parse_args(argv)
+
+    store = DemoStore(args.store)
+    if args.command == 'add':
+        failed = 0
+        for filename in SpringDemoBatch.demofiles(args.demos):
+            manifest = store.add(filename)
+            if manifest is None:
+                failed += 1
+                print '%s: %s' % (filename, store.errormessage())
+                continue
+            print '%s: %d kB, %d chunks, %d kB new on disk' % (manifest['name'], manifest['size'] / 1024,
+                                                               len(manifest['chunks']), manifest['newbytes'] / 1024)
+            if args.verify and not store.verify(filename):
+                failed += 1
+                print '%s: %s' % (filename, store.errormessage())
+        return 1 if failed > 0 else 0
+    elif args.command == 'list':
+        for name in store.names():
+            print name
+    elif args.command == 'extract':
+        if not store.extract(args.name, args.output or args.name):
+            sys.stderr.write(store.errormessage() + '\n')
+            return 1
+    elif args.command == 'stats':
+        stats = store.stats()
+        print '%d demo files, %.1f MB uncompressed, %d chunks, %.1f MB on disk' % (
+            stats['demos'], stats['demobytes'] / 1e6, stats['chunks'], stats['storedbytes'] / 1e6)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+#!/usr/bin/python
+#
+# SpringDesync - Find where the demo files of the same game, recorded by different players, go out of sync
+#
+# To run: python SpringDesync.py demos/
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Groups demo files by game id and finds the first frame at which the sync checksums of the players differ"""
+
+from SpringDemoFile import DemoFileReader, DemoRecord
+import SpringDemoBatch
+import argparse
+import binascii
+import heapq
+import struct
+import sys
+import os
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# number of frames a sync response may come after those of later frames in the demo stream
+WINDOW = 300
+
+
+def gameids(filenames):  # type (Iterable[str]) -> Tuple[Dict[str, List[str]], List[str]]
+    """
+    Reads the header of each demo file, returns the demo files per game id (in hex) and a list of error messages
+    for the files whose header cannot be read
+    """
+    groups = dict()
+    errors = list()
+    for filename in filenames:
+        try:
+            reader = DemoFileReader(filename, dirname=None)
+        except (IOError, OSError), e:
+            errors.append(filename + ': ' + str(e))
+            continue
+        try:
+            if reader.header():
+                groups.setdefault(binascii.hexlify(reader.gameid), list()).append(filename)
+            else:
+                errors.append(filename + ': ' + str(reader.errormessage()))
+        except (IOError, EOFError), e:
+            errors.append(filename + ': ' + str(e))
+        finally:
+            reader.close()
+    return groups, errors
+
+
+def syncresponses(reader, index):  # type (DemoFileReader, int) -> Iterator[Tuple[int, int, int, int]]
+    """
+    Generates the sync responses in the demo stream of the reader as tuples of the frame, the index of the demo
+    file, the player and the checksum
+    """
+    response = struct.Struct('<xBiI')
+    for gametime, t, data in reader.records((DemoRecord.SYNCRESPONSE,)):
+        if len(data) < response.size:
+            continue
+        player, frame, checksum = response.unpack_from(data)
+        yield frame, index, player, checksum
+
+
+class DesyncFinder:
+    """
+    Reads the sync responses of the demo files of one game side by side and finds the first frame at which the
+    players report different checksums
+
+    The responses of all demo files are merged by frame, and per frame only the distinct checksums are kept (with
+    the demo files and players that reported each), so a frame is in sync when it has one checksum. Frames that are
+    window frames behind are dropped. Reading stops window frames after the first frame that is out of sync, so
+    the rest of the demo files is never read.
+    """
+    def __init__(self, filenames, window=WINDOW):
+        """
+        Initializer, filenames are the demo files of the game
+        """
+        self.filenames = list(filenames)
+        self.window = window
+        # the first frame that is out of sync, None if the demo files are in sync
+        self.frame = None
+        # the number of frames and responses compared, and the responses that came too late to be compared
+        self.frames = 0
+        self.responses = 0
+        self.late = 0
+        # the readers of the demo files, for the player names
+        self.readers = list()
+        # the checksums of the first frame out of sync, to a list of (demo file index, player), see report()
+        self._firstchecksums = None
+        self._lasterror = None
+
+    def run(self):  # type () -> bool
+        """
+        Compares the demo files, returns False if one of them cannot be read
+        """
+        readers = list()
+        try:
+            streams = list()
+            for index, filename in enumerate(self.filenames):
+                reader = DemoFileReader(filename, dirname=None)
+                readers.append(reader)
+                if not reader.header() or reader.script() is None:
+                    self._lasterror = filename + ': ' + str(reader.errormessage())
+                    return False
+                streams.append(syncresponses(reader, index))
+            self.compare(heapq.merge(*streams))
+            for reader in readers:
+                if reader.errormessage():
+                    self._lasterror = reader.filename + ': ' + reader.errormessage()
+                    return False
+            return True
+        except (IOError, OSError, EOFError), e:
+            self._lasterror = str(e)
+            return False
+        finally:
+            for reader in readers:
+                reader.close()
+            self.readers = readers
+
+    def compare(self, responses):  # type (Iterator[Tuple[int, int, int, int]]) -> None
+        """
+        Compares the merged responses, see run()
+        """
+        # frame to checksum to a list of (demo file index, player)
+        frames = dict()
+        oldest = 0
+        first = None
+        for frame, index, player, checksum in responses:
+            if first is not None and frame > first + self.window:
+                break
+            if frame < oldest:
+                self.late += 1
+                continue
+            self.responses += 1
+            checksums = frames.get(frame)
+            if checksums is None:
+                checksums = frames[frame] = dict()
+                self.frames += 1
+            checksums.setdefault(checksum, list()).append((index, player))
+            if len(checksums) > 1 and (first is None or frame < first):
+                first = frame
+            if frame > oldest + 2 * self.window:
+                # drop the frames that are too far behind to get more responses, every window frames
+                oldest = frame - self.window
+                for f in [f for f in frames if f < oldest]:
+                    del frames[f]
+        if first is None:
+            return
+        self.frame = first
+        self._firstchecksums = frames[first]
+
+    def report(self):  # type () -> List[Tuple[int, List[Tuple[str, str]]]]
+        """
+        Returns the checksums of the first frame out of sync, with the demo files and names of the players that
+        reported each, the checksum reported most first
+        """
+        if self.frame is None:
+            return list()
+        result = list()
+        for checksum, reporters in self._firstchecksums.items():
+            named = list()
+            for index, player in sorted(set(reporters)):
+                name = self.readers[index].playernames.get(player, 'player %d' % player)
+                named.append((self.filenames[index], name))
+            result.append((checksum, named))
+        result.sort(key=lambda r: -len(r[1]))
+        return result
+
+    def errormessage(self):
+        """
+        Simple accessor to get as the last error message, returns None if there was no error
+        """
+        return self._lasterror
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Group demo files by game and find the first frame at which the '
+                                                 'players went out of sync')
+    parser.add_argument('demos', nargs='+', help='demo files or directories with demo files')
+    parser.add_argument('--window', type=int, default=WINDOW,
+                        help='frames a sync response may be late in the demo stream (default: %d)' % WINDOW)
+    parser.add_argument('--single', action='store_true',
+                        help='also check games with a single demo file, comparing the players in it')
+    args = parser.parse_args(argv)
+
+    groups, errors = gameids(SpringDemoBatch.demofiles(args.demos))
+    for error in errors:
+        sys.stderr.write(error + '\n')
+    failed = len(errors)
+    for gameid in sorted(groups):
+        filenames = sorted(groups[gameid])
+        if len(filenames) < 2 and not args.single:
+            continue
+        finder = DesyncFinder(filenames, args.window)
+        line = '%s (%d demo files): ' % (gameid, len(filenames))
+        if not finder.run():
+            failed += 1
+            print line + finder.errormessage()
+            continue
+        if finder.frame is None:
+            print line + 'in sync, %d frames and %d sync responses compared' % (finder.frames, finder.responses)
+            continue
+        failed += 1
+        seconds = finder.frame / 30
+        print line + 'out of sync at frame %d (%d:%02d)' % (finder.frame, seconds / 60, seconds % 60)
+        for checksum, reporters in finder.report():
+            print '  %08x: %s' % (checksum, ', '.join(['%s in %s' % (name, os.path.basename(filename))
+                                                       for filename, name in reporters]))
+    return 1 if failed > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
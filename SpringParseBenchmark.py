@@ -0,0 +1,264 @@
+#!/usr/bin/python
+#
+# SpringParseBenchmark - Time each phase of parsing a Spring demo file on generated demo files
+#
+# To run: python SpringParseBenchmark.py [--sizes small,medium] [--save results.json] [--baseline results.json]
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Micro-benchmark of the phases of the demo file reader on small, medium and huge generated demo files"""
+
+import SpringDemoFile
+import argparse
+import multiprocessing
+import tempfile
+import shutil
+import time
+import json
+import sys
+import os
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# name, number of players, spectators, game length in minutes
+SIZES = (('small', 2, 0, 10), ('medium', 8, 4, 40), ('huge', 16, 8, 180))
+
+# the phases of reading a demo file, in the order they have to be called
+PHASES = ('header', 'script', 'demostream', 'chatlog', 'awards', 'unitstats', 'damagestats', 'playerstats',
+          'teamstats', 'winners')
+
+
+def phasevolume(reader, phase, writer):
+    """
+    Returns the number of (uncompressed) bytes and the number of records a phase of the reader works on
+    """
+    if phase == 'header':
+        return reader.headersize, 1
+    elif phase == 'script':
+        return reader.scriptsize, len(reader.players)
+    elif phase == 'demostream':
+        return reader.demostreamsize, writer.records
+    elif phase in ('chatlog', 'awards', 'unitstats', 'damagestats'):
+        # these scan the retained records
+        return reader.demostreamsize, len(reader.demorecords)
+    elif phase == 'playerstats':
+        return reader.playerstatchunksize, reader.numplayers
+    elif phase == 'teamstats':
+        return reader.teamstatchunksize, sum([len(s) for s in reader.teamstatistics.values()])
+    elif phase == 'winners':
+        return reader.winningteamchunksize, len(reader.winningteam)
+    return 0, 0
+
+
+def maxrss():
+    """
+    Returns the peak resident set size of the process in kB, or 0 if it is unknown
+    """
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # in bytes instead of kB
+        rss /= 1024
+    return rss
+
+
+def runphases(filename, memory=False):
+    """
+    Reads filename one phase at a time, returns a dictionary of the seconds each phase took and the reader
+
+    With memory set, the values are the peak allocated bytes of each phase as traced by tracemalloc, or without
+    tracemalloc the growth of the peak resident set size in bytes (which only shows phases that raise the peak).
+    """
+    results = dict()
+    reader = SpringDemoFile.DemoFileReader(filename, dirname=None)
+    for phase in PHASES:
+        method = getattr(reader, phase)
+        if memory and tracemalloc is not None:
+            tracemalloc.start()
+            value = method()
+            results[phase] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        elif memory:
+            before = maxrss()
+            value = method()
+            results[phase] = (maxrss() - before) * 1024
+        else:
+            start = time.time()
+            value = method()
+            results[phase] = time.time() - start
+        if value is None or value is False:
+            raise RuntimeError(phase + '() failed on ' + filename + ': ' + str(reader.errormessage()))
+    reader.close()
+    return results, reader
+
+
+def memoryprofile(filename):
+    """
+    Returns the memory used by each phase of reading filename, see runphases()
+    """
+    return runphases(filename, memory=True)[0]
+
+
+def benchmark(filename, writer, repeat):
+    """
+    Benchmarks the phases of reading filename, returns a list of result dictionaries, one per phase
+    """
+    best = None
+    for n in xrange(repeat):
+        times, reader = runphases(filename)
+        if best is None:
+            best = times
+        else:
+            for phase in PHASES:
+                best[phase] = min(best[phase], times[phase])
+    # measure the memory in a fresh process, so the peak is not that of an earlier phase or file
+    pool = multiprocessing.Pool(1)
+    try:
+        memory = pool.apply(memoryprofile, (filename,))
+    finally:
+        pool.close()
+        pool.join()
+    results = list()
+    for phase in PHASES:
+        nbytes, records = phasevolume(reader, phase, writer)
+        seconds = max(best[phase], 1e-9)
+        results.append({
+            'phase': phase,
+            'ms': best[phase] * 1000.0,
+            'bytes': nbytes,
+            'records': records,
+            'mbps': nbytes / seconds / 1e6,
+            'recordsps': records / seconds,
+            'peakbytes': memory[phase]
+        })
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Adds the ratio of the time of each result to the time in the baseline results, returns the number of results
+    that are more than tolerance (a fraction) slower than the baseline
+    """
+    previous = dict()
+    for r in baseline:
+        previous[(r['size'], r['format'], r['phase'])] = r
+    regressions = 0
+    for r in results:
+        key = (r['size'], r['format'], r['phase'])
+        if key not in previous or previous[key]['ms'] <= 0:
+            r['ratio'] = None
+            continue
+        r['ratio'] = r['ms'] / previous[key]['ms']
+        # phases that take less than a millisecond are too noisy to call a regression
+        if r['ratio'] > 1.0 + tolerance and r['ms'] >= 1.0:
+            regressions += 1
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time each phase of reading generated demo files')
+    parser.add_argument('--sizes', default=','.join([s[0] for s in SIZES]),
+                        help='comma separated demo sizes to run (default: all of %s)' %
+                             ', '.join([s[0] for s in SIZES]))
+    parser.add_argument('--formats', default='sdf,sdfz', help='comma separated file formats (default: sdf,sdfz)')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs per demo file, the fastest counts')
+    parser.add_argument('--save', metavar='FILE', help='write the results to FILE as JSON')
+    parser.add_argument('--baseline', metavar='FILE', help='compare the results to those saved in FILE')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='fraction a phase may be slower than the baseline before it counts as a regression')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        f = open(args.baseline, 'r')
+        try:
+            baseline = json.load(f)
+        finally:
+            f.close()
+
+    if tracemalloc is not None:
+        memory = 'peak alloc'
+    else:
+        memory = 'rss growth'
+    selected = args.sizes.split(',')
+    formats = args.formats.split(',')
+    tmpdir = tempfile.mkdtemp(prefix='springparse')
+    results = list()
+    try:
+        for name, players, spectators, minutes in SIZES:
+            if name not in selected:
+                continue
+            for format in formats:
+                filename = os.path.join(tmpdir, name + '.' + format)
+                writer = SpringDemoFile.DemoFileWriter(filename, players=players, spectators=spectators,
+                                                       length=minutes * 60, chat=2.0, luamsg=2.0)
+                if not writer.write():
+                    sys.stderr.write(writer.errormessage() + '\n')
+                    return 1
+                print '%s.%s: %d players, %d minutes, %d records, %.1f MB on disk' % (
+                    name, format, players, minutes, writer.records, os.path.getsize(filename) / 1e6)
+                for r in benchmark(filename, writer, max(1, args.repeat)):
+                    r.update({'size': name, 'format': format})
+                    results.append(r)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    regressions = 0
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+
+    print
+    print '%-7s %-5s %-12s %10s %9s %12s %11s' % ('size', 'fmt', 'phase', 'ms', 'MB/s', 'records/s', memory),
+    if baseline is not None:
+        print '%9s' % 'baseline',
+    print
+    for r in results:
+        print '%-7s %-5s %-12s %10.2f %9.1f %12.0f %10.0fk' % (r['size'], r['format'], r['phase'], r['ms'], r['mbps'],
+                                                              r['recordsps'], r['peakbytes'] / 1024.0),
+        if baseline is not None:
+            if r['ratio'] is None:
+                print '%9s' % '-',
+            else:
+                print '%8.2fx' % r['ratio'],
+        print
+
+    if args.save:
+        f = open(args.save, 'w')
+        try:
+            json.dump(results, f, indent=1, sort_keys=True)
+        finally:
+            f.close()
+    if regressions > 0:
+        print
+        print '%d phase(s) more than %.0f%% slower than the baseline' % (regressions, args.tolerance * 100)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,363 @@
+#!/usr/bin/python
+#
+# SpringPlayerIndex - Find the demo files a player is in without reading every demo file
+#
+# To run: python SpringPlayerIndex.py update demos/
+#         python SpringPlayerIndex.py find Someone demos/ otherdisk/demos/
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Keeps a Bloom filter of the player names per directory of demo files and per demo file, updated incrementally"""
+
+from SpringDemoFile import DemoFileReader, DemoRecord, SCHEMAS
+import SpringDemoBatch
+import argparse
+import hashlib
+import tempfile
+import base64
+import struct
+import json
+import zlib
+import sys
+import os
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# the file with the index of a directory
+INDEXFILE = 'playerindex.json'
+
+# bits per name and number of hashes, which give about 1% false positives
+BITSPERNAME = 10
+HASHES = 7
+
+# number of names the first Bloom filter of a directory is made for, each next one is made for twice as many
+CAPACITY = 1024
+
+
+def key(name):  # type (str) -> str
+    """
+    Returns the form of a player name that goes into the filters, lobby names are unique regardless of case
+    """
+    return name.strip().lower()
+
+
+class BloomFilter:
+    """
+    Class whose instance is a Bloom filter of strings: it tells for sure that a string was not added, and that it
+    may have been added with a false positive rate that depends on the number of bits per string added
+
+    The positions of a string are made from two 64 bit halves of its MD5 (double hashing), so the same string can
+    be looked up in filters of any size.
+    """
+    def __init__(self, bits, hashes=HASHES, data=None):
+        """
+        Initializer, makes an empty filter of bits bits (rounded up to whole bytes) or one with the given data
+        """
+        if data is not None:
+            self.data = bytearray(data)
+        else:
+            self.data = bytearray((max(8, bits) + 7) // 8)
+        self.bits = len(self.data) * 8
+        self.hashes = hashes
+
+    @staticmethod
+    def forcount(n, hashes=HASHES):  # type (int, int) -> BloomFilter
+        """
+        Returns an empty filter sized for n strings
+        """
+        return BloomFilter(BITSPERNAME * max(1, n), hashes)
+
+    def positions(self, text):  # type (str) -> List[int]
+        """
+        Returns the bits of a string
+        """
+        h1, h2 = struct.unpack('<QQ', hashlib.md5(text).digest())
+        return [(h1 + i * h2) % self.bits for i in xrange(self.hashes)]
+
+    def add(self, text):  # type (str) -> None
+        """
+        Adds a string to the filter
+        """
+        for p in self.positions(text):
+            self.data[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, text):  # type (str) -> bool
+        for p in self.positions(text):
+            if not self.data[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def encode(self):  # type () -> str
+        """
+        Returns the filter as base64 text, for JSON
+        """
+        return base64.b64encode(str(self.data))
+
+    @staticmethod
+    def decode(text, hashes=HASHES):  # type (str, int) -> BloomFilter
+        """
+        Returns the filter of text returned by encode()
+        """
+        return BloomFilter(0, hashes, base64.b64decode(text))
+
+
+def playernames(filename):  # type (str) -> Tuple[Union[None, Set[str]], Union[None, str]]
+    """
+    Reads the player names of a demo file from the start script and the PLAYERNAME records, without parsing the
+    rest of the demo stream, returns the names (None if the file cannot be read) and an error message or None
+    """
+    try:
+        reader = DemoFileReader(filename, dirname=None)
+    except (IOError, OSError), e:
+        return None, str(e)
+    try:
+        if not reader.header() or reader.script() is None:
+            return None, reader.errormessage()
+        names = set([p[0] for p in reader.players])
+        schema = SCHEMAS[DemoRecord.PLAYERNAME]
+        for gametime, t, data in reader.records((DemoRecord.PLAYERNAME,)):
+            event = schema.decode(gametime, data)
+            if event is not None:
+                names.add(event.name)
+        # a truncated demo stream still has the names read so far
+        return names, None
+    except (IOError, OSError, EOFError, zlib.error, struct.error), e:
+        # truncated or corrupt compressed files
+        return None, str(e)
+    finally:
+        reader.close()
+
+
+class PlayerIndex:
+    """
+    Class whose instance keeps the Bloom filters of the player names of the demo files in one directory, in the file
+    INDEXFILE in that directory
+
+    Each demo file has a small filter of its own names, kept with its size and modification time, so update() only
+    reads the demo files that are new or changed. The directory has a scalable filter of all names: a list of
+    filters where a new one, for twice as many names, is started when the last one is full, so adding demo files
+    never needs the names of the demo files that are already in. A lookup that the directory filter rules out costs
+    nothing, otherwise only the demo files whose own filter matches are candidates, see find(). Names of demo files
+    that are removed stay in the directory filter until the index is rebuilt, which only adds false positives.
+    """
+    def __init__(self, directory):
+        """
+        Initializer, reads the index of directory if it has one
+        """
+        self.directory = directory
+        self.filename = os.path.join(directory, INDEXFILE)
+        # base name of each demo file to [size, modification time, encoded filter of its names]
+        self.files = dict()
+        # base name of each demo file to the filter of its names, decoded once
+        self.filefilters = dict()
+        # the filters of the directory, a list of [capacity, number of names added, filter]
+        self.filters = list()
+        self.changed = False
+        self._lasterror = None
+        if os.path.exists(self.filename):
+            try:
+                f = open(self.filename, 'r')
+                try:
+                    index = json.load(f)
+                finally:
+                    f.close()
+                if index.get('hashes') == HASHES:
+                    self.files = dict([(str(name), entry) for name, entry in index['files'].items()])
+                    self.filefilters = dict([(name, BloomFilter.decode(entry[2]))
+                                             for name, entry in self.files.items()])
+                    self.filters = [[capacity, count, BloomFilter.decode(text)]
+                                    for capacity, count, text in index['filters']]
+            except (IOError, ValueError, KeyError, IndexError, TypeError, AttributeError), e:
+                # a damaged index is dropped, update() makes it again
+                self._lasterror = 'Cannot read ' + self.filename + ': ' + str(e)
+                self.files = dict()
+                self.filefilters = dict()
+                self.filters = list()
+                self.changed = True
+
+    def addfile(self, filename, names):  # type (str, Iterable[str]) -> None
+        """
+        Adds (or replaces) the names of a demo file in the directory
+        """
+        names = set([key(name) for name in names if name])
+        own = BloomFilter.forcount(len(names))
+        for name in names:
+            own.add(name)
+            if name in self:
+                continue
+            if len(self.filters) == 0 or self.filters[-1][1] >= self.filters[-1][0]:
+                capacity = CAPACITY if len(self.filters) == 0 else 2 * self.filters[-1][0]
+                self.filters.append([capacity, 0, BloomFilter.forcount(capacity)])
+            self.filters[-1][1] += 1
+            self.filters[-1][2].add(name)
+        self.files[os.path.basename(filename)] = [os.path.getsize(filename), os.path.getmtime(filename),
+                                                  own.encode()]
+        self.filefilters[os.path.basename(filename)] = own
+        self.changed = True
+
+    def update(self):  # type () -> Tuple[int, List[str]]
+        """
+        Reads the names of the demo files in the directory that are not in the index or have changed, and drops the
+        demo files that are gone, returns the number of demo files read and the error messages
+
+        Demo files that cannot be read are kept without names, so they are not read again until they change.
+        """
+        errors = list()
+        n = 0
+        present = set()
+        for filename in SpringDemoBatch.demofiles([self.directory]):
+            name = os.path.basename(filename)
+            present.add(name)
+            entry = self.files.get(name)
+            if entry is not None and entry[0] == os.path.getsize(filename) and \
+                    entry[1] == os.path.getmtime(filename):
+                continue
+            names, error = playernames(filename)
+            if names is None:
+                errors.append(filename + ': ' + str(error))
+                names = ()
+            self.addfile(filename, names)
+            n += 1
+        for name in [name for name in self.files if name not in present]:
+            del self.files[name]
+            del self.filefilters[name]
+            self.changed = True
+        return n, errors
+
+    def __contains__(self, name):  # type (str) -> bool
+        name = key(name)
+        for capacity, count, bloom in self.filters:
+            if name in bloom:
+                return True
+        return False
+
+    def find(self, name):  # type (str) -> List[str]
+        """
+        Returns the demo files that may have a player, the false positives are about 1% of the demo files that do
+        not have the player
+        """
+        if name not in self:
+            return list()
+        name = key(name)
+        return [os.path.join(self.directory, fn) for fn in sorted(self.files) if name in self.filefilters[fn]]
+
+    def save(self):  # type () -> bool
+        """
+        Writes the index if it has changed, returns False if that fails
+        """
+        if not self.changed:
+            return True
+        index = {
+            'version': 1,
+            'hashes': HASHES,
+            'filters': [[capacity, count, bloom.encode()] for capacity, count, bloom in self.filters],
+            'files': self.files
+        }
+        try:
+            # write to a temporary file first, so a lookup never reads half an index
+            fd, tmp = tempfile.mkstemp(dir=self.directory)
+            f = os.fdopen(fd, 'w')
+            try:
+                json.dump(index, f, separators=(',', ':'))
+            finally:
+                f.close()
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+            os.rename(tmp, self.filename)
+        except (IOError, OSError), e:
+            self._lasterror = 'Cannot write ' + self.filename + ': ' + str(e)
+            return False
+        self.changed = False
+        return True
+
+    def errormessage(self):
+        """
+        Simple accessor to get as the last error message, returns None if there was no error
+        """
+        return self._lasterror
+
+
+def directories(paths):  # type (Iterable[str]) -> List[str]
+    """
+    Returns the directories with demo files in and under paths
+    """
+    result = list()
+    for path in paths:
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            if [fn for fn in filenames if fn.endswith('.sdf') or fn.endswith('.sdfz')]:
+                result.append(dirpath)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Keep an index of the player names per directory of demo files '
+                                                 'and find the demo files of a player with it')
+    commands = parser.add_subparsers(dest='command')
+    update = commands.add_parser('update', help='add new and changed demo files to the indexes')
+    update.add_argument('paths', nargs='+', help='directories with demo files, searched recursively')
+    update.add_argument('--rebuild', action='store_true', help='make the indexes from scratch')
+    find = commands.add_parser('find', help='list the demo files of a player')
+    find.add_argument('name', help='player name, regardless of case')
+    find.add_argument('paths', nargs='+', help='directories with demo files, searched recursively')
+    find.add_argument('--candidates', action='store_true',
+                      help='list the demo files the filters match, without reading them to check')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    if args.command == 'update':
+        for directory in directories(args.paths):
+            if args.rebuild and os.path.exists(os.path.join(directory, INDEXFILE)):
+                os.remove(os.path.join(directory, INDEXFILE))
+            index = PlayerIndex(directory)
+            if index.errormessage() is not None:
+                sys.stderr.write(index.errormessage() + ', making it again\n')
+            n, errors = index.update()
+            for error in errors:
+                sys.stderr.write(error + '\n')
+            failed += len(errors)
+            if not index.save():
+                sys.stderr.write(index.errormessage() + '\n')
+                failed += 1
+            print '%s: %d demo files, %d read' % (directory, len(index.files), n)
+    elif args.command == 'find':
+        name = key(args.name)
+        for directory in directories(args.paths):
+            index = PlayerIndex(directory)
+            if index.errormessage() is not None:
+                sys.stderr.write(index.errormessage() + ', run update to make it again\n')
+                failed += 1
+                continue
+            if len(index.files) == 0:
+                sys.stderr.write(directory + ': no index, run update first\n')
+                continue
+            for filename in index.find(name):
+                if not args.candidates:
+                    names, error = playernames(filename)
+                    if names is None:
+                        sys.stderr.write(filename + ': ' + str(error) + '\n')
+                        failed += 1
+                        continue
+                    if name not in [key(n) for n in names]:
+                        continue
+                print filename
+    return 1 if failed > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/python
+#
+# SpringProfile - Profile loading a Spring demo file, for reports of demo files that are slow to load
+#
+# The module should be placed in a directory in your Python class path or in the
+# directory of any module that is using it.
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Runs the loading of a demo file under cProfile and tracemalloc and writes the results next to the demo file"""
+
+import cProfile
+import pstats
+import StringIO
+import time
+import gc
+import os
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# set this environment variable (to anything but 0 or empty) to profile loading demo files
+ENVIRONMENT = 'SPRINGSTATS_PROFILE'
+
+
+def requested():
+    """
+    Returns True if profiling is switched on in the environment
+    """
+    return os.environ.get(ENVIRONMENT, '') not in ('', '0')
+
+
+def objectcounts():
+    """
+    Returns a dictionary of the number of live objects tracked by the garbage collector per type name
+    """
+    counts = dict()
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name == 'instance':
+            # old style classes
+            name = obj.__class__.__name__
+        counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+class Profiler:
+    """
+    Runs a function under cProfile and tracemalloc and writes the profile and an allocation report for a demo file
+
+    The profile goes to <demo file>.pstats (see the pstats module to read it), the report of the top allocations
+    and the top functions by cumulative time to <demo file>.profile.txt. Without tracemalloc the report lists the
+    growth of the number of live objects per type instead.
+    """
+    def __init__(self, filename, top=25):
+        """
+        Initializer, filename is the demo file that is loaded, top the number of lines in each part of the report
+        """
+        self.filename = filename
+        self.top = top
+        self.statsfile = filename + '.pstats'
+        self.reportfile = filename + '.profile.txt'
+        self._lasterror = None
+
+    def run(self, function, *args, **kw):
+        """
+        Calls function with the arguments under the profiler, writes the profile and the report and returns what
+        the function returns
+
+        Failing to write the files does not fail the call, see errormessage()
+        """
+        profile = cProfile.Profile()
+        before = None
+        if tracemalloc is not None:
+            tracemalloc.start()
+        else:
+            before = objectcounts()
+        start = time.time()
+        try:
+            return profile.runcall(function, *args, **kw)
+        finally:
+            elapsed = time.time() - start
+            if tracemalloc is not None:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                allocations = self.allocations(snapshot, peak)
+            else:
+                allocations = self.objectgrowth(before, objectcounts())
+            self.write(profile, elapsed, allocations)
+
+    def allocations(self, snapshot, peak):  # type (tracemalloc.Snapshot, int) -> List[str]
+        """
+        Returns the lines of the report of the top allocations in a tracemalloc snapshot
+        """
+        lines = ['Peak traced memory: %.1f kB' % (peak / 1024.0), '',
+                 'Top %d allocations by line still allocated at the end:' % self.top]
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            frame = stat.traceback[0]
+            lines.append('%10.1f kB %8d blocks  %s:%d' % (stat.size / 1024.0, stat.count, frame.filename,
+                                                           frame.lineno))
+        return lines
+
+    def objectgrowth(self, before, after):  # type (Dict[str, int], Dict[str, int]) -> List[str]
+        """
+        Returns the lines of the report of the growth of the live objects per type, for when there is no tracemalloc
+        """
+        growth = [(after[name] - before.get(name, 0), name) for name in after]
+        growth.sort(reverse=True)
+        lines = ['tracemalloc is not available, showing the growth of live objects instead', '',
+                 'Top %d object types by growth:' % self.top]
+        for n, name in growth[:self.top]:
+            if n <= 0:
+                break
+            lines.append('%10d  %s' % (n, name))
+        return lines
+
+    def write(self, profile, elapsed, allocations):
+        """
+        Writes the profile and the report, returns False if that fails
+        """
+        text = StringIO.StringIO()
+        stats = pstats.Stats(profile, stream=text)
+        stats.sort_stats('cumulative').print_stats(self.top)
+        try:
+            stats.dump_stats(self.statsfile)
+            f = open(self.reportfile, 'w')
+            try:
+                f.write('Profile of loading %s\n' % self.filename)
+                f.write('Wall time: %.3f s\n\n' % elapsed)
+                f.write('\n'.join(allocations))
+                f.write('\n\n')
+                f.write(text.getvalue())
+            finally:
+                f.close()
+        except (IOError, OSError), e:
+            self._lasterror = 'Cannot write the profile of ' + self.filename + ': ' + str(e)
+            return False
+        return True
+
+    def errormessage(self):
+        """
+        Simple accessor to get as the last error message, returns None if there was no error
+        """
+        return self._lasterror
@@ -0,0 +1,157 @@
+#!/usr/bin/python
+#
+# SpringRenderBenchmark - Measure the cost of drawing the Spring Stats Viewer views without a display
+#
+# To run: python SpringRenderBenchmark.py [--sizes small,medium] [--methods] [--json results.json]
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Benchmark of drawing the views of synthetic demo files of increasing size on a recording canvas"""
+
+import SpringDemoFile
+import SpringStatsViews
+import SpringStatsRender
+import argparse
+import tempfile
+import shutil
+import time
+import json
+import sys
+import os
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# name, number of players, game length in minutes
+SIZES = (('small', 2, 10), ('medium', 8, 30), ('large', 16, 60), ('huge', 32, 120))
+
+
+class MethodTimer:
+    """
+    Times the calls of the draw*, setup* and layout* methods of an object by wrapping them in instance attributes
+    """
+    def __init__(self, obj, prefixes=('draw', 'setup', 'layout')):
+        self.obj = obj
+        self.calls = dict()
+        self.times = dict()
+        for name in dir(obj):
+            if name.startswith(prefixes) and callable(getattr(obj, name)):
+                setattr(obj, name, self.timed(name, getattr(obj, name)))
+
+    def timed(self, name, method):
+        """
+        Returns method wrapped so that its calls and time (inclusive of nested calls) are recorded under name
+        """
+        calls = self.calls
+        times = self.times
+
+        def timer(*args, **kw):
+            start = time.time()
+            try:
+                return method(*args, **kw)
+            finally:
+                calls[name] = calls.get(name, 0) + 1
+                times[name] = times.get(name, 0.0) + time.time() - start
+        return timer
+
+    def remove(self):
+        """
+        Removes the wrappers, restoring the methods of the object
+        """
+        for name in dir(self.obj):
+            if name in self.obj.__dict__ and name.startswith(('draw', 'setup', 'layout')):
+                delattr(self.obj, name)
+
+
+def benchmarkview(views, view, width, height, repeat):
+    """
+    Draws view repeat times on a fresh recording canvas, returns the results of the fastest run as a dictionary
+    """
+    best = None
+    for n in xrange(repeat):
+        canvas = SpringStatsRender.RecordingCanvas(width, height)
+        timer = MethodTimer(views)
+        start = time.time()
+        views.drawview(canvas, view)
+        elapsed = time.time() - start
+        timer.remove()
+        views.clearview(canvas, view)
+        if best is None or elapsed < best['ms'] / 1000.0:
+            best = {
+                'ms': elapsed * 1000.0,
+                'operations': canvas.operations(),
+                'calls': dict(canvas.calls),
+                'items': sum(canvas.created.values()),
+                'peakitems': canvas.peakitems,
+                'methods': dict([(name, (timer.calls[name], timer.times[name] * 1000.0)) for name in timer.calls])
+            }
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the canvas operations and time used to draw each view')
+    parser.add_argument('--sizes', default=','.join([s[0] for s in SIZES]),
+                        help='comma separated demo sizes to run (default: all of %s)' %
+                             ', '.join([s[0] for s in SIZES]))
+    parser.add_argument('--repeat', type=int, default=3, help='number of times each view is drawn, the fastest counts')
+    parser.add_argument('--width', type=int, default=800, help='canvas width')
+    parser.add_argument('--height', type=int, default=600, help='canvas height')
+    parser.add_argument('--methods', action='store_true', help='also show the time spent per draw/setup method')
+    parser.add_argument('--json', metavar='FILE', help='write the results to FILE as JSON')
+    args = parser.parse_args(argv)
+
+    selected = args.sizes.split(',')
+    tmpdir = tempfile.mkdtemp(prefix='springrender')
+    results = list()
+    try:
+        print '%-8s %7s %7s  %-8s %9s %8s %8s %8s' % ('size', 'players', 'minutes', 'view', 'ms', 'ops', 'items',
+                                                     'peak')
+        for name, players, minutes in SIZES:
+            if name not in selected:
+                continue
+            filename = os.path.join(tmpdir, name + '.sdf')
+            writer = SpringDemoFile.DemoFileWriter(filename, players=players, length=minutes * 60, frames=False)
+            if not writer.write():
+                sys.stderr.write(writer.errormessage() + '\n')
+                return 1
+            views = SpringStatsViews.StatsViews()
+            available = views.loaddemofile(filename)
+            for viewname, view in SpringStatsRender.VIEWS:
+                if view not in available:
+                    continue
+                r = benchmarkview(views, view, args.width, args.height, max(1, args.repeat))
+                r.update({'size': name, 'players': players, 'minutes': minutes, 'view': viewname})
+                results.append(r)
+                print '%-8s %7d %7d  %-8s %9.2f %8d %8d %8d' % (name, players, minutes, viewname, r['ms'],
+                                                               r['operations'], r['items'], r['peakitems'])
+                if args.methods:
+                    for method in sorted(r['methods'], key=lambda m: -r['methods'][m][1]):
+                        print '%36s %9.2f %8d calls' % (method, r['methods'][method][1], r['methods'][method][0])
+    finally:
+        shutil.rmtree(tmpdir)
+
+    if args.json:
+        f = open(args.json, 'w')
+        try:
+            json.dump(results, f, indent=1, sort_keys=True)
+        finally:
+            f.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,850 @@
+#!/usr/bin/python
+#
+# SpringStatsRender - Render the Spring Stats Viewer views of demo files to PNG or SVG without a display
+#
+# To run: python SpringStatsRender.py -o reports --format png demos/*.sdfz
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Headless rendering of the Spring Stats Viewer views to PNG and SVG files"""
+
+import SpringDemoBatch
+import SpringStatsViews
+import argparse
+import multiprocessing
+import struct
+import zlib
+import sys
+import os
+from xml.sax.saxutils import escape, quoteattr
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+# the views by name, the numbers are those of the viewer
+VIEWS = (('info', 0), ('players', 1), ('graph', 2), ('awards', 3), ('chat', 4), ('units', 5), ('damage', 6),
+         ('network', 7))
+
+# size of a character cell of the built in font, in pixels
+CHARWIDTH = 7
+LINEHEIGHT = 13
+
+# 7x13 bitmap font for the printable ASCII characters 32 to 126, each character is 13 rows of 7 pixels written
+# as hex bytes, the leftmost pixel is bit 6
+FONT = (
+    '00000000000000000000000000',  # ' '
+    '00000808080808080008000000',  # '!'
+    '00001414140000000000000000',  # '"'
+    '00000A123F14147E2428000000',  # '#'
+    '0000081E28281C0A0A3C080800',  # '$'
+    '00007050720C106E0A0E000000',  # '%'
+    '00001C1010182D25221F000000',  # '&'
+    '00000808080000000000000000',  # "'"
+    '00081010101010101010080000',  # '('
+    '00101008080808080810100000',  # ')'
+    '0000082A1C1C2A080000000000',  # '*'
+    '0000000008083E080800000000',  # '+'
+    '00000000000000000808100000',  # ','
+    '0000000000001C000000000000',  # '-'
+    '00000000000000000808000000',  # '.'
+    '00000204040808081010200000',  # '/'
+    '00001E3321252121331E000000',  # '0'
+    '0000380808080808083E000000',  # '1'
+    '00001E210103060C103F000000',  # '2'
+    '00001E21011E0301211E000000',  # '3'
+    '000006060A12323F0202000000',  # '4'
+    '00003E20203E0301013E000000',  # '5'
+    '00000F10202E3121211E000000',  # '6'
+    '00003F02020404080810000000',  # '7'
+    '00001E21211E2121211E000000',  # '8'
+    '00001E2121211F01023C000000',  # '9'
+    '00000000080800000808000000',  # ':'
+    '00000000080800000808100000',  # ';'
+    '00000000010E301C0300000000',  # '<'
+    '00000000007E007E0000000000',  # '='
+    '00000000201C030E3000000000',  # '>'
+    '00001C02060C08080008000000',  # '?'
+    '00000E13212729292730100E00',  # '@'
+    '00000C0C0C12121E2121000000',  # 'A'
+    '00003E21213E2121213E000000',  # 'B'
+    '00000E1120202020110E000000',  # 'C'
+    '00003C2221212121223C000000',  # 'D'
+    '00003F20203F2020203F000000',  # 'E'
+    '00003F20203F20202020000000',  # 'F'
+    '00000E1120202321110E000000',  # 'G'
+    '00002121213F21212121000000',  # 'H'
+    '00003E0808080808083E000000',  # 'I'
+    '00000E0202020202221C000000',  # 'J'
+    '00002224283028242221000000',  # 'K'
+    '0000202020202020203F000000',  # 'L'
+    '00002133332D2D212121000000',  # 'M'
+    '00002131292925252321000000',  # 'N'
+    '00001E3321212121331E000000',  # 'O'
+    '00003E2121213E202020000000',  # 'P'
+    '00001E3321212121331E030000',  # 'Q'
+    '00003E2121213E222120000000',  # 'R'
+    '00001E21203C0301211E000000',  # 'S'
+    '00007F08080808080808000000',  # 'T'
+    '0000212121212121211E000000',  # 'U'
+    '000021211212120C0C0C000000',  # 'V'
+    '00004149495536362222000000',  # 'W'
+    '00002112120C0C121221000000',  # 'X'
+    '00006322141C08080808000000',  # 'Y'
+    '00003F0202040818103F000000',  # 'Z'
+    '00181010101010101010180000',  # '['
+    '00002010100808080404020000',  # '\\'
+    '00180808080808080808180000',  # ']'
+    '00001824420000000000000000',  # '^'
+    '0000000000000000000000007F',  # '_'
+    '00080400000000000000000000',  # '`'
+    '000000003C021E22221E000000',  # 'a'
+    '002020203C222222223C000000',  # 'b'
+    '000000001E302020301E000000',  # 'c'
+    '000202021E222222221E000000',  # 'd'
+    '000000001C223E20201E000000',  # 'e'
+    '000608083E0808080808000000',  # 'f'
+    '000000001E222222221E021C00',  # 'g'
+    '002020202C3222222222000000',  # 'h'
+    '0008000038080808083E000000',  # 'i'
+    '00080000380808080808083000',  # 'j'
+    '00202020242830282422000000',  # 'k'
+    '0070101010101010100C000000',  # 'l'
+    '000000003E2A2A2A2A2A000000',  # 'm'
+    '000000002C3222222222000000',  # 'n'
+    '000000001C222222221C000000',  # 'o'
+    '000000003C222222223C202000',  # 'p'
+    '000000001E222222221E020200',  # 'q'
+    '000000001E1210101010000000',  # 'r'
+    '000000001E203806023C000000',  # 's'
+    '000010107C101010101C000000',  # 't'
+    '0000000022222222221E000000',  # 'u'
+    '00000000222214141408000000',  # 'v'
+    '00000000020254542828000000',  # 'w'
+    '00000000361408081436000000',  # 'x'
+    '00000000222414141808103000',  # 'y'
+    '000000003E040C18103E000000',  # 'z'
+    '000E08080830080808080E0000',  # '{'
+    '00080808080808080808080800',  # '|'
+    '00380808080608080808380000',  # '}'
+    '00000000000038070000000000',  # '~'
+)
+
+# offsets of the anchor point relative to the size of a text item
+ANCHORS = {
+    'nw': (0.0, 0.0), 'n': (0.5, 0.0), 'ne': (1.0, 0.0),
+    'w': (0.0, 0.5), 'center': (0.5, 0.5), 'e': (1.0, 0.5),
+    'sw': (0.0, 1.0), 's': (0.5, 1.0), 'se': (1.0, 1.0)
+}
+
+
+def parsecolor(color):
+    """
+    Returns the (r, g, b) triplet of a Tk color in #RGB, #RRGGBB or #RRRRGGGGBBBB format or None for an empty color
+    """
+    if color is None or len(color) == 0 or color[0] != '#':
+        return None
+    digits = (len(color) - 1) / 3
+    if digits not in (1, 2, 4):
+        return None
+    result = list()
+    for n in xrange(3):
+        v = int(color[1 + n * digits:1 + (n + 1) * digits], 16)
+        if digits == 1:
+            v *= 17
+        elif digits == 4:
+            v >>= 8
+        result.append(v)
+    return tuple(result)
+
+
+def flattencoords(args):
+    """
+    Returns the coordinates passed to a canvas method as a flat list of floats, Tk accepts them as separate
+    arguments as well as (nested) sequences
+    """
+    result = list()
+    for a in args:
+        if isinstance(a, (list, tuple)):
+            result.extend(flattencoords(a))
+        else:
+            result.append(float(a))
+    return result
+
+
+class CanvasItem:
+    """
+    An item on the headless canvas
+    """
+    def __init__(self, id, kind, coords, options):
+        self.id = id
+        self.kind = kind
+        self.coords = coords
+        tags = options.pop('tags', ())
+        if isinstance(tags, basestring):
+            tags = tags.split()
+        self.tags = list(tags)
+        self.options = options
+
+    def state(self):
+        """
+        Returns the state of the item, normal, disabled or hidden
+        """
+        st = self.options.get('state', '')
+        if st is None or st == '':
+            return 'normal'
+        return st
+
+    def color(self, option):
+        """
+        Returns the color of the item for the given option (fill or outline) taking the state of the item into
+        account, as an (r, g, b) triplet or None for no color
+        """
+        if self.state() == 'disabled':
+            c = self.options.get('disabled' + option)
+            if c is not None and c != '':
+                return parsecolor(c)
+        if option in self.options:
+            return parsecolor(self.options[option])
+        if self.kind == 'rectangle' and option == 'fill':
+            # rectangles are not filled by default
+            return None
+        return (0, 0, 0)
+
+    def linewidth(self):
+        """
+        Returns the width of lines and outlines of the item in pixels
+        """
+        return max(1, int(float(self.options.get('width', 1)) + 0.5))
+
+    def textlines(self):
+        """
+        Returns the lines of the text of a text item
+        """
+        text = self.options.get('text', '')
+        if isinstance(text, str):
+            text = text.decode('utf-8', 'replace')
+        elif not isinstance(text, unicode):
+            text = unicode(text)
+        return text.split('\n')
+
+    def bbox(self):
+        """
+        Returns the bounding box (x0, y0, x1, y1) of the item
+        """
+        if self.kind == 'text':
+            lines = self.textlines()
+            w = max([len(line) for line in lines]) * CHARWIDTH
+            h = len(lines) * LINEHEIGHT
+            fx, fy = ANCHORS[self.options.get('anchor', 'center')]
+            x0 = int(round(self.coords[0] - fx * w))
+            y0 = int(round(self.coords[1] - fy * h))
+            return x0, y0, x0 + w, y0 + h
+        xs = self.coords[0::2]
+        ys = self.coords[1::2]
+        pad = (self.linewidth() + 1) / 2
+        return (int(min(xs)) - pad, int(min(ys)) - pad,
+                int(max(xs) + 0.5) + pad + 1, int(max(ys) + 0.5) + pad + 1)
+
+
+class HeadlessCanvas:
+    """
+    A canvas implementing the part of the Tk canvas interface used by the views, without a display
+
+    The items can be written as an SVG document or rasterized to a PNG image. Bindings are accepted and stored
+    but never invoked.
+    """
+    def __init__(self, width=800, height=600, background='#000'):
+        self.config = {'width': str(width), 'height': str(height), 'background': background}
+        self.items = dict()
+        # item ids from bottom to top
+        self.order = list()
+        self.nextid = 1
+        self.bindings = dict()
+
+    def __getitem__(self, key):
+        return self.config[key]
+
+    def configure(self, **kw):
+        """
+        Changes the configuration (width, height, background) of the canvas
+        """
+        for k in kw:
+            self.config[k] = str(kw[k])
+
+    def cget(self, key):
+        return self.config[key]
+
+    def winfo_width(self):
+        return int(self.config['width'])
+
+    def winfo_height(self):
+        return int(self.config['height'])
+
+    def canvasx(self, x, gridspacing=None):
+        return float(x)
+
+    def canvasy(self, y, gridspacing=None):
+        return float(y)
+
+    def create(self, kind, args, options):
+        """
+        Creates an item of the given kind, returns its id
+        """
+        id = self.nextid
+        self.nextid += 1
+        self.items[id] = CanvasItem(id, kind, flattencoords(args), options)
+        self.order.append(id)
+        return id
+
+    def create_text(self, *args, **kw):
+        return self.create('text', args, kw)
+
+    def create_line(self, *args, **kw):
+        return self.create('line', args, kw)
+
+    def create_rectangle(self, *args, **kw):
+        return self.create('rectangle', args, kw)
+
+    def find(self, tagorid):
+        """
+        Returns the ids of the items matching the tag or id, in stacking order
+        """
+        if isinstance(tagorid, basestring):
+            if tagorid.isdigit():
+                tagorid = int(tagorid)
+            elif tagorid == 'all':
+                return list(self.order)
+            else:
+                return [id for id in self.order if tagorid in self.items[id].tags]
+        if tagorid in self.items:
+            return [tagorid]
+        return []
+
+    def find_all(self):
+        return tuple(self.order)
+
+    def find_withtag(self, tagorid):
+        return tuple(self.find(tagorid))
+
+    def coords(self, tagorid, *args):
+        ids = self.find(tagorid)
+        if len(ids) == 0:
+            return []
+        if len(args) > 0:
+            self.items[ids[0]].coords = flattencoords(args)
+            return None
+        return list(self.items[ids[0]].coords)
+
+    def move(self, tagorid, dx, dy):
+        for id in self.find(tagorid):
+            c = self.items[id].coords
+            for n in xrange(0, len(c), 2):
+                c[n] += dx
+                c[n + 1] += dy
+
+    def scale(self, tagorid, xorigin, yorigin, xscale, yscale):
+        for id in self.find(tagorid):
+            c = self.items[id].coords
+            for n in xrange(0, len(c), 2):
+                c[n] = xorigin + (c[n] - xorigin) * xscale
+                c[n + 1] = yorigin + (c[n + 1] - yorigin) * yscale
+
+    def delete(self, *args):
+        for tagorid in args:
+            for id in self.find(tagorid):
+                del self.items[id]
+                self.order.remove(id)
+
+    def bbox(self, *args):
+        """
+        Returns the bounding box enclosing all the visible items matching the arguments, or None
+        """
+        result = None
+        for tagorid in args:
+            for id in self.find(tagorid):
+                item = self.items[id]
+                if item.state() == 'hidden':
+                    continue
+                box = item.bbox()
+                if result is None:
+                    result = box
+                else:
+                    result = (min(result[0], box[0]), min(result[1], box[1]),
+                              max(result[2], box[2]), max(result[3], box[3]))
+        return result
+
+    def itemconfigure(self, tagorid, **kw):
+        for id in self.find(tagorid):
+            item = self.items[id]
+            for k in kw:
+                if k == 'tags':
+                    tags = kw[k]
+                    if isinstance(tags, basestring):
+                        tags = tags.split()
+                    item.tags = list(tags)
+                else:
+                    item.options[k] = kw[k]
+
+    itemconfig = itemconfigure
+
+    def itemcget(self, tagorid, option):
+        ids = self.find(tagorid)
+        if len(ids) == 0:
+            return ''
+        return self.items[ids[0]].options.get(option, '')
+
+    def gettags(self, tagorid):
+        ids = self.find(tagorid)
+        if len(ids) == 0:
+            return ()
+        return tuple(self.items[ids[0]].tags)
+
+    def addtag_withtag(self, newtag, tagorid):
+        for id in self.find(tagorid):
+            if newtag not in self.items[id].tags:
+                self.items[id].tags.append(newtag)
+
+    def dtag(self, tagorid, tagtodelete=None):
+        if tagtodelete is None:
+            tagtodelete = tagorid
+        for id in self.find(tagorid):
+            if tagtodelete in self.items[id].tags:
+                self.items[id].tags.remove(tagtodelete)
+
+    def tag_bind(self, tagorid, sequence=None, func=None, add=None):
+        self.bindings[(tagorid, sequence)] = func
+        return str(id(func))
+
+    def tag_unbind(self, tagorid, sequence, funcid=None):
+        if (tagorid, sequence) in self.bindings:
+            del self.bindings[(tagorid, sequence)]
+
+    def tag_lower(self, tagorid, belowthis=None):
+        ids = self.find(tagorid)
+        for id in ids:
+            self.order.remove(id)
+        if belowthis is None:
+            n = 0
+        else:
+            below = self.find(belowthis)
+            if len(below) == 0:
+                self.order.extend(ids)
+                return
+            n = self.order.index(below[0])
+        self.order[n:n] = ids
+
+    def tag_raise(self, tagorid, abovethis=None):
+        ids = self.find(tagorid)
+        for id in ids:
+            self.order.remove(id)
+        if abovethis is None:
+            n = len(self.order)
+        else:
+            above = self.find(abovethis)
+            if len(above) == 0:
+                self.order.extend(ids)
+                return
+            n = self.order.index(above[-1]) + 1
+        self.order[n:n] = ids
+
+    lower = tag_lower
+    lift = tag_raise
+
+    def visibleitems(self):
+        """
+        Returns the items that are not hidden, from bottom to top
+        """
+        return [self.items[id] for id in self.order if self.items[id].state() != 'hidden']
+
+    def svg(self):
+        """
+        Returns the contents of the canvas as an SVG document
+        """
+        width = int(self.config['width'])
+        height = int(self.config['height'])
+        out = list()
+        out.append('<?xml version="1.0" encoding="UTF-8"?>\n')
+        out.append('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" viewBox="0 0 %d %d">\n' %
+                   (width, height, width, height))
+        out.append('<rect x="0" y="0" width="%d" height="%d" fill="%s"/>\n' %
+                   (width, height, svgcolor(parsecolor(self.config['background']))))
+        for item in self.visibleitems():
+            if item.kind == 'text':
+                fill = item.color('fill')
+                if fill is None:
+                    continue
+                box = item.bbox()
+                for n, line in enumerate(item.textlines()):
+                    if len(line.strip()) == 0:
+                        continue
+                    out.append('<text x="%d" y="%d" fill="%s" font-family="monospace" font-size="11px" '
+                               'textLength="%d" xml:space="preserve">%s</text>\n' %
+                               (box[0], box[1] + n * LINEHEIGHT + 10, svgcolor(fill),
+                                len(line) * CHARWIDTH, escape(line.encode('utf-8'))))
+            elif item.kind == 'line':
+                fill = item.color('fill')
+                if fill is None or len(item.coords) < 4:
+                    continue
+                points = ' '.join(['%.1f,%.1f' % (item.coords[n], item.coords[n + 1])
+                                   for n in xrange(0, len(item.coords) - 1, 2)])
+                out.append('<polyline points=%s fill="none" stroke="%s" stroke-width="%d"/>\n' %
+                           (quoteattr(points), svgcolor(fill), item.linewidth()))
+            elif item.kind == 'rectangle':
+                fill = item.color('fill')
+                outline = item.color('outline')
+                x0, y0, x1, y1 = item.coords[:4]
+                out.append('<rect x="%.1f" y="%.1f" width="%.1f" height="%.1f" fill="%s" stroke="%s"/>\n' %
+                           (min(x0, x1), min(y0, y1), abs(x1 - x0), abs(y1 - y0),
+                            svgcolor(fill), svgcolor(outline)))
+        out.append('</svg>\n')
+        return ''.join(out)
+
+    def writesvg(self, filename):
+        """
+        Writes the contents of the canvas to an SVG file
+        """
+        f = open(filename, 'wb')
+        try:
+            f.write(self.svg())
+        finally:
+            f.close()
+
+    def raster(self):
+        """
+        Returns the contents of the canvas rasterized in a Raster
+        """
+        image = Raster(int(self.config['width']), int(self.config['height']),
+                       parsecolor(self.config['background']) or (0, 0, 0))
+        for item in self.visibleitems():
+            if item.kind == 'text':
+                fill = item.color('fill')
+                if fill is None:
+                    continue
+                box = item.bbox()
+                for n, line in enumerate(item.textlines()):
+                    image.text(box[0], box[1] + n * LINEHEIGHT, line, fill)
+            elif item.kind == 'line':
+                fill = item.color('fill')
+                if fill is None:
+                    continue
+                c = item.coords
+                w = item.linewidth()
+                for n in xrange(0, len(c) - 3, 2):
+                    image.line(c[n], c[n + 1], c[n + 2], c[n + 3], fill, w)
+            elif item.kind == 'rectangle':
+                x0, y0, x1, y1 = item.coords[:4]
+                x0, x1 = int(round(min(x0, x1))), int(round(max(x0, x1)))
+                y0, y1 = int(round(min(y0, y1))), int(round(max(y0, y1)))
+                fill = item.color('fill')
+                if fill is not None:
+                    image.fillrect(x0, y0, x1, y1, fill)
+                outline = item.color('outline')
+                if outline is not None:
+                    w = item.linewidth()
+                    image.fillrect(x0, y0, x1, y0 + w, outline)
+                    image.fillrect(x0, y1 - w, x1, y1, outline)
+                    image.fillrect(x0, y0, x0 + w, y1, outline)
+                    image.fillrect(x1 - w, y0, x1, y1, outline)
+        return image
+
+    def writepng(self, filename):
+        """
+        Writes the contents of the canvas to a PNG file
+        """
+        f = open(filename, 'wb')
+        try:
+            f.write(self.raster().png())
+        finally:
+            f.close()
+
+
+def svgcolor(rgb):
+    """
+    Returns an (r, g, b) triplet as an SVG color, none if there is no color
+    """
+    if rgb is None:
+        return 'none'
+    return '#%02X%02X%02X' % rgb
+
+
+class Raster:
+    """
+    A 24 bit RGB image in memory with just enough drawing primitives for the canvas items
+    """
+    def __init__(self, width, height, background=(0, 0, 0)):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(str(bytearray(background)) * (width * height))
+        # pixel offsets (row, column) of the glyphs of the font, built on first use
+        self.glyphs = None
+
+    def fillrect(self, x0, y0, x1, y1, rgb):
+        """
+        Fills the rectangle from (x0, y0) up to but not including (x1, y1)
+        """
+        x0 = max(0, x0)
+        y0 = max(0, y0)
+        x1 = min(self.width, x1)
+        y1 = min(self.height, y1)
+        if x1 <= x0 or y1 <= y0:
+            return
+        row = bytearray(rgb) * (x1 - x0)
+        stride = 3 * self.width
+        for y in xrange(y0, y1):
+            start = y * stride + 3 * x0
+            self.pixels[start:start + len(row)] = row
+
+    def line(self, x0, y0, x1, y1, rgb, width=1):
+        """
+        Draws a line from (x0, y0) to (x1, y1) with a square pen of the given width
+        """
+        x0 = int(round(x0))
+        y0 = int(round(y0))
+        x1 = int(round(x1))
+        y1 = int(round(y1))
+        h = width / 2
+        if x0 == x1 or y0 == y1:
+            # horizontal and vertical lines (axes, grid) are just rectangles
+            self.fillrect(min(x0, x1) - h, min(y0, y1) - h, max(x0, x1) - h + width, max(y0, y1) - h + width, rgb)
+            return
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        pixels = self.pixels
+        w = self.width
+        r, g, b = rgb
+        while True:
+            if width == 1:
+                if 0 <= x0 < w and 0 <= y0 < self.height:
+                    n = 3 * (y0 * w + x0)
+                    pixels[n] = r
+                    pixels[n + 1] = g
+                    pixels[n + 2] = b
+            else:
+                self.fillrect(x0 - h, y0 - h, x0 - h + width, y0 - h + width, rgb)
+            if x0 == x1 and y0 == y1:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    def text(self, x, y, text, rgb):
+        """
+        Draws a line of text with its top left corner at (x, y) using the built in font
+        """
+        if self.glyphs is None:
+            self.glyphs = list()
+            for rows in FONT:
+                glyph = list()
+                for row in xrange(LINEHEIGHT):
+                    bits = int(rows[2 * row:2 * row + 2], 16)
+                    for column in xrange(CHARWIDTH):
+                        if bits & (0x40 >> column):
+                            glyph.append((row, column))
+                self.glyphs.append(glyph)
+        pixels = self.pixels
+        w = self.width
+        r, g, b = rgb
+        for c in text:
+            n = ord(c) - 32
+            if n < 0 or n >= len(self.glyphs):
+                # no glyph, draw a question mark
+                n = ord('?') - 32
+            if 0 <= x and x + CHARWIDTH <= w and 0 <= y and y + LINEHEIGHT <= self.height:
+                for row, column in self.glyphs[n]:
+                    p = 3 * ((y + row) * w + x + column)
+                    pixels[p] = r
+                    pixels[p + 1] = g
+                    pixels[p + 2] = b
+            else:
+                # partially visible, clip each pixel
+                for row, column in self.glyphs[n]:
+                    if 0 <= x + column < w and 0 <= y + row < self.height:
+                        p = 3 * ((y + row) * w + x + column)
+                        pixels[p] = r
+                        pixels[p + 1] = g
+                        pixels[p + 2] = b
+            x += CHARWIDTH
+
+    def png(self):
+        """
+        Returns the image encoded as a PNG file
+        """
+        stride = 3 * self.width
+        raw = bytearray()
+        for y in xrange(self.height):
+            raw.append(0)
+            raw.extend(self.pixels[y * stride:(y + 1) * stride])
+
+        def chunk(tag, data):
+            return (struct.pack('>I', len(data)) + tag + data +
+                    struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+        return ('\x89PNG\r\n\x1a\n' +
+                chunk('IHDR', struct.pack('>2I5B', self.width, self.height, 8, 2, 0, 0, 0)) +
+                chunk('IDAT', zlib.compress(str(raw), 6)) +
+                chunk('IEND', ''))
+
+
+class RecordingCanvas(HeadlessCanvas):
+    """
+    A headless canvas that counts the calls made to it and the items created on it, to measure the cost of
+    drawing the views
+    """
+    # the canvas methods that are counted
+    recorded = ('create_text', 'create_line', 'create_rectangle', 'coords', 'move', 'scale', 'delete', 'bbox',
+                'itemconfigure', 'itemcget', 'addtag_withtag', 'tag_bind', 'tag_unbind', 'tag_lower', 'tag_raise',
+                'find_all', 'find_withtag')
+
+    def __init__(self, width=800, height=600, background='#000'):
+        HeadlessCanvas.__init__(self, width, height, background)
+        self.calls = dict()
+        self.created = dict()
+        self.peakitems = 0
+        for name in self.recorded:
+            setattr(self, name, self.recorder(name, getattr(self, name)))
+
+    def recorder(self, name, method):
+        """
+        Returns method wrapped so that each call is counted under name
+        """
+        calls = self.calls
+
+        def counted(*args, **kw):
+            calls[name] = calls.get(name, 0) + 1
+            return method(*args, **kw)
+        return counted
+
+    def create(self, kind, args, options):
+        id = HeadlessCanvas.create(self, kind, args, options)
+        self.created[kind] = self.created.get(kind, 0) + 1
+        self.peakitems = max(self.peakitems, len(self.items))
+        return id
+
+    def operations(self):
+        """
+        Returns the total number of counted calls
+        """
+        return sum(self.calls.values())
+
+    def reset(self):
+        """
+        Resets the counters, the items on the canvas are kept
+        """
+        self.calls.clear()
+        self.created.clear()
+        self.peakitems = len(self.items)
+
+
+def renderdemo(filename, outdir, format='png', width=800, height=600, views=None, graphs=None):
+    """
+    Renders the views of a demo file to images in outdir, named after the demo file and the view
+
+    views is a list of view names (see VIEWS), None renders all views available for the demo file. graphs is a list
+    of team statistics attributes to render a team graph for, None renders the graph that the viewer shows first.
+
+    Returns the list of files written
+    """
+    report = SpringStatsViews.StatsViews()
+    available = report.loaddemofile(filename)
+    base = os.path.join(outdir, os.path.splitext(os.path.basename(filename))[0])
+    written = list()
+    for name, view in VIEWS:
+        if view not in available or (views is not None and name not in views):
+            continue
+        if view == 2 and graphs is not None:
+            targets = list()
+            for attribute in graphs:
+                targets.append((base + '-graph-' + attribute, attribute))
+        else:
+            targets = [(base + '-' + name, None)]
+        for target, attribute in targets:
+            if attribute is not None and not report.selectgraph(attribute):
+                continue
+            canvas = HeadlessCanvas(width, height, '#000')
+            report.drawview(canvas, view)
+            target += '.' + format
+            if format == 'svg':
+                canvas.writesvg(target)
+            else:
+                canvas.writepng(target)
+            report.clearview(canvas, view)
+            written.append(target)
+    return written
+
+
+def renderjob(job):
+    """
+    Renders the views of a demo file in a worker process
+
+    job is a tuple of the filename and the keyword arguments of renderdemo, returns the filename, the list of files
+    written and an error message or None
+    """
+    filename, kw = job
+    try:
+        return filename, renderdemo(filename, **kw), None
+    except Exception, e:
+        return filename, [], str(e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the statistics of Spring demo files to PNG or SVG images')
+    parser.add_argument('demos', nargs='+', help='demo files or directories with demo files')
+    parser.add_argument('-o', '--outdir', default='.', help='directory to write the images to')
+    parser.add_argument('-f', '--format', choices=('png', 'svg'), default='png', help='image format')
+    parser.add_argument('--width', type=int, default=800, help='image width in pixels (minimum 800)')
+    parser.add_argument('--height', type=int, default=600, help='image height in pixels (minimum 600)')
+    parser.add_argument('--view', action='append', choices=[v[0] for v in VIEWS],
+                        help='view to render, may be repeated (default: all available views)')
+    parser.add_argument('--graph', action='append', metavar='ATTRIBUTE',
+                        help='team statistic to render a team graph for, such as metalProduced, may be repeated')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of worker processes')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.outdir):
+        os.makedirs(args.outdir)
+    kw = {'outdir': args.outdir, 'format': args.format,
+          'width': max(800, args.width), 'height': max(600, args.height),
+          'views': args.view, 'graphs': args.graph}
+    jobs = [(filename, kw) for filename in SpringDemoBatch.demofiles(args.demos)]
+    if args.jobs > 1:
+        pool = multiprocessing.Pool(args.jobs)
+        results = pool.imap_unordered(renderjob, jobs)
+    else:
+        pool = None
+        results = (renderjob(job) for job in jobs)
+    failed = 0
+    for filename, written, error in results:
+        if error is not None:
+            failed += 1
+            sys.stderr.write(filename + ': ' + error + '\n')
+        else:
+            print filename + ': ' + ', '.join([os.path.basename(f) for f in written])
+    if pool is not None:
+        pool.close()
+        pool.join()
+    return 1 if failed > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2709 @@
+#!/usr/bin/python
+#
+# SpringStatsViews - Drawing of the Spring Stats Viewer views on a canvas
+#
+# The views only use the Tk canvas interface (create_text, create_line, coords, ...), so they draw
+# on the Tix.Canvas of the viewer as well as on the headless canvas of SpringStatsRender.
+#
+# Tested on Python 2.7.2, Windows 7 on ZK Games only, YMMV on other platforms and other games based on Spring
+#
+# (C) 2011, Rene van 't Veen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# For a copy of the GNU General Public License see <http://www.gnu.org/licenses/>.
+#
+"""Views of the statistics in a Spring demo file, drawn on a Tk style canvas"""
+
+from Tkconstants import N, NE, NW, CENTER, NORMAL, DISABLED, HIDDEN
+import SpringDemoFile
+import SpringDemoReducers
+import array
+
+__author__ = 'rene'
+__version__ = '0.2.1'
+
+
+class SeriesPyramid:
+    """
+    Multi-resolution minimum/maximum pyramid over a regularly sampled series (such as a team statistic)
+
+    Level 0 is the series itself, every next level holds the minimum and maximum of two adjacent blocks of the level
+    below it, so a block on level k covers 2 ** k samples. Drawing a time window then takes a number of points
+    proportional to the width of the graph in pixels, no matter how long the series is.
+    """
+    def __init__(self, values, period):
+        """
+        Builds the pyramid over the sequence values, sampled every period seconds starting at time 0
+        """
+        self.period = period
+        self.length = len(values)
+        level = array.array('d', values)
+        # minima, maxima and for each block whether its minimum comes before its maximum
+        self.mins = [level]
+        self.maxs = [level]
+        self.minfirst = [None]
+        while len(self.mins[-1]) > 1:
+            mins = self.mins[-1]
+            maxs = self.maxs[-1]
+            first = self.minfirst[-1]
+            nmins = array.array('d')
+            nmaxs = array.array('d')
+            nfirst = bytearray()
+            n = len(mins)
+            for j in xrange(0, n, 2):
+                if j + 1 == n:
+                    # odd block at the end, carried up as is
+                    nmins.append(mins[j])
+                    nmaxs.append(maxs[j])
+                    nfirst.append(1 if first is None else first[j])
+                    continue
+                mininleft = mins[j] <= mins[j + 1]
+                maxinleft = maxs[j] >= maxs[j + 1]
+                nmins.append(mins[j] if mininleft else mins[j + 1])
+                nmaxs.append(maxs[j] if maxinleft else maxs[j + 1])
+                if mininleft != maxinleft:
+                    nfirst.append(1 if mininleft else 0)
+                elif first is None:
+                    nfirst.append(1)
+                else:
+                    nfirst.append(first[j] if mininleft else first[j + 1])
+            self.mins.append(nmins)
+            self.maxs.append(nmaxs)
+            self.minfirst.append(nfirst)
+
+    def valueat(self, t):
+        """
+        Returns the value at time t, interpolated linearly between the samples around it
+        """
+        values = self.mins[0]
+        if self.length == 0:
+            return 0.0
+        if t <= 0:
+            return values[0]
+        i, r = divmod(float(t), self.period)
+        i = int(i)
+        if i >= self.length - 1:
+            return values[self.length - 1]
+        return values[i] + (values[i + 1] - values[i]) * r / self.period
+
+    def sampleat(self, t):
+        """
+        Returns the sample recorded at or just before time t, or None if there are no samples.
+
+        The samples are regularly spaced, so this is plain arithmetic on the period
+        """
+        if self.length == 0:
+            return None
+        i = int(t // self.period)
+        if i < 0:
+            i = 0
+        elif i > self.length - 1:
+            i = self.length - 1
+        return self.mins[0][i]
+
+    def extent(self, i0, i1):
+        """
+        Returns a tuple (minimum, maximum) over the samples i0 up to and including i1 or None if that range is empty.
+
+        The range is covered by at most two blocks per level, so this is logarithmic in the length of the series
+        """
+        if i0 < 0:
+            i0 = 0
+        if i1 > self.length - 1:
+            i1 = self.length - 1
+        lo = None
+        hi = None
+        k = 0
+        while i0 <= i1:
+            # a left edge that is a right child and a right edge that is a left child are taken on this level,
+            # whatever remains in between is covered by the level above
+            for i in (i0 if i0 & 1 else None, i1 if not i1 & 1 else None):
+                if i is None:
+                    continue
+                if lo is None or self.mins[k][i] < lo:
+                    lo = self.mins[k][i]
+                if hi is None or self.maxs[k][i] > hi:
+                    hi = self.maxs[k][i]
+                if i0 == i1:
+                    break
+            if i0 & 1:
+                i0 += 1
+            if not i1 & 1:
+                i1 -= 1
+            i0 >>= 1
+            i1 >>= 1
+            k += 1
+        if lo is None:
+            return None
+        return (lo, hi)
+
+    def points(self, t0, t1, resolution):
+        """
+        Returns a list of (time, value) tuples to draw the series between the times t0 and t1 using no more than
+        about 2 * resolution points.
+
+        The blocks are taken from the coarsest level that still has at least one block per resolution step, each
+        block contributes its minimum and maximum in the order they occur. The window edges are interpolated.
+        """
+        result = list()
+        if self.length == 0 or t1 <= t0:
+            return result
+        i0 = int(-(-t0 // self.period))
+        i1 = int(t1 // self.period)
+        if i1 > self.length - 1:
+            i1 = self.length - 1
+        if i0 * self.period > t0:
+            result.append((t0, self.valueat(t0)))
+        if i0 <= i1:
+            k = 0
+            while (i1 - i0 + 1) >> k > resolution and k + 1 < len(self.mins):
+                k += 1
+            size = 1 << k
+            mins = self.mins[k]
+            maxs = self.maxs[k]
+            first = self.minfirst[k]
+            for j in xrange(i0 >> k, (i1 >> k) + 1):
+                ts = max(j * size, i0) * self.period
+                if k == 0:
+                    result.append((ts, mins[j]))
+                    continue
+                te = min((j + 1) * size - 1, i1) * self.period
+                if first[j]:
+                    result.append((ts, mins[j]))
+                    result.append((te, maxs[j]))
+                else:
+                    result.append((ts, maxs[j]))
+                    result.append((te, mins[j]))
+        if i1 * self.period < t1 and i1 < self.length - 1:
+            result.append((t1, self.valueat(t1)))
+        return result
+
+
+#
+# The views keep their state in the instance, the viewer application mixes them in with its Tix.Frame
+#
+
+
+class StatsViews:
+    """
+    Draws the views of a demo file on a canvas
+
+    view 0 is the game info
+    view 1 is the player stats
+    view 2 is the team graph
+    view 3 is the awards list
+    view 4 is the chat log
+    view 5 is the unit stats
+    view 6 is the damage stats
+    view 7 is the network traffic
+    """
+
+    def __init__(self):
+        """
+        Constructor, sets up the state of the views without a demo file
+        """
+        self.demofile = None
+        self.teams = dict()
+        self.playerorder = list()
+        self.playerbykey = dict()
+        self.chat = None
+        self.unitstats = None
+        self.damagestats = None
+        # actions per player over time, counted while reading the demo stream, and the time bin in seconds
+        self.actions = None
+        self.actionbinsize = 60.0
+        # records and bytes per record type and player over time, counted while reading the demo stream
+        self.network = None
+        # simulation speed and player CPU usage and ping over time, profiled while reading the demo stream
+        self.speed = None
+        # who was connected when, kept while reading the demo stream
+        self.roster = None
+
+        self.graphbuttonlabels = (
+            ('Metal',
+             (
+                 ('Produced', 'metalProduced'),
+                 ('Used', 'metalUsed'),
+                 ('Excess', 'metalExcess'),
+                 ('Sent', 'metalSent'),
+                 ('Received', 'metalReceived')
+             )
+             ), ('Energy',
+                 (
+                     ('Produced', 'energyProduced'),
+                     ('Used', 'energyUsed'),
+                     ('Excess', 'energyExcess'),
+                     ('Sent', 'energySent'),
+                     ('Received', 'energyReceived')
+                 )
+                 ), ('Damage',
+                     (
+                         ('Dealt', 'damageDealt'),
+                         ('Received', 'damageReceived')
+                     )
+                     ), ('Units', (
+                ('Produced', 'unitsProduced'),
+                ('Died', 'unitsDied'),
+                ('Killed', 'unitsKilled'),
+                ('Received', 'unitsReceived'),
+                ('Sent', 'unitsSent'),
+                ('Captured', 'unitsCaptured'),
+                ('Stolen', 'unitsOutCaptured')
+            )
+                         ), ('Actions', (
+                ('All', 'actions'),
+                ('Commands', 'commands'),
+                ('Selections', 'selections'),
+                ('AI', 'aicommands')
+            )
+                             ), ('Lag', (
+                ('CPU', 'cpu'),
+                ('Ping', 'ping')
+            )
+                                 )
+        )
+
+        self.selectedgraphcategory = 2
+        self.selectedgraphitem = 0
+        self.selectedgraphattribute = 'damageDealt'
+
+        self.graphitembuttons = dict()
+        self.graphcategorybuttons = dict()
+        self.playerbuttons = dict()
+        self.verticalaxis = list()
+        self.horizontalaxis = list()
+        self.graphlines = list()
+        self.graphanchors = dict()
+        self.graphtextheight = 0
+        # visible time window of the team graph, None for the whole game, and the min/max pyramids per player series
+        self.graphwindow = None
+        self.graphpyramids = dict()
+        self.graphyscale = 1.0
+        # canvas items of the value readout (cursor line, background, text), created on first use
+        self.graphreadout = list()
+        self.playerbuttonwidth = 0
+        self.playerbuttonheight = 0
+
+        self.chatdimensions = None
+        self.chatbuttons = dict()
+        self.chatpagestartline = None
+        self.chattexts = list()
+
+        self.unitdimensions = None
+        self.unitbuttons = dict()
+        self.unitpagestartline = None
+        self.unittexts = list()
+
+        self.damagedimensions = None
+        self.damagebuttons = dict()
+        self.damagepagestartline = None
+        self.damagetexts = list()
+
+    def loaddemofile(self, filename):
+        """
+        Reads the demo file with the given name and prepares the views on it
+
+        Returns the list of views that are available for the demo file, view 0 (the game info) is always
+        available.
+        """
+        self.demofile = None
+        self.teams = dict()
+        self.playerorder = list()
+        self.playerbykey = dict()
+        self.chat = None
+        self.unitstats = None
+        self.damagestats = None
+        self.actions = SpringDemoReducers.ActionTimeline(self.actionbinsize)
+        self.network = SpringDemoReducers.BandwidthProfile(self.actionbinsize)
+        self.speed = SpringDemoReducers.SpeedProfile()
+        self.roster = None
+        self.graphwindow = None
+        self.graphpyramids = dict()
+        self.chatdimensions = None
+        self.chatpagestartline = None
+        views = [0]
+
+        self.demofile = SpringDemoFile.DemoFileReader(filename, dirname=None)
+        # read the header
+        if self.demofile.header():
+            # okay, read the header
+            tmp = self.demofile.script()
+            if tmp is not None:
+                # okay, read the demo stream
+                self.roster = SpringDemoReducers.RosterIndex(self.demofile.players)
+                tmp = self.demofile.demostream(reducers=[self.actions, self.network, self.speed, self.roster])
+                if tmp is not None and tmp > 0:
+                    views.append(7)
+                    awards = self.demofile.awards()
+                    if awards is not None and len(awards) > 0:
+                        views.append(3)
+                    self.chat = self.demofile.chatlog()
+                    if self.chat is not None and len(self.chat) > 0:
+                        views.append(4)
+                    ustats = self.demofile.unitstats()
+                    if ustats is not None and len(ustats) > 0:
+                        self.prepareunitstats(ustats)
+                        views.append(5)
+                        # if unitstats is non empty we may have damage stats too
+                        dstats = self.demofile.damagestats()
+                        if dstats is not None and len(dstats) > 0:
+                            self.preparedamagestats(dstats)
+                            views.append(6)
+
+            if tmp is not None and not self.demofile.incomplete and not self.demofile.crashed:
+                # okay, if the game is not incomplete or crashed, then read the player and team stats
+                tmp = self.demofile.playerstats()
+                if tmp is not None:
+                    views.append(1)
+                    tmp = self.demofile.teamstats()
+                    if tmp is not None and self.checkteamstatlength():
+                        views.append(2)
+        self.demofile.close()
+        self.assembleteamstructure()
+        views.sort()
+        return views
+
+    def drawview(self, canvas, view):
+        """
+        Draws the given view (0 to 7) on an empty canvas
+        """
+        if view == 0:
+            self.drawgameinfo(canvas)
+        elif view == 1:
+            self.drawplayerstats(canvas)
+        elif view == 2:
+            self.drawteamstats(canvas)
+        elif view == 3:
+            self.drawawards(canvas)
+        elif view == 4:
+            self.drawchat(canvas)
+        elif view == 5:
+            self.drawunits(canvas)
+        elif view == 6:
+            self.drawdamages(canvas)
+        elif view == 7:
+            self.drawnetwork(canvas)
+
+    def selectgraph(self, attribute):
+        """
+        Selects the team statistics attribute (such as 'metalProduced') shown by the team graph
+
+        Returns False if there is no graph for the attribute
+        """
+        for c in xrange(len(self.graphbuttonlabels)):
+            for i in xrange(len(self.graphbuttonlabels[c][1])):
+                if self.graphbuttonlabels[c][1][i][1] == attribute:
+                    self.selectedgraphcategory = c
+                    self.selectedgraphitem = i
+                    self.selectedgraphattribute = attribute
+                    return True
+        return False
+
+    def clearview(self, canvas, view):
+        """
+        Clears the canvas of the given view
+        """
+        if view == 2:
+            self.cleargraph(canvas)
+        elif view == 4:
+            self.clearchat(canvas)
+        elif view == 5:
+            self.clearunits(canvas)
+        elif view == 6:
+            self.cleardamages(canvas)
+        else:
+            # clear canvas
+            for tag in canvas.find_all():
+                canvas.delete(tag)
+
+    def pickcolor(self, teamno, teamplayer, nteams):
+        """
+        Returns an RGB triplet in Tk format giving a 'color' to a player depending on which team he is in
+        """
+        huestep = 360 / nteams
+        huerange = huestep / 3
+        n = teamplayer % 5
+        basehue = huestep * teamno
+        h = (basehue, basehue + huerange, basehue - huerange, basehue + huerange / 2, basehue - huerange / 2)[n]
+        if h < 0:
+            h += 360
+        n = (teamplayer / 5) % 5
+        s = (1.0, 0.5, 0.75, 0.5, 0.75)[n]
+        v = (1.0, 0.75, 1.0, 1.0, 0.5)[n]
+        c = v * s
+        hprime = float(h) / 60.0
+        x = c * (1 - abs((divmod(hprime, 2))[1] - 1))
+        if hprime < 1:
+            r = c
+            g = x
+            b = 0
+        elif hprime < 2:
+            r = x
+            g = c
+            b = 0
+        elif hprime < 3:
+            r = 0
+            g = c
+            b = x
+        elif hprime < 4:
+            r = 0
+            g = x
+            b = c
+        elif hprime < 5:
+            r = x
+            g = 0
+            b = c
+        else:
+            r = c
+            g = 0
+            b = x
+        r += v - c
+        g += v - c
+        b += v - c
+        ir = int(255.0 * r + 0.49999)
+        ig = int(255.0 * g + 0.49999)
+        ib = int(255.0 * b + 0.49999)
+        result = '#%02X%02X%02X' % (ir, ig, ib)
+        # print str(teamno) + ':' + str(teamplayer) + 'HSV: ' + str(h) +', ' +
+        # str(s) + ', ' + str(v) + ' RGB: ' + result
+        return result
+
+    def assembleteamstructure(self):
+        """
+        Fills the self.teams dictionary, the self.playerorder list and the self.playerbykey structures
+        """
+        self.teams = dict()
+        self.playerorder = list()
+        self.playerbykey = dict()
+        if self.demofile is None:
+            return
+        if self.demofile.teams is None or len(self.demofile.teams) == 0:
+            return
+        for t in self.demofile.teams:
+            if t[1] in self.teams:
+                self.teams[t[1]].append(t[0])
+            else:
+                self.teams[t[1]] = list()
+                self.teams[t[1]].append(t[0])
+        teamno = 1
+        playerno = 0
+        nteams = len(self.teams)
+        for t in self.teams:
+            self.teams[t].sort()
+            teamplayerno = 0
+            for p in self.teams[t]:
+                self.playerorder.append(p)
+                self.playerbykey[p] = [
+                    self.pickcolor(teamno - 1, teamplayerno, nteams), teamno, teamplayerno, playerno, p]
+                teamplayerno = teamplayerno + 1
+                playerno = playerno + 1
+            teamno = teamno + 1
+
+    def checkteamstatlength(self):
+        """
+        Return true if the length of at least one entry in the demo file teamstats > 1, false otherwise
+        """
+        vlength = 0
+        for p in self.demofile.teamstatistics:
+            if len(self.demofile.teamstatistics[p]) > vlength:
+                vlength = len(self.demofile.teamstatistics[p])
+                if vlength > 1:
+                    return True
+        if vlength > 1:
+            return True
+        else:
+            return False
+
+    def prepareunitstats(self, ustats):
+        """
+        Prepares unit stats for display. The ustats parameter is the table as returned by SpringDemoFile.unitstats(), where
+        each entry is a list of five elements.
+
+        This method assigns it to self.unitstats and adds 4 elements to each entry, each entry with value 0.0, these are
+        used to collect:
+        1. Total Damage dealt
+        2. Total Damage received
+        3. Total EMP damage dealt
+        4. Total EMP damage received
+
+        The latter quantites are filled in by preparedamagestats.
+        """
+        self.unitstats = ustats
+        for r in self.unitstats:
+            r.append(0.0)
+            r.append(0.0)
+            r.append(0.0)
+            r.append(0.0)
+
+    def preparedamagestats(self, dstats):
+        """
+        Prepares damage stats for display. The dstats parameter is the table as returned by SpringDemoFile.damagestats(), where
+        each entry is a list of four elements.
+
+        This method assigns it to self.damagestats and adds 2 elements to each entry, each entry with value 0.0, these are
+        used to collect:
+        1. Damage received
+        2. EMP damage received
+
+        In addition it accumulates totals in self.unitstats. Note that self.prepareunitstats must have been called prior
+        to calling this method.
+        """
+        if self.unitstats is not None:
+            udict = dict()
+            nunittypes = 0
+            for u in self.unitstats:
+                udict[u[0]] = nunittypes
+                nunittypes += 1
+
+        self.damagestats = dstats
+        ddict = dict()
+        rdict = dict()
+        n = 0
+        for r in self.damagestats:
+            r.append(0.0)
+            r.append(0.0)
+            if self.unitstats is not None:
+                if r[0] not in udict:
+                    # this should really not happen as it means that the damaging unit was never completed ..
+                    newunit = list()
+                    newunit.append(r[0])
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    self.unitstats.append(newunit)
+                    udict[r[0]] = nunittypes
+                    nunittypes += 1
+                self.unitstats[udict[r[0]]][5] += r[2]
+                self.unitstats[udict[r[0]]][7] += r[3]
+                if r[1] not in udict:
+                    # this may happen if the damaged unit was never completed and thus no
+                    # record was made in mod_unitstats
+                    newunit = list()
+                    newunit.append(r[1])
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    newunit.append(0.0)
+                    self.unitstats.append(newunit)
+                    udict[r[1]] = nunittypes
+                    nunittypes += 1
+                self.unitstats[udict[r[1]]][6] += r[2]
+                self.unitstats[udict[r[1]]][8] += r[3]
+            if r[0] not in ddict:
+                ddict[r[0]] = dict()
+            ddict[r[0]][r[1]] = n
+            if r[1] not in rdict:
+                rdict[r[1]] = dict()
+            rdict[r[1]][r[0]] = n
+            n += 1
+        for r in self.damagestats:
+            if r[0] in rdict:
+                if r[1] in rdict[r[0]]:
+                    self.damagestats[rdict[r[0]][r[1]]][4] = r[2]
+                    self.damagestats[rdict[r[0]][r[1]]][5] = r[3]
+
+    def drawgameinfo(self, canvas):
+        """
+        Draw on the game info canvas to display meta-information about the loaded game
+        """
+        # clear canvas
+        for tag in canvas.find_all():
+            canvas.delete(tag)
+
+        # print 'Canvas w=' + str(canvas['width']) + ' h=' + str(canvas['height'])
+        # print 'Current size: w=' + str(self.canvas.winfo_width()) + ' h=' + str(self.canvas.winfo_height())
+        # print 'Requested size: w=' + str(self.canvas.winfo_reqwidth()) + ' h=' + str(self.canvas.winfo_reqheight())
+
+        if self.demofile is None:
+            # No game loaded
+            canvas.create_text(400, 300, text='No demo file loaded',
+                               state=DISABLED,
+                               disabledfill='#EEE',
+                               fill='#FFF')
+        else:
+            if self.demofile.incomplete:
+                id = canvas.create_text(10, 10, anchor=NW, text='The game is incomplete',
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+            elif self.demofile.crashed:
+                id = canvas.create_text(10, 10, anchor=NW, text='The game crashed before it could complete',
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+            elif self.demofile.exited:
+                id = canvas.create_text(10, 10, anchor=NW, text='The game was exited before game over',
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+            else:
+                id = canvas.create_text(10, 10, anchor=NW, text='The game completed normally',
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+            # get the bbox of the text to determine the vertical offset
+            # print 'ID of box = ' + str(id)
+            box = canvas.bbox(id)
+            # print 'Box dimensions ' + str(box[0]) + ', ' + str(box[1]) + ' --> ' + str(box[2]) + ', ' + str(box[3])
+            # print 'Next line offset = ' + str(1.5 * (box[3] - box[1]))
+            offset = 1.5 * (box[3] - box[1])
+            n = 1
+            if self.demofile.errormessage() is not None:
+                id = canvas.create_text(
+                    10, 10 + n * offset, anchor=NW, text='Error: ' + self.demofile.errormessage(),
+                    state=DISABLED,
+                    disabledfill='#E11',
+                    fill='#F00')
+                n = n + 1
+            if self.demofile.gametype is not None:
+                id = canvas.create_text(10, 10 + n * offset, anchor=NW, text='Game: ' + self.demofile.gametype,
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+                n = n + 1
+            if self.demofile.map is not None:
+                id = canvas.create_text(10, 10 + n * offset, anchor=NW, text='Map: ' + self.demofile.map,
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+                n = n + 1
+            if not self.demofile.incomplete:
+                s1 = ''
+                s2 = ''
+                hrs = self.demofile.totalgametime / 3600
+                if hrs > 0:
+                    s1 = s1 + str(hrs) + 'h'
+                min = (self.demofile.totalgametime / 60) % 60
+                if hrs > 0 or min > 0:
+                    s1 = s1 + str(min) + 'm'
+                sec = self.demofile.totalgametime % 60
+                if sec != 0:
+                    s1 = s1 + str(sec) + 's'
+                hrs = self.demofile.elapsedrealtime / 3600
+                if hrs > 0:
+                    s2 = s2 + str(hrs) + 'h'
+                min = (self.demofile.elapsedrealtime / 60) % 60
+                if hrs > 0 or min > 0:
+                    s2 = s2 + str(min) + 'm'
+                sec = self.demofile.elapsedrealtime % 60
+                if sec != 0:
+                    s2 = s2 + str(sec) + 's'
+                id = canvas.create_text(
+                    10, 10 + n * offset, anchor=NW, text='Duration: ' + s1 + ' (Total: ' + s2 + ')',
+                    state=DISABLED,
+                    disabledfill='#EEE',
+                    fill='#FFF')
+                n = n + 1
+            # display the members of the teams
+            teamno = 1
+            for t in self.teams:
+                id = canvas.create_text(10, 10 + n * offset, anchor=NW, text='Team #' + str(teamno) + ':',
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+                box = canvas.bbox(id)
+                taboffset = offset + box[2]
+                xoffset = taboffset
+                for p in self.teams[t]:
+                    id = canvas.create_text(taboffset, 10 + n * offset, anchor=NW, text=p,
+                                            state=DISABLED,
+                                            disabledfill=self.playerbykey[p][0],
+                                            fill=self.playerbykey[p][0])
+                    box = canvas.bbox(id)
+                    if box[2] - box[0] + xoffset >= int(canvas['width']):
+                        # print 'Player '+ p + ' with width ' + str(box[2]-box[0]) + ' no longer
+                        # fits at ' + str(xoffset)
+                        canvas.move(id, 0, offset)
+                        n = n + 1
+                        xoffset = taboffset + box[2] - box[0] + offset
+                    else:
+                        # print 'Player '+ p + ' with width ' + str(box[2]-box[0]) + ' fits at ' + str(xoffset)
+                        canvas.move(id, xoffset - taboffset, 0)
+                        xoffset = xoffset + box[2] - box[0] + offset
+
+                n = n + 1
+                teamno = teamno + 1
+            # say who won
+            if self.demofile.exited or len(self.demofile.winningteam) == 0 or self.demofile.winningteam[
+                0] not in self.teams:
+                id = canvas.create_text(10, 10 + n * offset, anchor=NW, text='There is no winner',
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+            else:
+                id = canvas.create_text(
+                    10, 10 + n * offset, anchor=NW, text='Team #' + str(self.demofile.winningteam[0] + 1) + ' won.',
+                    state=DISABLED,
+                    disabledfill='#EEE',
+                    fill='#FFF')
+            n = n + 1
+
+    def lefttext(self, name):  # type (str) -> str
+        """
+        Returns the text for the player with the given name that has no statistics because the player left
+        """
+        if self.roster is not None:
+            for gametime, p, reason in self.roster.leavers():
+                if self.roster.names.get(p) != name:
+                    continue
+                if reason is not None and 0 <= reason < len(self.roster.REASONS):
+                    return 'Player %s at %s' % (self.roster.REASONS[reason], self.formatgametime(gametime))
+                return 'Player left at ' + self.formatgametime(gametime)
+        return 'Player left before game over'
+
+    def drawplayerstats(self, canvas):
+        """
+        Draw on the player stats canvas to statistics about player interaction
+
+        Player stats are displayed as a table with the top heading row
+        Player KP/m MP/m MC/m CMD/m Units/CMD
+
+        Each player gets a row, unless all values are zero in which case we say that the player quit before the game was over
+        """
+        # clear canvas
+        for tag in canvas.find_all():
+            canvas.delete(tag)
+        if (self.demofile is None or
+                self.demofile.incomplete or self.demofile.crashed or
+                self.demofile.playerstatistics is None):
+            return
+        # create the heading row
+        hrow = list()
+        id = canvas.create_text(10, 10, anchor=NW, text='Player',
+                                state=DISABLED,
+                                disabledfill='#EEE',
+                                fill='#FFF')
+        hrow.append(id)
+        box = canvas.bbox(id)
+        offset = box[3] - box[1]
+
+        id = canvas.create_text(310, 10, anchor=NE, text='KP/m',
+                                state=DISABLED,
+                                disabledfill='#EEE',
+                                fill='#FFF')
+        hrow.append(id)
+
+        id = canvas.create_text(430, 10, anchor=NE, text='MP/m',
+                                state=DISABLED,
+                                disabledfill='#EEE',
+                                fill='#FFF')
+        hrow.append(id)
+
+        id = canvas.create_text(550, 10, anchor=NE, text='MC/m',
+                                state=DISABLED,
+                                disabledfill='#EEE',
+                                fill='#FFF')
+        hrow.append(id)
+
+        id = canvas.create_text(670, 10, anchor=NE, text='CMD/m',
+                                state=DISABLED,
+                                disabledfill='#EEE',
+                                fill='#FFF')
+        hrow.append(id)
+
+        id = canvas.create_text(790, 10, anchor=NE, text='Units/CMD',
+                                state=DISABLED,
+                                disabledfill='#EEE',
+                                fill='#FFF')
+        hrow.append(id)
+
+        # count the number of players and sort their names
+        ids = list()
+        n = 1
+        offset = 1.5 * offset
+        for p in self.playerorder:
+            if p not in self.demofile.playerstatistics:
+                # no player stats recorded for unreal / AI players
+                continue
+            rowids = list()
+            id = canvas.create_text(10, 10 + n * offset, anchor=NW, text=p,
+                                    state=DISABLED,
+                                    disabledfill=self.playerbykey[p][0],
+                                    fill=self.playerbykey[p][0])
+            rowids.append(id)
+
+            stats = self.demofile.playerstatistics[p]
+            if (stats.mousePixels == 0 and
+                    stats.mouseClicks == 0 and
+                    stats.keyPresses == 0 and
+                    stats.numCommands == 0 and
+                    stats.unitCommands == 0):
+                id = canvas.create_text(300, 10 + n * offset, anchor=NW, text=self.lefttext(p),
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+                rowids.append(id)
+            else:
+                s = "%.1f" % (float(stats.keyPresses) / 60.0)
+                id = canvas.create_text(310, 10 + n * offset, anchor=NE, text=s,
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+                rowids.append(id)
+                s = "%.1f" % (float(stats.mousePixels) / 60.0)
+                id = canvas.create_text(430, 10 + n * offset, anchor=NE, text=s,
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+                rowids.append(id)
+                s = "%.1f" % (float(stats.mouseClicks) / 60.0)
+                id = canvas.create_text(550, 10 + n * offset, anchor=NE, text=s,
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+                rowids.append(id)
+                s = "%.1f" % (float(stats.numCommands) / 60.0)
+                id = canvas.create_text(670, 10 + n * offset, anchor=NE, text=s,
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+                rowids.append(id)
+                if stats.numCommands == 0:
+                    s = '-'
+                else:
+                    s = "%.1f" % (float(stats.unitCommands) / float(stats.numCommands))
+                id = canvas.create_text(790, 10 + n * offset, anchor=NE, text=s,
+                                        state=DISABLED,
+                                        disabledfill='#EEE',
+                                        fill='#FFF')
+                rowids.append(id)
+            n = n + 1
+            ids.append(rowids)
+
+        # print ids
+        # get maximum width of column n to adjust offset of column n + 1
+        n = 0
+        while n < len(hrow) - 1:
+            box = canvas.bbox(hrow[n])
+            width = box[2]
+            for row in ids:
+                if len(row) > 2 or n < 1:
+                    box = canvas.bbox(row[n])
+                    if box[2] > width:
+                        width = box[2]
+            xcolumn = width + offset
+            box = canvas.bbox(hrow[n + 1])
+            x1 = box[0]
+            for row in ids:
+                if len(row) > 2 or n < 1:
+                    box = canvas.bbox(row[n + 1])
+                    if box[0] < x1:
+                        x1 = box[0]
+            xdelta = xcolumn - x1
+            canvas.move(hrow[n + 1], xdelta, 0)
+            for row in ids:
+                if len(row) > 2 or n < 1:
+                    canvas.move(row[n + 1], xdelta, 0)
+            n = n + 1
+
+    def __categorybuttonselected(self, event, button, canvas):
+        """
+        Event handler that is called whenever the user releases the (left) mouse button on a category button
+        """
+        # print 'category button #' + str(button) + ' selected'
+        if button not in self.graphcategorybuttons:
+            return
+        n = self.graphcategorybuttons[button][0]
+        if n == self.selectedgraphcategory:
+            # selecting a radio button that is already selected does nothing
+            return
+        # make the old category have the normal appearance
+        for b in self.graphcategorybuttons:
+            zb = self.graphcategorybuttons[b]
+            if zb[0] == self.selectedgraphcategory:
+                canvas.itemconfigure(zb[2],
+                                     fill='#444',
+                                     outline='#444',
+                                     activeoutline='#888',
+                                     activefill='#888')
+                canvas.itemconfigure(zb[1],
+                                     disabledfill='#EEE',
+                                     fill='#EEE')
+                for ib in self.graphitembuttons:
+                    zi = self.graphitembuttons[ib]
+                    if zi[0] == self.selectedgraphcategory and zi[1] == self.selectedgraphitem:
+                        # make the currently selected item button appear normal
+                        canvas.itemconfigure(zi[3],
+                                             fill='#444',
+                                             outline='#444',
+                                             activeoutline='#888',
+                                             activefill='#888')
+                        canvas.itemconfigure(zi[2],
+                                             disabledfill='#EEE',
+                                             fill='#EEE')
+                    if zi[0] == self.selectedgraphcategory:
+                        # hide the item buttons associated with the category
+                        canvas.itemconfigure(zi[3], state=HIDDEN)
+                        canvas.itemconfigure(zi[2], state=HIDDEN)
+
+        self.selectedgraphcategory = n
+        self.selectedgraphitem = 0
+        zb = self.graphcategorybuttons[button]
+        canvas.itemconfigure(zb[2],
+                             fill='#CCC',
+                             outline='#CCC',
+                             activeoutline='#EEE',
+                             activefill='#EEE')
+        canvas.itemconfigure(zb[1],
+                             disabledfill='#111',
+                             fill='#111')
+        for ib in self.graphitembuttons:
+            zi = self.graphitembuttons[ib]
+            if zi[0] == self.selectedgraphcategory and zi[1] == self.selectedgraphitem:
+                # make the currently selected item button appear active
+                canvas.itemconfigure(zi[3],
+                                     fill='#CCC',
+                                     outline='#CCC',
+                                     activeoutline='#EEE',
+                                     activefill='#EEE')
+                canvas.itemconfigure(zi[2],
+                                     disabledfill='#111',
+                                     fill='#111')
+            if zi[0] == self.selectedgraphcategory:
+                # unhide the item buttons associated with the category
+                canvas.itemconfigure(zi[3], state=NORMAL)
+                canvas.itemconfigure(zi[2], state=DISABLED)
+        self.cleargraph(canvas)
+        self.drawgraph(canvas)
+
+    def __itembuttonselected(self, event, button, canvas):
+        """
+        Event handler that is called whenever the user releases the (left) mouse button on a graph button
+        """
+        # print 'item button #' + str(button) + ' selected'
+        if button not in self.graphitembuttons:
+            return
+        m = self.graphitembuttons[button][1]
+        if m == self.selectedgraphitem:
+            # selecting a radio button that is already selected does nothing
+            return
+        # make the old item have the normal appearance
+        for b in self.graphitembuttons:
+            zb = self.graphitembuttons[b]
+            if zb[0] == self.selectedgraphcategory and zb[1] == self.selectedgraphitem:
+                canvas.itemconfigure(zb[3],
+                                     fill='#444',
+                                     outline='#444',
+                                     activeoutline='#888',
+                                     activefill='#888')
+                canvas.itemconfigure(zb[2],
+                                     disabledfill='#EEE',
+                                     fill='#EEE')
+                break
+        self.selectedgraphitem = m
+        zb = self.graphitembuttons[button]
+        canvas.itemconfigure(zb[3],
+                             fill='#CCC',
+                             outline='#CCC',
+                             activeoutline='#EEE',
+                             activefill='#EEE')
+        canvas.itemconfigure(zb[2],
+                             disabledfill='#111',
+                             fill='#111')
+        self.cleargraph(canvas)
+        self.drawgraph(canvas)
+
+    def __playerbuttonselected(self, event, button, canvas):
+        """
+        Event handler that is called whenever the user releases the (left) mouse button on a player button
+        """
+        # print 'player button #' + str(button) + ' selected'
+        if button not in self.playerbuttons:
+            return
+        m = self.playerbuttons[button]
+        if m[3]:
+            canvas.itemconfigure(m[2],
+                                 fill='#000',
+                                 outline='#000',
+                                 activeoutline='#444',
+                                 activefill='#444')
+            m[3] = False
+            canvas.itemconfigure(self.graphlines[m[4]],
+                                 state=HIDDEN)
+        else:
+            canvas.itemconfigure(m[2],
+                                 fill='#222',
+                                 outline='#222',
+                                 activeoutline='#444',
+                                 activefill='#444')
+            m[3] = True
+            canvas.itemconfigure(self.graphlines[m[4]],
+                                 state=NORMAL)
+
+    def setupgraphselectionbuttons(self, canvas, width=200):
+        """
+        This method draws the graph selection 'buttons' on the specified canvas and binds events to the them
+        """
+
+        y = 10
+        # category buttons, ie. Metal, Energy, Damage, Units, Actions
+        self.graphcategorybuttons = dict()
+        n = 0
+        for masters in self.graphbuttonlabels:
+            if masters[0] == self.graphbuttonlabels[self.selectedgraphcategory][0]:
+                clrt = '#111'
+                clrbtn = '#CCC'
+                clra = '#EEE'
+            else:
+                clrt = '#EEE'
+                clrbtn = '#444'
+                clra = '#888'
+            id = canvas.create_text(width / 2, y, anchor=N, text=masters[0],
+                                    state=DISABLED,
+                                    disabledfill=clrt,
+                                    fill=clrt)
+            box = canvas.bbox(id)
+            id2 = canvas.create_rectangle(10, box[1] - 2, width - 10, box[3] + 2,
+                                          fill=clrbtn,
+                                          outline=clrbtn,
+                                          activeoutline=clra,
+                                          activefill=clra,
+                                          state=NORMAL
+                                          )
+            self.graphcategorybuttons[id2] = (n, id, id2)
+
+            def handler(event, self=self, button=id2, canvas=canvas):
+                self.__categorybuttonselected(event, button, canvas)
+
+            tag = 'categorybtn_' + str(id2)
+            canvas.addtag_withtag(tag, id2)
+            canvas.tag_bind(tag, sequence='<ButtonRelease-1>', func=handler)
+            y = box[3] + 6
+            canvas.tag_lower(id2, id)
+            n = n + 1
+        y = y + 10
+        self.graphitembuttons = dict()
+        ytop = y
+        n = 0
+        # draw all item buttons at once, but hide the texts and buttons from other categories
+        # than the current one.
+        for masters in self.graphbuttonlabels:
+            y = ytop
+            m = 0
+            for item in masters[1]:
+                if n == self.selectedgraphcategory:
+                    sb = NORMAL
+                    st = DISABLED
+                else:
+                    sb = HIDDEN
+                    st = HIDDEN
+
+                if m == self.selectedgraphitem:
+                    clrt = '#111'
+                    clrbtn = '#CCC'
+                    clra = '#EEE'
+                else:
+                    clrt = '#EEE'
+                    clrbtn = '#444'
+                    clra = '#888'
+                id = canvas.create_text(width / 2, y, anchor=N, text=item[0],
+                                        state=DISABLED,
+                                        disabledfill=clrt,
+                                        fill=clrt)
+                box = canvas.bbox(id)
+                id2 = canvas.create_rectangle(10, box[1] - 2, width - 10, box[3] + 2,
+                                              fill=clrbtn,
+                                              outline=clrbtn,
+                                              activeoutline=clra,
+                                              activefill=clra,
+                                              state=sb
+                                              )
+                canvas.itemconfigure(id, state=st)
+                self.graphitembuttons[id2] = (n, m, id, id2)
+
+                def handler(event, self=self, button=id2, canvas=canvas):
+                    self.__itembuttonselected(event, button, canvas)
+
+                tag = 'itembtn_' + str(id2)
+                canvas.addtag_withtag(tag, id2)
+                canvas.tag_bind(tag, sequence='<ButtonRelease-1>', func=handler)
+                y = box[3] + 6
+                canvas.tag_lower(id2, id)
+                m = m + 1
+            n = n + 1
+
+    def cleargraphselectionbuttons(self, canvas):
+        """
+        This method unbinds the graph selection buttons from any event handlers and
+        deletes them
+        """
+        for b in self.graphitembuttons:
+            zb = self.graphitembuttons[b]
+            tag = 'itembtn_' + str(zb[3])
+            canvas.tag_unbind(tag, '<ButtonRelease-1>')
+            canvas.delete(zb[2])
+            canvas.delete(zb[3])
+        for b in self.graphcategorybuttons:
+            zb = self.graphcategorybuttons[b]
+            tag = 'categorybtn_' + str(zb[2])
+            canvas.tag_unbind(tag, '<ButtonRelease-1>')
+            canvas.delete(zb[1])
+            canvas.delete(zb[2])
+        self.graphitembuttons = dict()
+        self.graphcategorybuttons = dict()
+
+    def setupplayerselectionbuttons(self, canvas, width=200):
+        """
+        This method draws the player selection 'buttons' on the specified canvas and binds events to the them
+        """
+
+        idplayers = list()
+        # put labels for each player in the same place for now
+        largest = 0
+        lineoffset = 0
+        n = 0
+        for p in self.playerorder:
+            id = canvas.create_text(width + 14, 14, anchor=NW, text=p,
+                                    state=DISABLED,
+                                    disabledfill=self.playerbykey[p][0],
+                                    fill=self.playerbykey[p][0])
+            idplayers.append(id)
+            box = canvas.bbox(id)
+            offset = box[2] - box[0]
+
+            if offset > largest:
+                largest = offset
+            if lineoffset < box[3] - box[1]:
+                lineoffset = box[3] - box[1]
+            n = n + 1
+        # uses the largest player name as a basis for placing the legend labels
+        self.playerbuttonwidth = largest
+        self.playerbuttonheight = lineoffset + 10
+        n = 0
+        # add a rectangle to each player label to serve as 'button', layoutplayerselectionbuttons puts them in place
+        self.playerbuttons = dict()
+        for p in self.playerorder:
+            id = idplayers[n]
+            boxid = canvas.create_rectangle(0, 0, 0, 0,
+                                            activefill='#444',
+                                            activeoutline='#444',
+                                            fill='#222',
+                                            outline='#222',
+                                            state=NORMAL)
+
+            def handler(event, self=self, button=boxid, canvas=canvas):
+                self.__playerbuttonselected(event, button, canvas)
+
+            tag = 'playerbtn_' + str(boxid)
+            canvas.addtag_withtag(tag, boxid)
+            canvas.tag_bind(tag, sequence='<ButtonRelease-1>', func=handler)
+            canvas.tag_lower(boxid, id)
+
+            self.playerbuttons[boxid] = [p, id, boxid, True, n]
+            n = n + 1
+        return self.layoutplayerselectionbuttons(canvas, width)
+
+    def layoutplayerselectionbuttons(self, canvas, width=200):
+        """
+        This method (re)positions the existing player selection 'buttons' so they fit the current canvas width.
+
+        It returns the lowest vertical coordinate used by the buttons, which is where the graph can start
+        """
+        largest = self.playerbuttonwidth
+        lineoffset = self.playerbuttonheight
+        if largest > 0:
+            onerowfits = (int(canvas['width']) - width) / (largest + 10)
+        else:
+            onerowfits = 1
+        if onerowfits < 1:
+            onerowfits = 1
+        # print 'Largest: ' + str(largest) + ' space: ' + str(lineoffset) + ' -> Fits: ' + str(onerowfits)
+        low = 0
+        for b in self.playerbuttons:
+            zb = self.playerbuttons[b]
+            line, column = divmod(zb[4], onerowfits)
+            box = canvas.bbox(zb[1])
+            x = width + column * (largest + 10)
+            y = 10 + line * lineoffset
+            # print 'Moving player name #'  + str(id) + ' at ' + str(line) + ', ' +
+            # str(column) + ' to (' + str(x) + ', ' + str(y) + ')'
+            canvas.move(zb[1], x - box[0], y - box[1])
+            box = canvas.bbox(zb[1])
+            canvas.coords(zb[2], box[0] - 4, box[1] - 4, box[0] + largest + 4, box[1] + lineoffset - 6)
+            if box[1] + lineoffset - 5 > low:
+                low = box[1] + lineoffset - 5
+        return low
+
+    def clearplayerselectionbuttons(self, canvas):
+        """
+        This method unbinds the graph selection buttons from any event handlers and
+        deletes them
+        """
+        for b in self.playerbuttons:
+            zb = self.playerbuttons[b]
+            tag = 'playerbtn_' + str(zb[2])
+            canvas.tag_unbind(tag, '<ButtonRelease-1>')
+            canvas.delete(zb[1])
+            canvas.delete(zb[2])
+        self.playerbuttons = dict()
+
+    def graphcoords(self, anchors, left, top, right, bottom):
+        """
+        Translates a sequence of anchors into a flat list of canvas coordinates within the graph area.
+
+        Each anchor is a 4-tuple (x fraction, x offset, y fraction, y offset), where the fractions are relative to
+        the width and height of the graph area, measured from the bottom left corner, and the offsets are in pixels.
+        Storing the anchors of an item allows it to be repositioned when the graph area changes size.
+        """
+        coords = list()
+        for fx, dx, fy, dy in anchors:
+            coords.append(left + fx * (right - left) + dx)
+            coords.append(bottom + fy * (top - bottom) + dy)
+        return coords
+
+    def setupverticalaxis(self, canvas, left, top, right, bottom):
+        """
+        This method draws the vertical axis of the graph, including tick marks.
+
+        Note that the graph area itself extends from (left, top) to (right, bottom), but the graph marks extend
+        to left - 4. It is up to the caller to ensure that the graphing area will not overlap
+
+        The method returns the scaling factor to use on the vertical axis
+        """
+        # determine minimum / maximum displayable value in the visible time window
+        attr = self.graphbuttonlabels[self.selectedgraphcategory][1][self.selectedgraphitem][1]
+        minval = None
+        maxval = None
+        for p in self.playerorder:
+            pyramid = self.graphpyramid(p, attr)
+            # include the samples just outside the window, the lines are interpolated towards them
+            extent = pyramid.extent(int(self.graphwindow[0] // pyramid.period),
+                                    int(-(-self.graphwindow[1] // pyramid.period)))
+            if extent is None:
+                continue
+            if minval is None or extent[0] < minval:
+                minval = extent[0]
+            if maxval is None or extent[1] > maxval:
+                maxval = extent[1]
+        if maxval is None:
+            minval = 0.0
+            maxval = 0.0
+
+        # vertical axis
+        anchors = ((0.0, 0, 1.0, 0), (0.0, 0, 0.0, 0))
+        id = canvas.create_line(*self.graphcoords(anchors, left, top, right, bottom),
+                                fill='#FFF',
+                                disabledfill='#EEE',
+                                state=DISABLED)
+        self.verticalaxis.append(id)
+        self.graphanchors[id] = anchors
+        # first power of ten larger than maxval
+        scale = 1.0
+        power = 0
+        while scale <= maxval:
+            scale = scale * 10
+            power = power + 1
+        if maxval <= 0.9 * scale:
+            power = power - 1
+            ticks = 0.1 * scale
+            digit = 0.1
+            # print 'Max = ' + str(maxval) + ' Scale = ' + str(scale)
+            while digit * scale < maxval:
+                # print 'Max = ' + str(maxval) + ' Scale = ' + str(digit * scale)
+                digit = digit + 0.1
+            scale = digit * scale
+            if digit <= 0.3:
+                ticks = 0.5 * ticks
+        else:
+            ticks = 0.1 * scale
+        if power >= 9:
+            s = '%.0fG' % (scale / 1e9)
+        elif power >= 6:
+            s = '%.0fM' % (scale / 1e6)
+        elif power >= 3:
+            s = '%.0fk' % (scale / 1e3)
+        else:
+            s = '%.0f' % scale
+        # print 'Scale = ' + str(scale) + ', power: ' + str(power) + ', ticks = '
+        # + str(ticks) + ' minmax: ' + str(minval) + '-' + str(maxval)
+        anchors = ((0.0, 2, 1.0, 0),)
+        id = canvas.create_text(*self.graphcoords(anchors, left, top, right, bottom),
+                                anchor=NW, text=s,
+                                state=DISABLED,
+                                disabledfill='#EEE',
+                                fill='#FFF')
+        self.verticalaxis.append(id)
+        self.graphanchors[id] = anchors
+        offset = ticks
+        while offset <= scale:
+            voffset = offset / scale
+            # print 'Offset = ' + str(offset) + ' in units ' + str(voffset)
+            anchors = ((0.0, 0, voffset, 0), (0.0, -4, voffset, 0))
+            id = canvas.create_line(*self.graphcoords(anchors, left, top, right, bottom),
+                                    fill='#FFF',
+                                    disabledfill='#EEE',
+                                    state=DISABLED)
+            self.verticalaxis.append(id)
+            self.graphanchors[id] = anchors
+            anchors = ((0.0, 1, voffset, 0), (1.0, 0, voffset, 0))
+            id = canvas.create_line(*self.graphcoords(anchors, left, top, right, bottom),
+                                    fill='#444',
+                                    disabledfill='#333',
+                                    state=DISABLED)
+            self.verticalaxis.append(id)
+            self.graphanchors[id] = anchors
+            offset = offset + ticks
+        return scale
+
+    def setuphorizontalaxis(self, canvas, left, top, right, bottom):
+        """
+        Set up the horizontal axis of the graph, including tick marks.
+
+        Note that the graph area itself extends from (left, top) to (right, bottom), but the graph marks extend
+        to bottom + 5 + the height of a text string. It is up to the caller to ensure that the graphing area will not overlap
+
+        The method returns the scaling factor to use on the horizontal axis
+        """
+        anchors = ((0.0, 0, 0.0, 0), (1.0, 0, 0.0, 0))
+        id = canvas.create_line(*self.graphcoords(anchors, left, top, right, bottom),
+                                fill='#FFF',
+                                disabledfill='#EEE',
+                                state=DISABLED)
+        self.horizontalaxis.append(id)
+        self.graphanchors[id] = anchors
+
+        # determine how to place tick marks on the horizontal axis.
+        if self.graphwindow is None:
+            self.graphwindow = (0, self.graphlength())
+        zoomed = self.graphwindow != (0, self.graphlength())
+        start = self.graphwindow[0]
+        vlength = self.graphwindow[1] - self.graphwindow[0]
+        if zoomed and vlength / 10 < 10:
+            # zoomed in on less than 100 seconds, one tick mark per 10 seconds
+            tticks = 10
+            l = '10s'
+        elif zoomed and vlength / 30 < 10:
+            # one tick mark per 30 seconds
+            tticks = 30
+            l = '30s'
+        elif vlength / 60 < 10:
+            # one tick mark per minute
+            tticks = 60
+            l = '1m'
+        elif vlength / 300 < 10:
+            # one tick mark per 5 minutes
+            tticks = 300
+            l = '5m'
+        elif vlength / 600 < 10:
+            # one tick mark per 10 minutes
+            tticks = 600
+            l = '10m'
+        elif vlength / 1800 < 10:
+            # one tick mark per half hour (rare)
+            tticks = 1800
+            l = '30m'
+        elif vlength / 3600 < 10:
+            # one tick mark per hour (very rare)
+            tticks = 3600
+            l = '1h'
+        elif vlength / 10800 < 10:
+            # one tick mark per 3 hours (exceedingly rare)
+            tticks = 10800
+            l = '3h'
+        else:
+            # one tick mark per day if this all fails
+            tticks = 86400
+            l = '1d'
+        n = 1
+        # the first tick mark at or after the start of the window
+        offset = -(-start // tticks) * tticks - start
+        if offset == 0 and start == 0:
+            offset = tticks
+        while offset <= vlength:
+            voffset = float(offset) / vlength
+            # tick mark on the axis
+            anchors = ((voffset, 0, 0.0, 0), (voffset, 0, 0.0, 4))
+            id = canvas.create_line(*self.graphcoords(anchors, left, top, right, bottom),
+                                    fill='#FFF',
+                                    disabledfill='#EEE',
+                                    state=DISABLED)
+            self.horizontalaxis.append(id)
+            self.graphanchors[id] = anchors
+            # grid line
+            anchors = ((voffset, 0, 0.0, -1), (voffset, 0, 1.0, 0))
+            id = canvas.create_line(*self.graphcoords(anchors, left, top, right, bottom),
+                                    fill='#444',
+                                    disabledfill='#333',
+                                    state=DISABLED)
+            self.horizontalaxis.append(id)
+            self.graphanchors[id] = anchors
+            if zoomed:
+                # label every tick mark with the game time when zoomed in, it is no longer obvious where we are
+                l = self.formatgametime(start + offset)
+            offset = offset + tticks
+            if n == 1 or zoomed:
+                anchors = ((voffset, 0, 0.0, 5),)
+                id = canvas.create_text(*self.graphcoords(anchors, left, top, right, bottom), text=l, anchor=N,
+                                        fill='#FFF',
+                                        disabledfill='#EEE',
+                                        state=DISABLED)
+                self.horizontalaxis.append(id)
+                self.graphanchors[id] = anchors
+            n = n + 1
+        return vlength
+
+    def formatgametime(self, t):
+        """
+        Returns a short label for game time t (in seconds) such as 1h05m, 23m or 23m30s
+        """
+        t = int(t)
+        hrs, t = divmod(t, 3600)
+        mins, secs = divmod(t, 60)
+        if hrs > 0:
+            s = '%dh%02dm' % (hrs, mins)
+        else:
+            s = '%dm' % mins
+        if secs != 0:
+            s += '%02ds' % secs
+        return s
+
+    def graphseries(self, p, attr):
+        """
+        Returns the values of the series attr of player p for the team graph and the period of the values in
+        seconds, attr is a team statistic or a series of the action timeline (see ActionTimeline.SERIES) or the
+        speed profile (see SpeedProfile.SERIES)
+        """
+        player = None
+        for number in self.demofile.playernames:
+            if self.demofile.playernames[number] == p:
+                player = number
+                break
+        if attr in dict(SpringDemoReducers.ActionTimeline.SERIES):
+            return self.actions.series(player, attr), self.actions.binsize
+        if attr in SpringDemoReducers.SpeedProfile.SERIES:
+            return self.speed.series(player, attr), self.speed.binsize
+        return [getattr(seq, attr) for seq in self.demofile.teamstatistics[p]], self.demofile.teamstatperiod
+
+    def graphpyramid(self, p, attr):
+        """
+        Returns the (cached) SeriesPyramid of player p for the series attr, see graphseries()
+        """
+        key = (p, attr)
+        if key not in self.graphpyramids:
+            values, period = self.graphseries(p, attr)
+            self.graphpyramids[key] = SeriesPyramid(values, period)
+        return self.graphpyramids[key]
+
+    def graphlength(self):
+        """
+        Returns the time span (in seconds) covered by the team statistics of all players
+        """
+        vlength = 0
+        for p in self.playerorder:
+            if len(self.demofile.teamstatistics[p]) > vlength:
+                vlength = len(self.demofile.teamstatistics[p])
+        return vlength * self.demofile.teamstatperiod
+
+    def graphpoints(self, p, attr, yscale):
+        """
+        Returns the flat list of canvas coordinates of the line for player p in the visible time window
+        """
+        t0, t1 = self.graphwindow
+        width = self.graphboxright - self.graphboxleft
+        points = list()
+        for t, v in self.graphpyramid(p, attr).points(t0, t1, width):
+            points.append(self.graphboxleft + (t - t0) * width / float(t1 - t0))
+            points.append(self.graphboxbottom + v * (self.graphboxtop - self.graphboxbottom) / yscale)
+        if len(points) == 2:
+            # a line needs at least two points
+            points.extend(points)
+        return points
+
+    def drawgraph(self, canvas):
+        """
+        Draws the graph itself
+        """
+        self.setuphorizontalaxis(
+            canvas, self.graphboxleft, self.graphboxtop, self.graphboxright, self.graphboxbottom)
+        yscale = self.setupverticalaxis(
+            canvas, self.graphboxleft, self.graphboxtop, self.graphboxright, self.graphboxbottom)
+        self.graphyscale = yscale
+        attr = self.graphbuttonlabels[self.selectedgraphcategory][1][self.selectedgraphitem][1]
+        # draw the graph for each player
+        n = 0
+        for p in self.playerorder:
+            points = self.graphpoints(p, attr, yscale)
+            st = NORMAL
+            for btn in self.playerbuttons:
+                if self.playerbuttons[btn][0] == p:
+                    if self.playerbuttons[btn][3] is False:
+                        st = HIDDEN
+                    break
+            id = canvas.create_line(*points,
+                                    state=st,
+                                    disabledfill=self.playerbykey[p][0],
+                                    fill=self.playerbykey[p][0],
+                                    tags='graphline')
+            self.graphlines.append(id)
+            n = n + 1
+
+    def setupgraph(self, canvas, left, top, right, bottom):
+        """
+        Dimensions and creates the graph
+        """
+        # create a temporary text for dimensioning the graph axis and labelling
+        id = canvas.create_text((left + right) / 2, (top + bottom) / 2, text='Dpg', anchor=CENTER,
+                                fill='#FFF',
+                                disabledfill='#EEE',
+                                state=DISABLED)
+        box = canvas.bbox(id)
+        canvas.delete(id)
+        self.graphtextheight = box[3] - box[1]
+        self.dimensiongraph(left, top, right, bottom)
+        self.drawgraph(canvas)
+
+    def dimensiongraph(self, left, top, right, bottom):
+        """
+        Determines the area of the graph proper within the area (left, top) - (right, bottom) reserved for it
+        """
+        self.graphboxleft = left + 6
+        self.graphboxright = right - 2
+        self.graphboxtop = top + 4
+        self.graphboxbottom = bottom - 8 - self.graphtextheight
+
+    def layoutgraph(self, canvas, left, top, right, bottom):
+        """
+        Repositions the existing graph in the area (left, top) - (right, bottom) without recreating it.
+
+        The axes are placed from their anchors, the player lines are all scaled in one go using their common tag
+        """
+        oldleft = self.graphboxleft
+        oldbottom = self.graphboxbottom
+        oldwidth = self.graphboxright - self.graphboxleft
+        oldheight = self.graphboxtop - self.graphboxbottom
+        self.dimensiongraph(left, top, right, bottom)
+        for id in self.graphanchors:
+            canvas.coords(id, *self.graphcoords(self.graphanchors[id], self.graphboxleft, self.graphboxtop,
+                                                self.graphboxright, self.graphboxbottom))
+        if oldwidth == 0 or oldheight == 0:
+            # degenerate graph area, cannot scale from it
+            return
+        canvas.scale('graphline', oldleft, oldbottom,
+                     float(self.graphboxright - self.graphboxleft) / oldwidth,
+                     float(self.graphboxtop - self.graphboxbottom) / oldheight)
+        canvas.move('graphline', self.graphboxleft - oldleft, self.graphboxbottom - oldbottom)
+
+    def cleargraph(self, canvas):
+        """
+        Clears the graph
+        """
+        for id in self.graphlines:
+            canvas.delete(id)
+        for id in self.horizontalaxis:
+            canvas.delete(id)
+        for id in self.verticalaxis:
+            canvas.delete(id)
+        self.graphlines = list()
+        self.horizontalaxis = list()
+        self.verticalaxis = list()
+        self.graphanchors = dict()
+        for id in self.graphreadout:
+            canvas.delete(id)
+        self.graphreadout = list()
+
+    def drawteamstats(self, canvas):
+        """
+        Draw on the teams stats canvas to display various graphs of performance
+
+        The graph legend, consisting of the player names is displayed above the graph
+
+        To the left of the graph, there is a series of buttons for selecting the graph to display
+
+        The graph itself consists of two axes, horizontal for time, vertical for the element graphed
+
+        Only the vertical axis is labelled with the quantity of the element graphed.
+
+
+        """
+        # clear canvas
+        self.cleargraphselectionbuttons(canvas)
+        self.cleargraph(canvas)
+        self.clearplayerselectionbuttons(canvas)
+        for tag in canvas.find_all():
+            canvas.delete(tag)
+        if (self.demofile is None or
+                self.demofile.incomplete or self.demofile.crashed or
+                self.demofile.teamstatistics is None):
+            return
+        # player selection buttons
+        low = self.setupplayerselectionbuttons(canvas)
+        # graph selection buttons
+        self.setupgraphselectionbuttons(canvas)
+        # the graph itself
+        self.setupgraph(canvas, 200, low, int(canvas['width']), int(canvas['height']))
+
+    def zoomgraph(self, canvas, t0, t1):
+        """
+        Shows the time window t0 - t1 (in seconds) of the team graph.
+
+        The window is clipped to the duration of the game, the axes are recreated for the new window and the player
+        lines keep their canvas items, they only get new coordinates.
+        """
+        if len(self.graphlines) == 0:
+            return
+        vlength = self.graphlength()
+        # do not zoom in further than two team stat periods
+        minspan = min(2 * self.demofile.teamstatperiod, vlength)
+        if t1 - t0 < minspan:
+            t0 = (t0 + t1) / 2.0 - minspan / 2.0
+            t1 = t0 + minspan
+        if t0 < 0:
+            t1 -= t0
+            t0 = 0
+        if t1 > vlength:
+            t0 -= t1 - vlength
+            t1 = vlength
+        if t0 < 0:
+            t0 = 0
+        self.graphwindow = (t0, t1)
+        for id in self.horizontalaxis + self.verticalaxis:
+            canvas.delete(id)
+            del self.graphanchors[id]
+        self.horizontalaxis = list()
+        self.verticalaxis = list()
+        self.setuphorizontalaxis(
+            canvas, self.graphboxleft, self.graphboxtop, self.graphboxright, self.graphboxbottom)
+        self.graphyscale = self.setupverticalaxis(
+            canvas, self.graphboxleft, self.graphboxtop, self.graphboxright, self.graphboxbottom)
+        attr = self.graphbuttonlabels[self.selectedgraphcategory][1][self.selectedgraphitem][1]
+        n = 0
+        for p in self.playerorder:
+            canvas.coords(self.graphlines[n], *self.graphpoints(p, attr, self.graphyscale))
+            n = n + 1
+
+    def graphtime(self, x):
+        """
+        Returns the game time corresponding to canvas x coordinate x in the visible window of the graph
+        """
+        t0, t1 = self.graphwindow
+        return t0 + (x - self.graphboxleft) * (t1 - t0) / float(self.graphboxright - self.graphboxleft)
+
+    def layoutteamstats(self, canvas):
+        """
+        Fits the team stats view to the current canvas size after a resize.
+
+        The graph selection buttons do not depend on the canvas size, the player selection buttons and the graph do,
+        but they keep their canvas items and are only moved to their new position.
+        """
+        if len(self.graphlines) == 0 or len(self.playerbuttons) == 0:
+            # nothing to reposition, there is no graph
+            return
+        low = self.layoutplayerselectionbuttons(canvas)
+        self.layoutgraph(canvas, 200, low, int(canvas['width']), int(canvas['height']))
+
+    def drawawards(self, canvas):
+        """
+        Draw a table with the awards given to players.
+        """
+        if self.demofile is None:
+            return
+        # clear canvas
+        for tag in canvas.find_all():
+            canvas.delete(tag)
+
+        awards = self.demofile.awards()
+        if awards is None or len(awards) == 0:
+            return
+        line = 0
+        ids = list()
+        offset = 0
+        for award in awards:
+            if award[0] in self.playerbykey:
+                c = self.playerbykey[award[0]][0]
+            else:
+                c = '#EEE'
+
+            rowids = list()
+            for item in award:
+                id = canvas.create_text(10, 10 + offset * line, text=item, anchor=NW,
+                                        state=DISABLED,
+                                        disabledfill=c,
+                                        fill=c)
+                box = canvas.bbox(id)
+                if offset == 0:
+                    offset = (box[3] - box[1]) * 3 / 2
+                rowids.append(id)
+            ids.append(rowids)
+            line = line + 1
+        # move everything in position laterally
+        n = 0
+        while n < len(ids[0]) - 1:
+            box = canvas.bbox(ids[0][n])
+            width = box[2]
+            for row in ids:
+                box = canvas.bbox(row[n])
+                if box[2] > width:
+                    width = box[2]
+            xcolumn = width + offset
+            box = canvas.bbox(ids[0][n + 1])
+            x1 = box[0]
+            for row in ids:
+                box = canvas.bbox(row[n + 1])
+                if box[0] < x1:
+                    x1 = box[0]
+            xdelta = xcolumn - x1
+            for row in ids:
+                canvas.move(row[n + 1], xdelta, 0)
+            n = n + 1
+
+    def drawtable(self, canvas, rows):
+        """
+        Draw a table of rows of texts, each row is a tuple of the list of texts and their color. All rows must have
+        the same number of texts.
+        """
+        line = 0
+        ids = list()
+        offset = 0
+        for texts, c in rows:
+            rowids = list()
+            for item in texts:
+                id = canvas.create_text(10, 10 + offset * line, text=item, anchor=NW,
+                                        state=DISABLED,
+                                        disabledfill=c,
+                                        fill=c)
+                box = canvas.bbox(id)
+                if offset == 0:
+                    offset = (box[3] - box[1]) * 3 / 2
+                rowids.append(id)
+            ids.append(rowids)
+            line = line + 1
+        # move everything in position laterally
+        n = 0
+        while len(ids) > 0 and n < len(ids[0]) - 1:
+            width = max([canvas.bbox(row[n])[2] for row in ids])
+            x1 = min([canvas.bbox(row[n + 1])[0] for row in ids])
+            xdelta = width + offset - x1
+            for row in ids:
+                canvas.move(row[n + 1], xdelta, 0)
+            n = n + 1
+
+    def networkplayername(self, p):
+        """
+        Returns the name of player number p for the network view
+        """
+        if p is None:
+            return 'Server'
+        if p in self.demofile.playernames:
+            return self.demofile.playernames[p]
+        return 'Player ' + str(p)
+
+    def drawnetwork(self, canvas):
+        """
+        Draw tables of the network traffic in the demo stream, per player, per record type and per Lua script: the
+        number of records, the bytes, the average and peak rate and what makes up most of the traffic
+
+        If the demo has player info records the players with the highest CPU usage and the periods the game slowed
+        down follow
+        """
+        if self.demofile is None or self.network is None:
+            return
+        # clear canvas
+        for tag in canvas.find_all():
+            canvas.delete(tag)
+        if self.network.length == 0:
+            return
+        minutes = self.demofile.totalgametime / 60.0
+        if minutes <= 0:
+            minutes = self.network.length * self.network.binsize / 60.0
+        perminute = 60.0 / self.network.binsize
+        blank = ((' ',) * 6, '#EEE')
+        rows = [(('Player', 'Records', 'kB', 'kB/min', 'Peak kB/min', 'Mostly'), '#FFF')]
+        for p, records, size, peak in self.network.top('player', 16):
+            name = self.networkplayername(p)
+            c = self.playerbykey[name][0] if name in self.playerbykey else '#EEE'
+            t = self.network.share(p, 'player')
+            rows.append((('  ' + name, str(records), '%.1f' % (size / 1024.0), '%.2f' % (size / 1024.0 / minutes),
+                          '%.2f' % (peak / 1024.0 * perminute), SpringDemoFile.RECORDNAMES.get(t, str(t))), c))
+        rows.append(blank)
+        rows.append((('Record type', 'Records', 'kB', 'kB/min', 'Peak kB/min', 'Mostly from'), '#FFF'))
+        for t, records, size, peak in self.network.top('type', 12):
+            rows.append((('  ' + SpringDemoFile.RECORDNAMES.get(t, str(t)), str(records), '%.1f' % (size / 1024.0),
+                          '%.2f' % (size / 1024.0 / minutes), '%.2f' % (peak / 1024.0 * perminute),
+                          self.networkplayername(self.network.share(t, 'type'))), '#EEE'))
+        if len(self.network.luascripts) > 0:
+            rows.append(blank)
+            rows.append((('Lua script', 'Messages', 'kB', 'kB/min', ' ', 'Player'), '#FFF'))
+            scripts = sorted(self.network.luascripts.items(), key=lambda item: -item[1][1])
+            for (script, p), (records, size) in scripts[:8]:
+                rows.append((('  ' + str(script), str(records), '%.1f' % (size / 1024.0),
+                              '%.2f' % (size / 1024.0 / minutes), ' ', self.networkplayername(p)), '#EEE'))
+        laggiest = self.speed.laggiest(8) if self.speed is not None else list()
+        if len(laggiest) > 0:
+            rows.append(blank)
+            rows.append((('Lag', 'CPU %', 'Peak CPU %', 'Ping', 'Peak ping', ' '), '#FFF'))
+            for p, cpu, peakcpu, ping, peakping in laggiest:
+                name = self.networkplayername(p)
+                c = self.playerbykey[name][0] if name in self.playerbykey else '#EEE'
+                rows.append((('  ' + name, '%.0f' % (cpu * 100), '%.0f' % (peakcpu * 100), '%.0f' % ping,
+                              '%.0f' % peakping, ' '), c))
+            for start, end, fps in self.speed.slowdowns()[:8]:
+                rows.append((('  Slowdown', self.formatgametime(start), self.formatgametime(end),
+                              '%.1f fps' % fps, ' ', ' '), '#EEE'))
+        self.drawtable(canvas, rows)
+
+    def __chatbuttonselected(self, event, button, canvas):
+        """
+        Event handler for the chat buttons
+        """
+        if button not in self.chatbuttons:
+            # when it is not our button we should not be here
+            return
+        if self.chatdimensions is None or len(self.chatdimensions) == 0:
+            # dont do anything if chat dimensions have not been set up
+            return
+        if self.chatpagestartline is None:
+            # or when we dont know where to start
+            return
+        if self.chatbuttons[button][3] == 0:
+            # previous page
+            self.chatpagestartline -= (self.chatdimensions[1] - 1)
+            if self.chatpagestartline < 0:
+                self.chatpagestartline = 0
+        elif self.chatbuttons[button][3] == 1:
+            # next page
+            self.chatpagestartline += (self.chatdimensions[1] - 1)
+            if self.chatpagestartline > self.chatdimensions[0] - self.chatdimensions[1]:
+                self.chatpagestartline = self.chatdimensions[0] - self.chatdimensions[1]
+        self.clearchatlines(canvas)
+        self.drawchat(canvas)
+
+    def setupchatbuttons(self, canvas):
+        """
+        This method draws the chat navigation 'buttons' on the specified canvas and binds events to the them
+        """
+
+        y = 10
+        idchats = list()
+        # put buttons for previous page and next page
+        texts = ('Previous page', 'Next page')
+        largest = 0
+        lineoffset = 0
+        n = 0
+        for p in texts:
+            id = canvas.create_text(14, 14, anchor=NW, text=p,
+                                    state=DISABLED,
+                                    disabledfill='#EEE',
+                                    fill='#EEE')
+            idchats.append(id)
+            box = canvas.bbox(id)
+            offset = box[2] - box[0]
+
+            if offset > largest:
+                largest = offset
+            if lineoffset < box[3] - box[1]:
+                lineoffset = box[3] - box[1]
+            n = n + 1
+        # uses the largest text as a basis for placing the legend labels
+        lineoffset = lineoffset + 10
+        column = 0
+        n = 0
+        # move all button labels to the right place and add a rectangle to serve as 'button'
+        low = 0
+        self.chatbuttons = dict()
+        for p in texts:
+            id = idchats[n]
+            box = canvas.bbox(id)
+            x = 10 + column * (largest + 10)
+            y = 10
+            canvas.move(id, x - box[0], y - box[1])
+            box = canvas.bbox(id)
+            boxid = canvas.create_rectangle(box[0] - 4, box[1] - 4, box[0] + largest + 4, box[1] + lineoffset - 6,
+                                            activefill='#444',
+                                            activeoutline='#444',
+                                            fill='#222',
+                                            outline='#222',
+                                            state=NORMAL)
+
+            def handler(event, self=self, button=boxid, canvas=canvas):
+                self.__chatbuttonselected(event, button, canvas)
+
+            tag = 'chatbtn_' + str(boxid)
+            canvas.addtag_withtag(tag, boxid)
+            canvas.tag_bind(tag, sequence='<ButtonRelease-1>', func=handler)
+            canvas.tag_lower(boxid, id)
+
+            self.chatbuttons[boxid] = [p, id, boxid, n]
+
+            if box[1] + lineoffset - 5 > low:
+                low = box[1] + lineoffset - 5
+            n = n + 1
+            column = column + 1
+        return low
+
+    def clearchatselectionbuttons(self, canvas):
+        """
+        This method unbinds the chat selection buttons from any event handlers and
+        deletes them
+        """
+        for b in self.chatbuttons:
+            zb = self.chatbuttons[b]
+            tag = 'chatbtn_' + str(zb[3])
+            canvas.tag_unbind(tag, '<ButtonRelease-1>')
+            canvas.delete(zb[1])
+            canvas.delete(zb[2])
+        self.chatbuttons = dict()
+
+    def clearchatlines(self, canvas):
+        """
+        Delete all the text lines from the canvas
+        """
+        for id in self.chattexts:
+            canvas.delete(id)
+        self.chattexts = list()
+
+    def clearchat(self, canvas):
+        """
+        This method clears the canvas of 'chat' objects
+        """
+        self.clearchatselectionbuttons(canvas)
+        self.chatdimensions = None
+        self.clearchatlines(canvas)
+        # clear canvas
+        for tag in canvas.find_all():
+            canvas.delete(tag)
+
+    def setupchat(self, canvas):
+        """
+        Set up drawing the chat canvas
+        """
+        # clear canvas
+        self.clearchat(canvas)
+
+        edge = self.setupchatbuttons(canvas) + 5
+        offset = 0
+        nlines = 0
+        twidth = 0
+        nwidth = 0
+        lwidth = 0
+        for chatline in self.chat:
+            if chatline[4] is None or len(chatline[4]) == 0 or chatline[4].strip() == '':
+                # skip empty or whitespace only lines
+                continue
+            v = divmod(chatline[0], 60.0)
+            w = divmod(v[0], 60.0)
+            if w[0] == 0.0:
+                s = '%.0fm%04.1fs' % (w[1], v[1])
+            else:
+                s = '%.0fh%02.0fm%04.1fs' % (w[0], w[1], v[1])
+            id = canvas.create_text(10, 10, text=s, anchor=NW,
+                                    state=DISABLED,
+                                    disabledfill='#EEE',
+                                    fill='#EEE')
+            box = canvas.bbox(id)
+            if box[2] - box[0] > twidth:
+                twidth = box[2] - box[0]
+            if offset == 0:
+                offset = (box[3] - box[1])
+            if box[3] - box[1] > offset:
+                offset = box[3] - box[1]
+            canvas.delete(id)
+            if chatline[2] is None:
+                s = '-'
+            else:
+                s = chatline[2]
+            id = canvas.create_text(10, 10, text=s, anchor=NW,
+                                    state=DISABLED,
+                                    disabledfill='#EEE',
+                                    fill='#EEE')
+            box = canvas.bbox(id)
+            if box[2] - box[0] > nwidth:
+                nwidth = box[2] - box[0]
+            if box[3] - box[1] > offset:
+                offset = box[3] - box[1]
+            canvas.delete(id)
+            id = canvas.create_text(10, 10, text=chatline[4], anchor=NW,
+                                    state=DISABLED,
+                                    disabledfill='#EEE',
+                                    fill='#EEE')
+            box = canvas.bbox(id)
+            if box[2] - box[0] > lwidth:
+                lwidth = box[2] - box[0]
+            if box[3] - box[1] > offset:
+                offset = box[3] - box[1]
+            canvas.delete(id)
+            nlines += 1
+
+        if nlines == 0 or offset == 0:
+            # do nothing
+            return
+        # how many lines on a page
+        ysize = int(canvas['height']) - edge - 10
+        linesperpage = int(ysize / offset)
+        self.chatdimensions = [nlines, linesperpage, edge, offset, twidth, nwidth, lwidth]
+
+    def drawchat(self, canvas):
+        """
+        Draw a table with the chat log
+        """
+        if self.demofile is None:
+            return
+        if self.chat is None or len(self.chat) == 0:
+            return
+        if self.chatdimensions is None or len(self.chatdimensions) == 0:
+            # we did not set up the canvas yet (or it has been resized)
+            self.setupchat(canvas)
+        if self.chatpagestartline is None:
+            # first time on this chat page so scroll to the last page
+            if self.chatdimensions[1] >= self.chatdimensions[0]:
+                self.chatpagestartline = 0
+            else:
+                self.chatpagestartline = self.chatdimensions[0] - self.chatdimensions[1]
+        else:
+            # dimensions may have changed
+            if self.chatpagestartline > self.chatdimensions[0] - self.chatdimensions[1]:
+                self.chatpagestartline = self.chatdimensions[0] - self.chatdimensions[1]
+
+        cursorline = 0
+        line = 0
+        self.chattexts = list()
+        # now do the actual drawing
+        for chatline in self.chat:
+            cursorline += 1
+            if cursorline < self.chatpagestartline:
+                continue
+            if cursorline > self.chatpagestartline + self.chatdimensions[1]:
+                # we are done
+                break
+            # figure out what color to display the chat line in
+            if (chatline[1] == SpringDemoFile.DemoRecord.SYSTEMMSG or
+                    chatline[1] == SpringDemoFile.DemoRecord.QUIT or
+                    chatline[1] == SpringDemoFile.DemoRecord.PAUSE or
+                    chatline[1] == SpringDemoFile.DemoRecord.PLAYERLEFT):
+                # System messages are seen by all and rendered in medium gray
+                c = '#888'
+            elif chatline[1] == SpringDemoFile.DemoRecord.MAPDRAW:
+                # map draw is only seen by the group the player is in
+                found = False
+                for p in self.demofile.players:
+                    if chatline[2] == p[0]:
+                        if p[1] == -1:
+                            # spectator chat, only seen by spectators
+                            c = '#CCC'
+                        elif chatline[2] in self.playerbykey:
+                            # team label, select color corresponding to player
+                            c = self.playerbykey[chatline[2]][0]
+                        else:
+                            # uhhh?
+                            c = '#AAA'
+                        found = True
+                        break
+                if not found:
+                    # make it appear like spectator chat
+                    c = '#CCC'
+            else:
+                # must be a chat message
+                found = False
+                for p in self.demofile.players:
+                    if chatline[2] == p[0]:
+                        if p[1] == -1:
+                            if chatline[3] is None or chatline[3] == 'Spectators' or chatline[3] == 'Allies':
+                                # spectator chat, only seen by spectators
+                                c = '#CCC'
+                            elif chatline[3] == 'Everyone':
+                                # everyone chat, bright (almost) white
+                                c = '#EEE'
+                            elif chatline[3] == 'Host':
+                                c = '#888'
+                            else:
+                                # must be a private message from a spectator to another spectator or player
+                                c = '#444'
+                        elif chatline[2] in self.playerbykey:
+                            if chatline[3] is None or chatline[3] == 'Spectators':
+                                # spectator chat, only seen by spectators
+                                c = '#CCC'
+                            elif chatline[3] == 'Everyone':
+                                # everyone chat, bright (almost) white
+                                c = '#EEE'
+                            elif chatline[3] == 'Host':
+                                c = '#888'
+                            elif chatline[3] == 'Allies':
+                                # team label, select color corresponding to player
+                                c = self.playerbykey[chatline[2]][0]
+                            else:
+                                # must be a private message from a player to another spectator or player
+                                c = '#444'
+                        else:
+                            # uhhh?
+                            c = '#AAA'
+                        found = True
+                        break
+                if not found:
+                    # make it appear like spectator chat
+                    c = '#888'
+                    if chatline[3] == 'Spectators':
+                        c = '#CCC'
+                    elif chatline[3] == 'Everyone':
+                        if chatline[2] != 'Host' and chatline[2] is not None:
+                            c = '#EEE'
+                        else:
+                            c = '#888'
+
+            # each table row has 3 items, the timestamp, the originating player and the message text itself
+            v = divmod(chatline[0], 60.0)
+            w = divmod(v[0], 60.0)
+            if w[0] == 0.0:
+                s = '%.0fm%04.1fs' % (w[1], v[1])
+            else:
+                s = '%.0fh%02.0fm%04.1fs' % (w[0], w[1], v[1])
+            id = canvas.create_text(10,
+                                    self.chatdimensions[2] + self.chatdimensions[3] * line, text=s, anchor=NW,
+                                    state=DISABLED,
+                                    disabledfill=c,
+                                    fill=c)
+            self.chattexts.append(id)
+            if chatline[2] is None:
+                s = '-'
+            else:
+                s = chatline[2]
+            id = canvas.create_text(20 + self.chatdimensions[4],
+                                    self.chatdimensions[2] + self.chatdimensions[3] * line, text=s, anchor=NW,
+                                    state=DISABLED,
+                                    disabledfill=c,
+                                    fill=c)
+            self.chattexts.append(id)
+            if chatline[2] is None:
+                s = '-'
+            else:
+                s = chatline[2]
+            id = canvas.create_text(30 + self.chatdimensions[4] + self.chatdimensions[5],
+                                    self.chatdimensions[2] + self.chatdimensions[3] * line,
+                                    text=chatline[4], anchor=NW,
+                                    state=DISABLED,
+                                    disabledfill=c,
+                                    fill=c)
+            self.chattexts.append(id)
+
+            line = line + 1
+
+    def columndimensions(self, canvas, offset, width, text, right=False, hmargin=10):
+        """
+        Determines changes in column width and row height by 'drawing' text text on the canvas and then removing
+        it.
+
+        It returns a tuple of (offset, width) so this works:
+
+        offset, width[n] = self.columndimensions(canvas, offset, width[n], text)
+        """
+        e = hmargin
+        a = NW
+        if right:
+            e = int(canvas['width']) - hmargin
+            a = NE
+        id = canvas.create_text(10, e, text=text, anchor=a,
+                                state=DISABLED,
+                                disabledfill='#EEE',
+                                fill='#EEE')
+        box = canvas.bbox(id)
+        if box[2] - box[0] > width:
+            width = box[2] - box[0]
+        if offset == 0:
+            offset = (box[3] - box[1])
+        if box[3] - box[1] > offset:
+            offset = box[3] - box[1]
+        canvas.delete(id)
+        return (offset, width)
+
+    def drawcolumn(self, canvas, text, row, column, dimensions, color='#EEE', right=False, gutter=5, hmargin=10):
+        """
+        Draws a text in a column entry and returns its ID
+
+        @param text The string to draw
+        @param canvas The canvas to draw on
+        @param color: The color for the text
+        @param right: A boolean flag, true for right alignment, false for left
+        @param gutter: the gap between 2 columns
+        @param hmargin: the distance between the left (or right) edge of the frame and the first column
+        @param dimensions: a list of dimensioning properties
+        @param row: the row of the table, the first (topmost) row is 0
+        @param column: the column of the table, the first (leftmost) column is 0
+
+        """
+        e = hmargin
+        c = 0
+        while c < column:
+            e += dimensions[4][c] + gutter
+            c += 1
+        a = NW
+        if right:
+            e += dimensions[4][c]
+            a = NE
+        return canvas.create_text(e,
+                                  dimensions[2] + dimensions[3] * row, text=text, anchor=a,
+                                  state=DISABLED,
+                                  disabledfill=color,
+                                  fill=color)
+
+    def __unitbuttonselected(self, event, button, canvas):
+        """
+        Event handler for the unit buttons
+        """
+        if button not in self.unitbuttons:
+            # when it is not our button we should not be here
+            return
+        if self.unitdimensions is None or len(self.unitdimensions) == 0:
+            # dont do anything if chat dimensions have not been set up
+            return
+        if self.unitpagestartline is None:
+            # or when we dont know where to start
+            return
+        if self.unitbuttons[button][3] == 0:
+            # previous page
+            self.unitpagestartline -= (self.unitdimensions[1] - 1)
+            if self.unitpagestartline < 0:
+                self.unitpagestartline = 0
+        elif self.unitbuttons[button][3] == 1:
+            # next page
+            self.unitpagestartline += (self.unitdimensions[1] - 1)
+            if self.unitpagestartline > self.unitdimensions[0] - self.unitdimensions[1]:
+                self.unitpagestartline = self.unitdimensions[0] - self.unitdimensions[1]
+        self.clearunitlines(canvas)
+        self.drawunits(canvas)
+
+    def setupunitbuttons(self, canvas):
+        """
+        This method draws the unit stats navigation 'buttons' on the specified canvas and binds events to the them
+        """
+
+        y = 10
+        ids = list()
+        # put buttons for previous page and next page
+        texts = ('Previous page', 'Next page')
+        largest = 0
+        lineoffset = 0
+        n = 0
+        for p in texts:
+            id = canvas.create_text(14, 14, anchor=NW, text=p,
+                                    state=DISABLED,
+                                    disabledfill='#EEE',
+                                    fill='#EEE')
+            ids.append(id)
+            box = canvas.bbox(id)
+            offset = box[2] - box[0]
+
+            if offset > largest:
+                largest = offset
+            if lineoffset < box[3] - box[1]:
+                lineoffset = box[3] - box[1]
+            n = n + 1
+        # uses the largest text as a basis for placing the legend labels
+        lineoffset = lineoffset + 10
+        column = 0
+        n = 0
+        # move all button labels to the right place and add a rectangle to serve as 'button'
+        low = 0
+        self.unitbuttons = dict()
+        for p in texts:
+            id = ids[n]
+            box = canvas.bbox(id)
+            x = 10 + column * (largest + 10)
+            y = 10
+            canvas.move(id, x - box[0], y - box[1])
+            box = canvas.bbox(id)
+            boxid = canvas.create_rectangle(box[0] - 4, box[1] - 4, box[0] + largest + 4, box[1] + lineoffset - 6,
+                                            activefill='#444',
+                                            activeoutline='#444',
+                                            fill='#222',
+                                            outline='#222',
+                                            state=NORMAL)
+
+            def handler(event, self=self, button=boxid, canvas=canvas):
+                self.__unitbuttonselected(event, button, canvas)
+
+            tag = 'unitbtn_' + str(boxid)
+            canvas.addtag_withtag(tag, boxid)
+            canvas.tag_bind(tag, sequence='<ButtonRelease-1>', func=handler)
+            canvas.tag_lower(boxid, id)
+
+            self.unitbuttons[boxid] = [p, id, boxid, n]
+
+            if box[1] + lineoffset - 5 > low:
+                low = box[1] + lineoffset - 5
+            n = n + 1
+            column = column + 1
+        return low
+
+    def clearunitselectionbuttons(self, canvas):
+        """
+        This method unbinds the unit stats selection buttons from any event handlers and
+        deletes them
+        """
+        for b in self.unitbuttons:
+            zb = self.unitbuttons[b]
+            tag = 'unitbtn_' + str(zb[3])
+            canvas.tag_unbind(tag, '<ButtonRelease-1>')
+            canvas.delete(zb[1])
+            canvas.delete(zb[2])
+        self.unitbuttons = dict()
+
+    def clearunitlines(self, canvas):
+        """
+        Delete all the text lines from the canvas
+        """
+        for id in self.unittexts:
+            canvas.delete(id)
+        self.unittexts = list()
+
+    def clearunits(self, canvas):
+        """
+        This method clears the canvas of 'unit' objects
+        """
+        self.clearunitselectionbuttons(canvas)
+        self.unitdimensions = None
+        self.clearunitlines(canvas)
+        # clear canvas
+        for tag in canvas.find_all():
+            canvas.delete(tag)
+
+    def setupunits(self, canvas):
+        """
+        Set up drawing the unit statistics canvas.
+
+        This calculates the width required for the columns using all rows so that the columns appear stable
+        when paginating.
+
+        There are  columns:
+        1. The unit name
+        2. The number of units produced
+        3. The metal cost for a single unit
+        4. The total damage dealt
+        5. The total damage received
+        6. The total EMP damage dealt
+        7. The total EMP damage received.
+        """
+        # clear canvas
+        self.clearunits(canvas)
+
+        edge = self.setupunitbuttons(canvas) + 5
+        offset = 0
+        nlines = 0
+        widths = [0, 0, 0, 0, 0, 0, 0]
+        offset, widths[0] = self.columndimensions(canvas, offset, widths[0], 'Unit')
+        offset, widths[1] = self.columndimensions(canvas, offset, widths[1], "Produced", right=True)
+        offset, widths[2] = self.columndimensions(canvas, offset, widths[2], "M/Unit", right=True)
+        offset, widths[3] = self.columndimensions(canvas, offset, widths[3], "Dmg Dealt", right=True)
+        offset, widths[4] = self.columndimensions(canvas, offset, widths[4], "Dmg Rcvd", right=True)
+        offset, widths[5] = self.columndimensions(canvas, offset, widths[5], "EMP Dealt", right=True)
+        offset, widths[6] = self.columndimensions(canvas, offset, widths[6], "EMP Recvd", right=True)
+        for r in self.unitstats:
+            offset, widths[0] = self.columndimensions(canvas, offset, widths[0], r[0])
+            offset, widths[1] = self.columndimensions(canvas, offset, widths[1], "%.0f" % r[3], right=True)
+            offset, widths[2] = self.columndimensions(canvas, offset, widths[2], "%.0f" % r[1], right=True)
+            offset, widths[3] = self.columndimensions(canvas, offset, widths[3], "%.0f" % r[5], right=True)
+            offset, widths[4] = self.columndimensions(canvas, offset, widths[4], "%.0f" % r[6], right=True)
+            offset, widths[5] = self.columndimensions(canvas, offset, widths[5], "%.0f" % r[7], right=True)
+            offset, widths[6] = self.columndimensions(canvas, offset, widths[6], "%.0f" % r[8], right=True)
+            nlines += 1
+            # print str(widths[0]) + ', ' + str(widths[1]) + ', ' +str(widths[2]) + ',
+            # ' +str(widths[3]) + ', ' +str(widths[4]) + ', ' +str(widths[5]) + ', '
+            # +str(widths[6])
+
+        if nlines == 0 or offset == 0:
+            # do nothing
+            return
+        edge += offset + 5
+        # how many lines on a page
+        ysize = int(canvas['height']) - edge - 10
+        linesperpage = int(ysize / offset)
+        self.unitdimensions = [nlines, linesperpage, edge, offset, widths]
+        self.drawcolumn(canvas, "Unit", -1, 0, self.unitdimensions, color='#FFF', right=False)
+        self.drawcolumn(canvas, "Produced", -1, 1, self.unitdimensions, color='#FFF', right=True)
+        self.drawcolumn(canvas, "M/Unit", -1, 2, self.unitdimensions, color='#FFF', right=True)
+        self.drawcolumn(canvas, "Dmg Dealt", -1, 3, self.unitdimensions, color='#FFF', right=True)
+        self.drawcolumn(canvas, "Dmg Rcvd", -1, 4, self.unitdimensions, color='#FFF', right=True)
+        self.drawcolumn(canvas, "EMP Dealt", -1, 5, self.unitdimensions, color='#FFF', right=True)
+        self.drawcolumn(canvas, "EMP Recvd", -1, 6, self.unitdimensions, color='#FFF', right=True)
+
+    def drawunits(self, canvas):
+        """
+        Draw a table with the chat log
+        """
+        if self.demofile is None:
+            return
+        if self.unitstats is None or len(self.unitstats) == 0:
+            return
+        if self.unitdimensions is None or len(self.unitdimensions) == 0:
+            # we did not set up the canvas yet (or it has been resized)
+            self.setupunits(canvas)
+        if self.unitpagestartline is None:
+            # first time on this chat page so scroll to the last page
+            if self.unitdimensions[1] >= self.unitdimensions[0]:
+                self.unitpagestartline = 0
+            else:
+                self.unitpagestartline = self.unitdimensions[0] - self.unitdimensions[1]
+        else:
+            # dimensions may have changed
+            if self.unitpagestartline > self.unitdimensions[0] - self.unitdimensions[1]:
+                self.unitpagestartline = self.unitdimensions[0] - self.unitdimensions[1]
+
+        cursorline = 0
+        line = 0
+        self.unittexts = list()
+        # now do the actual drawing
+        for unit in self.unitstats:
+            cursorline += 1
+            if cursorline < self.unitpagestartline:
+                continue
+            if cursorline > self.unitpagestartline + self.unitdimensions[1]:
+                # we are done
+                break
+            self.unittexts.append(self.drawcolumn(canvas, unit[0], line, 0, self.unitdimensions))
+            self.unittexts.append(self.drawcolumn(canvas, "%.0f" % unit[3], line, 1, self.unitdimensions, right=True))
+            self.unittexts.append(self.drawcolumn(canvas, "%.0f" % unit[1], line, 2, self.unitdimensions, right=True))
+            self.unittexts.append(self.drawcolumn(canvas, "%.0f" % unit[5], line, 3, self.unitdimensions, right=True))
+            self.unittexts.append(self.drawcolumn(canvas, "%.0f" % unit[6], line, 4, self.unitdimensions, right=True))
+            self.unittexts.append(self.drawcolumn(canvas, "%.0f" % unit[7], line, 5, self.unitdimensions, right=True))
+            self.unittexts.append(self.drawcolumn(canvas, "%.0f" % unit[8], line, 6, self.unitdimensions, right=True))
+            line = line + 1
+
+    def __damagebuttonselected(self, event, button, canvas):
+        """
+        Event handler for the damage buttons
+        """
+        if button not in self.damagebuttons:
+            # when it is not our button we should not be here
+            return
+        if self.damagedimensions is None or len(self.damagedimensions) == 0:
+            # dont do anything if chat dimensions have not been set up
+            return
+        if self.damagepagestartline is None:
+            # or when we dont know where to start
+            return
+        if self.damagebuttons[button][3] == 0:
+            # previous page
+            self.damagepagestartline -= (self.damagedimensions[1] - 1)
+            if self.damagepagestartline < 0:
+                self.damagepagestartline = 0
+        elif self.damagebuttons[button][3] == 1:
+            # next page
+            self.damagepagestartline += (self.damagedimensions[1] - 1)
+            if self.damagepagestartline > self.damagedimensions[0] - self.damagedimensions[1]:
+                self.damagepagestartline = self.damagedimensions[0] - self.damagedimensions[1]
+        self.cleardamagelines(canvas)
+        self.drawdamages(canvas)
+
+    def setupdamagebuttons(self, canvas):
+        """
+        This method draws the damage stats navigation 'buttons' on the specified canvas and binds events to the them
+        """
+
+        y = 10
+        ids = list()
+        # put buttons for previous page and next page
+        texts = ('Previous page', 'Next page')
+        largest = 0
+        lineoffset = 0
+        n = 0
+        for p in texts:
+            id = canvas.create_text(14, 14, anchor=NW, text=p,
+                                    state=DISABLED,
+                                    disabledfill='#EEE',
+                                    fill='#EEE')
+            ids.append(id)
+            box = canvas.bbox(id)
+            offset = box[2] - box[0]
+
+            if offset > largest:
+                largest = offset
+            if lineoffset < box[3] - box[1]:
+                lineoffset = box[3] - box[1]
+            n = n + 1
+        # uses the largest text as a basis for placing the legend labels
+        lineoffset = lineoffset + 10
+        column = 0
+        n = 0
+        # move all button labels to the right place and add a rectangle to serve as 'button'
+        low = 0
+        self.damagebuttons = dict()
+        for p in texts:
+            id = ids[n]
+            box = canvas.bbox(id)
+            x = 10 + column * (largest + 10)
+            y = 10
+            canvas.move(id, x - box[0], y - box[1])
+            box = canvas.bbox(id)
+            boxid = canvas.create_rectangle(box[0] - 4, box[1] - 4, box[0] + largest + 4, box[1] + lineoffset - 6,
+                                            activefill='#444',
+                                            activeoutline='#444',
+                                            fill='#222',
+                                            outline='#222',
+                                            state=NORMAL)
+
+            def handler(event, self=self, button=boxid, canvas=canvas):
+                self.__damagebuttonselected(event, button, canvas)
+
+            tag = 'damagebtn_' + str(boxid)
+            canvas.addtag_withtag(tag, boxid)
+            canvas.tag_bind(tag, sequence='<ButtonRelease-1>', func=handler)
+            canvas.tag_lower(boxid, id)
+
+            self.damagebuttons[boxid] = [p, id, boxid, n]
+
+            if box[1] + lineoffset - 5 > low:
+                low = box[1] + lineoffset - 5
+            n = n + 1
+            column = column + 1
+        return low
+
+    def cleardamageselectionbuttons(self, canvas):
+        """
+        This method unbinds the damage stats selection buttons from any event handlers and
+        deletes them
+        """
+        for b in self.damagebuttons:
+            zb = self.damagebuttons[b]
+            tag = 'damagebtn_' + str(zb[3])
+            canvas.tag_unbind(tag, '<ButtonRelease-1>')
+            canvas.delete(zb[1])
+            canvas.delete(zb[2])
+        self.damagebuttons = dict()
+
+    def cleardamagelines(self, canvas):
+        """
+        Delete all the text lines from the canvas
+        """
+        for id in self.damagetexts:
+            canvas.delete(id)
+        self.damagetexts = list()
+
+    def cleardamages(self, canvas):
+        """
+        This method clears the canvas of 'damage' objects
+        """
+        self.cleardamageselectionbuttons(canvas)
+        self.damagedimensions = None
+        self.cleardamagelines(canvas)
+        # clear canvas
+        for tag in canvas.find_all():
+            canvas.delete(tag)
+
+    def setupdamages(self, canvas):
+        """
+        Set up drawing the damage statistics canvas.
+
+        This calculates the width required for the columns using all rows so that the columns appear stable
+        when paginating.
+
+        There are  columns:
+        1. The unit name
+        2. The number of units produced
+        3. The metal cost for a single unit
+        4. The total damage dealt
+        5. The total damage received
+        6. The total EMP damage dealt
+        7. The total EMP damage received.
+        """
+        # clear canvas
+        self.cleardamages(canvas)
+
+        edge = self.setupdamagebuttons(canvas) + 5
+        offset = 0
+        nlines = 0
+        widths = [0, 0, 0, 0, 0, 0]
+        offset, widths[0] = self.columndimensions(canvas, offset, widths[0], 'Damaging unit')
+        offset, widths[1] = self.columndimensions(canvas, offset, widths[1], "Damaged unit")
+        offset, widths[2] = self.columndimensions(canvas, offset, widths[2], "Dmg Dealt", right=True)
+        offset, widths[3] = self.columndimensions(canvas, offset, widths[3], "Dmg Rcvd", right=True)
+        offset, widths[4] = self.columndimensions(canvas, offset, widths[4], "EMP Dealt", right=True)
+        offset, widths[5] = self.columndimensions(canvas, offset, widths[5], "EMP Recvd", right=True)
+        for r in self.damagestats:
+            offset, widths[0] = self.columndimensions(canvas, offset, widths[0], r[0])
+            offset, widths[1] = self.columndimensions(canvas, offset, widths[1], r[1])
+            offset, widths[2] = self.columndimensions(canvas, offset, widths[2], "%.0f" % r[2], right=True)
+            offset, widths[3] = self.columndimensions(canvas, offset, widths[3], "%.0f" % r[4], right=True)
+            offset, widths[4] = self.columndimensions(canvas, offset, widths[4], "%.0f" % r[3], right=True)
+            offset, widths[5] = self.columndimensions(canvas, offset, widths[5], "%.0f" % r[5], right=True)
+            nlines += 1
+
+        if nlines == 0 or offset == 0:
+            # do nothing
+            return
+        # how many lines on a page
+        edge += offset + 5
+        ysize = int(canvas['height']) - edge - 10
+        linesperpage = int(ysize / offset)
+        self.damagedimensions = [nlines, linesperpage, edge, offset, widths]
+        self.drawcolumn(canvas, "Damaging unit", -1, 0, self.damagedimensions, color='#FFF', right=False)
+        self.drawcolumn(canvas, "Damaged unit", -1, 1, self.damagedimensions, color='#FFF', right=False)
+        self.drawcolumn(canvas, "Dmg Dealt", -1, 2, self.damagedimensions, color='#FFF', right=True)
+        self.drawcolumn(canvas, "Dmg Rcvd", -1, 3, self.damagedimensions, color='#FFF', right=True)
+        self.drawcolumn(canvas, "EMP Dealt", -1, 4, self.damagedimensions, color='#FFF', right=True)
+        self.drawcolumn(canvas, "EMP Recvd", -1, 5, self.damagedimensions, color='#FFF', right=True)
+
+    def drawdamages(self, canvas):
+        """
+        Draw a table with the chat log
+        """
+        if self.demofile is None:
+            return
+        if self.damagestats is None or len(self.damagestats) == 0:
+            return
+        if self.damagedimensions is None or len(self.damagedimensions) == 0:
+            # we did not set up the canvas yet (or it has been resized)
+            self.setupdamages(canvas)
+        if self.damagepagestartline is None:
+            # first time on this chat page so scroll to the last page
+            if self.damagedimensions[1] >= self.damagedimensions[0]:
+                self.damagepagestartline = 0
+            else:
+                self.damagepagestartline = self.damagedimensions[0] - self.damagedimensions[1]
+        else:
+            # dimensions may have changed
+            if self.damagepagestartline > self.damagedimensions[0] - self.damagedimensions[1]:
+                self.damagepagestartline = self.damagedimensions[0] - self.damagedimensions[1]
+
+        cursorline = 0
+        line = 0
+        self.damagetexts = list()
+        # now do the actual drawing
+        for damage in self.damagestats:
+            cursorline += 1
+            if cursorline < self.damagepagestartline:
+                continue
+            if cursorline > self.damagepagestartline + self.damagedimensions[1]:
+                # we are done
+                break
+            self.damagetexts.append(self.drawcolumn(canvas, damage[0], line, 0, self.damagedimensions))
+            self.damagetexts.append(self.drawcolumn(canvas, damage[1], line, 1, self.damagedimensions))
+            self.damagetexts.append(
+                self.drawcolumn(canvas, "%.0f" % damage[2], line, 2, self.damagedimensions, right=True))
+            self.damagetexts.append(
+                self.drawcolumn(canvas, "%.0f" % damage[4], line, 3, self.damagedimensions, right=True))
+            self.damagetexts.append(
+                self.drawcolumn(canvas, "%.0f" % damage[3], line, 4, self.damagedimensions, right=True))
+            self.damagetexts.append(
+                self.drawcolumn(canvas, "%.0f" % damage[5], line, 5, self.damagedimensions, right=True))
+            line = line + 1
+
+    def layoutpage(self, canvas, dimensions):
+        """
+        Recalculates the number of lines per page of a paginated table (chat log, unit stats, damage stats) for the
+        current canvas height, using the dimensions determined when the table was set up.
+
+        Returns True if the number of lines per page changed and the page needs to be drawn again.
+        """
+        if dimensions is None or len(dimensions) == 0:
+            return False
+        ysize = int(canvas['height']) - dimensions[2] - 10
+        linesperpage = int(ysize / dimensions[3])
+        if linesperpage == dimensions[1]:
+            return False
+        dimensions[1] = linesperpage
+        return True